@@ -1,13 +1,19 @@
 import json
-from openai_utils import get_openai_client, response_text
+import rec_cache
+from dedup import unique
+from llm_adapter import InvalidJSONError, complete_json
+from llm_metrics import operation, record_cache, record_retry
 
 from db import SessionLocal, Item
 from rag import query_recipes_by_ingredients
 
 
-def tool_get_pantry():
+def tool_get_pantry(household_id=None):
     session = SessionLocal()
-    items = session.query(Item).all()
+    q = session.query(Item)
+    if household_id is not None:
+        q = q.filter(Item.household_id == household_id)
+    items = q.all()
     session.close()
     return [
         {
@@ -21,12 +27,25 @@ def tool_get_pantry():
     ]
 
 
+# Local candidates sent to the model. Retrieval diversifies them (MMR), so 4
+# cover more of the pantry than the plain cosine top 5 did, in fewer tokens.
+LOCAL_CANDIDATES = 4
+
+
 def tool_query_local_recipes(ingredients):
-    return query_recipes_by_ingredients(ingredients)
+    return query_recipes_by_ingredients(ingredients, top_k=LOCAL_CANDIDATES)
 
 
-def recommend_recipes_with_agent(extra_candidates=None):
-    pantry = tool_get_pantry()
+def recommend_recipes_with_agent(extra_candidates=None, use_cache=True, household_id=None):
+    """
+    Ask the agent for 3-5 recipes for the current pantry.
+
+    Answers are cached by a fingerprint of the pantry and the candidate set
+    (rec_cache.py); an unchanged or nearly unchanged pantry with the same
+    candidates is served from the cache. use_cache=False always asks the model.
+    household_id limits the pantry to one household (default: every item).
+    """
+    pantry = tool_get_pantry(household_id)
     if not pantry:
         return {"recipes": []}
 
@@ -37,6 +56,16 @@ def recommend_recipes_with_agent(extra_candidates=None):
         # normalize incoming candidates to expected dict keys
         for c in extra_candidates:
             candidate_recipes.append(c)
+        # Web pages that repeat a local (or another web) candidate only cost tokens
+        candidate_recipes = unique(candidate_recipes)
+
+    features = rec_cache.pantry_features(pantry)
+    candidate_set = rec_cache.candidate_keys(candidate_recipes)
+    if use_cache:
+        cached, _similarity = rec_cache.lookup(features, candidate_set)
+        record_cache("agent.recommend_recipes", cached is not None)
+        if cached is not None:
+            return cached
 
     # Provide a strict JSON schema and a short example to encourage machine-parsable output.
     json_example = {
@@ -82,37 +111,13 @@ def recommend_recipes_with_agent(extra_candidates=None):
         }
     )
 
-    client = get_openai_client()
-
+    @operation("agent.recommend_recipes")
     def call_model(system_prompt: str, user_prompt: str):
-        """Call the available OpenAI client shape and return raw text content."""
-        if hasattr(client, "responses"):
-            resp = client.responses.create(
-                model="gpt-4.1-mini",
-                input=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                response_format={"type": "json_object"},
-            )
-            return response_text(resp)
-
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ]
-        if hasattr(client, "chat") and hasattr(client.chat, "completions"):
-            resp = client.chat.completions.create(
-                model="gpt-4.1-mini",
-                messages=messages,
-                response_format={"type": "json_object"},
-            )
-            return response_text(resp)
-
-        # Legacy completions fallback
-        prompt = system_prompt + "\n" + user_prompt + "\nReturn ONLY JSON matching the example."
-        resp = client.completions.create(model="gpt-3.5-turbo-instruct", prompt=prompt)
-        return response_text(resp)
+        """Return the model's parsed JSON, or None plus the raw text if it didn't parse."""
+        try:
+            return complete_json(system_prompt, user_prompt), None
+        except InvalidJSONError as e:
+            return None, e.raw
 
 
     def validate_parsed(data_obj):
@@ -144,22 +149,10 @@ def recommend_recipes_with_agent(extra_candidates=None):
     max_retries = 3
     last_raw = None
     for attempt in range(max_retries):
-        raw = call_model(system, user)
+        parsed, raw = call_model(system, user)
+        if parsed is not None:
+            raw = json.dumps(parsed)
         last_raw = raw
-        # Try to parse the JSON robustly
-        try:
-            parsed = json.loads(raw)
-        except Exception:
-            import re
-
-            m = re.search(r"\{.*\}|\[.*\]", raw, re.DOTALL)
-            if m:
-                try:
-                    parsed = json.loads(m.group(0))
-                except Exception:
-                    parsed = None
-            else:
-                parsed = None
 
         valid, reason = (False, "no parse")
         if parsed is not None:
@@ -171,6 +164,7 @@ def recommend_recipes_with_agent(extra_candidates=None):
 
         # If invalid and we have retries left, ask the model to regenerate
         if attempt < max_retries - 1:
+            record_retry("invalid_json", op="agent.recommend_recipes")
             # Provide the model with the previous raw response and a brief reason
             followup_user = (
                 user
@@ -183,7 +177,10 @@ def recommend_recipes_with_agent(extra_candidates=None):
             user = followup_user
             continue
         # Exhausted retries
-        raise RuntimeError(f"Agent failed to produce valid JSON after {max_retries} attempts. Last raw response:\n{last_raw}")
+        raise InvalidJSONError(
+            f"Agent failed to produce valid JSON after {max_retries} attempts. Last raw response:\n{last_raw}",
+            raw=last_raw,
+        )
 
     # Basic validation: top-level 'recipes' list
     if not isinstance(data, dict) or "recipes" not in data or not isinstance(data["recipes"], list):
@@ -231,4 +228,5 @@ def recommend_recipes_with_agent(extra_candidates=None):
         # Non-fatal; if backfilling fails, continue with original data
         pass
 
+    rec_cache.store(features, candidate_set, data)
     return data  # expected {"recipes": [...]} 
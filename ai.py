@@ -1,8 +1,9 @@
 from datetime import date
-import json
-from openai_utils import get_openai_client, response_text
+from llm_adapter import complete_json
+from llm_metrics import operation
 
 
+@operation("ai.estimate_best_buy")
 def estimate_best_buy(item_name: str, category: str, purchase_date: date) -> dict:
     """
     Returns {"best_buy_date": "YYYY-MM-DD", "reason": "..."}.
@@ -21,39 +22,4 @@ def estimate_best_buy(item_name: str, category: str, purchase_date: date) -> dic
         f"Purchase date: {purchase_date.isoformat()}\n"
     )
 
-    client = get_openai_client()
-    # Newer SDKs expose `client.responses.create`. Older/newer variants
-    # may expose `client.chat.completions.create` instead. Support both.
-    if hasattr(client, "responses"):
-        resp = client.responses.create(
-            model="gpt-4.1-mini",
-            input=[
-                {"role": "system", "content": system},
-                {"role": "user", "content": user},
-            ],
-            response_format={"type": "json_object"},
-        )
-        content = response_text(resp)
-    else:
-        # Fallback to chat completions API available on some SDK versions
-        # Build messages list similar to Responses input
-        messages = [
-            {"role": "system", "content": system},
-            {"role": "user", "content": user},
-        ]
-        # Use chat.completions.create if available
-        if hasattr(client, "chat") and hasattr(client.chat, "completions"):
-            resp = client.chat.completions.create(
-                model="gpt-4.1-mini",
-                messages=messages,
-                response_format={"type": "json_object"},
-            )
-            content = response_text(resp)
-        else:
-            # As a last resort, try the legacy completions API with a JSON-only
-            # instruction in the prompt.
-            prompt = system + "\n" + user + "\nRespond ONLY in JSON with keys best_buy_date and reason."
-            resp = client.completions.create(model="gpt-3.5-turbo-instruct", prompt=prompt)
-            content = response_text(resp)
-    data = json.loads(content)
-    return data
+    return complete_json(system, user)
@@ -0,0 +1,510 @@
+"""
+Headless JSON API for SousChef.
+
+    python api.py --host 127.0.0.1 --port 8080
+
+An asyncio HTTP/1.1 server (standard library only, keep-alive supported)
+for clients that can't drive the Streamlit UI:
+
+    GET    /health
+    GET    /pantry?household_id=1          list items
+    POST   /pantry                         add an item (or a list of items)
+    GET    /pantry/{id}
+    PATCH  /pantry/{id}                    update fields
+    DELETE /pantry/{id}
+    POST   /recipes/query                  {"ingredients": [...], "top_k": 5}, optional mmr_lambda (0-1)
+    GET    /recipes/cookable?max_missing=0 cookbook recipes the pantry covers
+    POST   /grocery                        {"recipes": [...]} or {"recipe_ids": [...]}, optional household_id
+                                           and servings (a count, or {title: count})
+    POST   /recommendations                {"extra_candidates": [...], "use_cache": true}, optional household_id
+
+The event loop only parses requests and writes responses; database work,
+retrieval and model calls run on a thread pool (--workers), each request
+with its own session from the engine's connection pool. Concurrent
+/recipes/query requests are micro-batched: requests arriving within a few
+milliseconds with the same top_k and mmr_lambda share one embedding call
+and one pass over the index (rag.query_recipes_batch).
+
+Items added with "estimate_best_by": true are saved as pending and the
+background worker (jobs.py) fills in the date.
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from urllib.parse import parse_qs, urlsplit
+
+import cookable  # keeps the "cookable now" index current on pantry writes
+from db import Item, SessionLocal, init_db
+
+
+MAX_BODY = 1 << 20
+BATCH_WINDOW = 0.005  # seconds a query waits for others to share its batch
+MAX_BATCH = 32
+
+_EXECUTOR = None  # set by serve()
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Request:
+    def __init__(self, method, path, query, body, params):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.body = body
+        self.params = params
+
+    def json(self):
+        if not self.body:
+            return {}
+        try:
+            return json.loads(self.body)
+        except ValueError:
+            raise ApiError(400, "Request body is not valid JSON")
+
+    def arg(self, name, default=None):
+        values = self.query.get(name)
+        return values[0] if values else default
+
+
+async def run(fn, *args, **kwargs):
+    """Run blocking work (DB, retrieval, model calls) on the worker pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_EXECUTOR, functools.partial(fn, *args, **kwargs))
+
+
+# ---------- Pantry ----------
+
+_ITEM_FIELDS = ["household_id", "name", "category", "quantity", "unit", "purchase_date", "best_buy_date"]
+
+
+def item_to_dict(i: Item) -> dict:
+    return {
+        "id": i.id,
+        "household_id": i.household_id,
+        "name": i.name,
+        "category": i.category,
+        "quantity": i.quantity,
+        "unit": i.unit,
+        "purchase_date": i.purchase_date.isoformat() if i.purchase_date else None,
+        "best_buy_date": i.best_buy_date.isoformat() if i.best_buy_date else None,
+        "best_buy_source": i.best_buy_source,
+    }
+
+
+def _apply_fields(item, data):
+    for field in _ITEM_FIELDS:
+        if field not in data:
+            continue
+        value = data[field]
+        if field in ("purchase_date", "best_buy_date") and value is not None:
+            try:
+                value = date.fromisoformat(value)
+            except (TypeError, ValueError):
+                raise ApiError(400, f"{field} must be an ISO date (YYYY-MM-DD)")
+        elif field == "quantity" and value is not None:
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                raise ApiError(400, "quantity must be a number")
+        elif field == "household_id":
+            value = _household_id(value)
+            if value is None:
+                raise ApiError(400, "household_id must be an integer")
+        elif field == "name":
+            if not isinstance(value, str) or not value.strip():
+                raise ApiError(400, "name must be a non-empty string")
+        setattr(item, field, value)
+    if "best_buy_date" in data:
+        item.best_buy_source = "user"
+
+
+def list_items(household_id=None):
+    session = SessionLocal()
+    try:
+        q = session.query(Item)
+        if household_id is not None:
+            q = q.filter(Item.household_id == household_id)
+        return [item_to_dict(i) for i in q.order_by(Item.id).all()]
+    finally:
+        session.close()
+
+
+def get_item(item_id):
+    session = SessionLocal()
+    try:
+        item = session.get(Item, item_id)
+        if item is None:
+            raise ApiError(404, f"No item {item_id}")
+        return item_to_dict(item)
+    finally:
+        session.close()
+
+
+def create_items(rows):
+    import jobs
+
+    session = SessionLocal()
+    try:
+        items = []
+        for data in rows:
+            if not isinstance(data, dict) or "name" not in data:
+                raise ApiError(400, "Each item needs a name")
+            item = Item(purchase_date=date.today(), quantity=1.0, unit="item", category="pantry")
+            _apply_fields(item, data)
+            if data.get("estimate_best_by") and not data.get("best_buy_date"):
+                item.best_buy_source = "pending"
+            items.append(item)
+        session.add_all(items)
+        session.commit()
+        for item in items:
+            if item.best_buy_source == "pending":
+                jobs.queue_best_by(item.id)
+        return [item_to_dict(i) for i in items]
+    finally:
+        session.close()
+
+
+def update_item(item_id, data):
+    session = SessionLocal()
+    try:
+        item = session.get(Item, item_id)
+        if item is None:
+            raise ApiError(404, f"No item {item_id}")
+        _apply_fields(item, data)
+        session.commit()
+        return item_to_dict(item)
+    finally:
+        session.close()
+
+
+def delete_item(item_id):
+    session = SessionLocal()
+    try:
+        item = session.get(Item, item_id)
+        if item is None:
+            raise ApiError(404, f"No item {item_id}")
+        session.delete(item)
+        session.commit()
+    finally:
+        session.close()
+
+
+def _household_id(value):
+    """A household_id from the query string or a JSON body; None means every household."""
+    try:
+        # str() first, so JSON true or 1.5 are rejected rather than coerced
+        return int(str(value)) if value is not None else None
+    except ValueError:
+        raise ApiError(400, "household_id must be an integer")
+
+
+def _household(req):
+    return _household_id(req.arg("household_id"))
+
+
+async def pantry_list(req):
+    return 200, {"items": await run(list_items, _household(req))}
+
+
+async def pantry_create(req):
+    data = req.json()
+    rows = data if isinstance(data, list) else [data]
+    created = await run(create_items, rows)
+    return 201, (created if isinstance(data, list) else created[0])
+
+
+async def pantry_get(req):
+    return 200, await run(get_item, int(req.params["id"]))
+
+
+async def pantry_update(req):
+    data = req.json()
+    if not isinstance(data, dict):
+        raise ApiError(400, "Expected a JSON object")
+    return 200, await run(update_item, int(req.params["id"]), data)
+
+
+async def pantry_delete(req):
+    await run(delete_item, int(req.params["id"]))
+    return 204, None
+
+
+# ---------- Retrieval (micro-batched) ----------
+
+class QueryBatcher:
+    """
+    Collects concurrent queries for a few ms and runs them as rag.query_recipes_batch
+    calls, one per (top_k, mmr_lambda): MMR's picks depend on k, so a query's
+    results must not depend on what else was batched with it.
+    """
+
+    def __init__(self, window=BATCH_WINDOW, max_batch=MAX_BATCH):
+        self.window = window
+        self.max_batch = max_batch
+        self._pending = []
+        self._timer = None
+        self.batches = 0
+        self.queries = 0
+
+    async def query(self, ingredients, top_k, mmr_lambda=None):
+        fut = asyncio.get_running_loop().create_future()
+        self._pending.append((ingredients, (top_k, mmr_lambda), fut))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return await fut
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        groups = {}
+        for ingredients, key, fut in batch:
+            groups.setdefault(key, []).append((ingredients, fut))
+        for key, group in groups.items():
+            asyncio.ensure_future(self._run(key, group))
+
+    async def _run(self, key, batch):
+        import rag
+
+        top_k, mmr_lambda = key
+        self.batches += 1
+        self.queries += len(batch)
+        try:
+            results = await run(rag.query_recipes_batch, [ings for ings, _ in batch], top_k, mmr_lambda)
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for (_, fut), res in zip(batch, results):
+            if not fut.done():
+                fut.set_result(res)
+
+
+_BATCHER = QueryBatcher()
+
+
+async def recipes_query(req):
+    data = req.json()
+    ingredients = data.get("ingredients") if isinstance(data, dict) else None
+    if not isinstance(ingredients, list) or not ingredients:
+        raise ApiError(400, "ingredients must be a non-empty list")
+    try:
+        top_k = max(1, min(int(data.get("top_k") or 5), 50))
+    except (TypeError, ValueError):
+        raise ApiError(400, "top_k must be an integer")
+    mmr_lambda = data.get("mmr_lambda")
+    if mmr_lambda is not None and (
+        isinstance(mmr_lambda, bool) or not isinstance(mmr_lambda, (int, float)) or not 0 <= mmr_lambda <= 1
+    ):
+        raise ApiError(400, "mmr_lambda must be a number between 0 and 1")
+    return 200, {"recipes": await _BATCHER.query([str(i) for i in ingredients], top_k, mmr_lambda)}
+
+
+async def recipes_cookable(req):
+    try:
+        max_missing = max(0, int(req.arg("max_missing") or 0))
+        limit = max(1, min(int(req.arg("limit") or 50), 500))
+    except ValueError:
+        raise ApiError(400, "max_missing and limit must be integers")
+    return 200, {"recipes": await run(cookable.cookable_recipes, max_missing, limit)}
+
+
+# ---------- Grocery and recommendations ----------
+
+def grocery_list(recipes, recipe_ids, household_id, servings=None):
+    from pantry import compute_grocery_list
+    from recipe_store import get_recipes
+
+    if recipe_ids:
+        recipes = list(recipes or []) + get_recipes(recipe_ids)
+    session = SessionLocal()
+    try:
+        q = session.query(Item)
+        if household_id is not None:
+            q = q.filter(Item.household_id == household_id)
+        pantry_items = q.all()
+    finally:
+        session.close()
+    needed = compute_grocery_list(recipes or [], pantry_items, servings=servings)
+    return [{"name": name, "unit": unit, "amount": round(amt, 2)} for (name, unit), amt in sorted(needed.items())]
+
+
+async def grocery(req):
+    data = req.json()
+    if not isinstance(data, dict):
+        raise ApiError(400, "Expected a JSON object")
+    recipes = data.get("recipes") or []
+    recipe_ids = data.get("recipe_ids") or []
+    if not isinstance(recipes, list) or not isinstance(recipe_ids, list) or not (recipes or recipe_ids):
+        raise ApiError(400, "Pass recipes (list of recipe objects) or recipe_ids")
+    if any(not isinstance(r, dict) or not isinstance(r.get("ingredients", []), list) for r in recipes):
+        raise ApiError(400, "Each recipe must be an object with an ingredients list")
+    servings = data.get("servings")
+    counts = list(servings.values()) if isinstance(servings, dict) else [] if servings is None else [servings]
+    if any(isinstance(n, bool) or not isinstance(n, (int, float)) or n <= 0 for n in counts):
+        raise ApiError(400, "servings must be a positive number or an object of {title: number}")
+    household_id = _household_id(data.get("household_id"))
+    return 200, {"items": await run(grocery_list, recipes, recipe_ids, household_id, servings)}
+
+
+async def recommendations(req):
+    from agent import recommend_recipes_with_agent
+
+    data = req.json()
+    if not isinstance(data, dict):
+        raise ApiError(400, "Expected a JSON object")
+    return 200, await run(
+        recommend_recipes_with_agent,
+        extra_candidates=data.get("extra_candidates"),
+        use_cache=bool(data.get("use_cache", True)),
+        household_id=_household_id(data.get("household_id")),
+    )
+
+
+async def health(req):
+    return 200, {"ok": True, "query_batches": _BATCHER.batches, "queries_batched": _BATCHER.queries}
+
+
+ROUTES = [
+    ("GET", r"/health", health),
+    ("GET", r"/pantry", pantry_list),
+    ("POST", r"/pantry", pantry_create),
+    ("GET", r"/pantry/(?P<id>\d+)", pantry_get),
+    ("PATCH", r"/pantry/(?P<id>\d+)", pantry_update),
+    ("DELETE", r"/pantry/(?P<id>\d+)", pantry_delete),
+    ("POST", r"/recipes/query", recipes_query),
+    ("GET", r"/recipes/cookable", recipes_cookable),
+    ("POST", r"/grocery", grocery),
+    ("POST", r"/recommendations", recommendations),
+]
+_COMPILED = [(m, re.compile(p + r"/?$"), h) for m, p, h in ROUTES]
+
+
+async def dispatch(method, target, body):
+    parts = urlsplit(target)
+    allowed = False
+    for route_method, pattern, handler in _COMPILED:
+        m = pattern.match(parts.path)
+        if not m:
+            continue
+        allowed = True
+        if route_method != method:
+            continue
+        try:
+            return await handler(Request(method, parts.path, parse_qs(parts.query), body, m.groupdict()))
+        except ApiError as e:
+            return e.status, {"error": e.message}
+        except Exception as e:
+            return 500, {"error": f"{type(e).__name__}: {e}"}
+    if allowed:
+        return 405, {"error": f"{method} not allowed on {parts.path}"}
+    return 404, {"error": f"No route for {parts.path}"}
+
+
+# ---------- HTTP/1.1 ----------
+
+_REASONS = {200: "OK", 201: "Created", 204: "No Content", 400: "Bad Request", 404: "Not Found",
+            405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+def _response(status, payload, keep_alive) -> bytes:
+    body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+    head = [
+        f"HTTP/1.1 {status} {_REASONS.get(status, '')}",
+        f"Content-Length: {len(body)}",
+        "Connection: " + ("keep-alive" if keep_alive else "close"),
+    ]
+    if body:
+        head.append("Content-Type: application/json")
+    return ("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body
+
+
+async def handle_connection(reader, writer):
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            try:
+                method, target, version = line.decode("latin-1").split()
+            except ValueError:
+                writer.write(_response(400, {"error": "Malformed request line"}, False))
+                break
+            headers = {}
+            while True:
+                h = await reader.readline()
+                if h in (b"\r\n", b"\n", b""):
+                    break
+                key, _, value = h.decode("latin-1").partition(":")
+                headers[key.strip().lower()] = value.strip()
+            keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+            try:
+                length = int(headers.get("content-length") or 0)
+            except ValueError:
+                length = -1
+            if length < 0:
+                writer.write(_response(400, {"error": "Invalid Content-Length"}, False))
+                break
+            if length > MAX_BODY:
+                writer.write(_response(413, {"error": "Body too large"}, False))
+                break
+            body = await reader.readexactly(length) if length else b""
+            status, payload = await dispatch(method.upper(), target, body)
+            writer.write(_response(status, payload, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host="127.0.0.1", port=8080, workers=8, ready=None):
+    """Run the API until cancelled. `ready(port)` is called once listening (port 0 picks a free one)."""
+    global _EXECUTOR
+    import jobs
+
+    _EXECUTOR = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="souschef-api")
+    await asyncio.get_running_loop().run_in_executor(_EXECUTOR, init_db)
+    jobs.start_worker()
+    server = await asyncio.start_server(handle_connection, host, port, backlog=1024)
+    bound = server.sockets[0].getsockname()[1]
+    if ready:
+        ready(bound)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SousChef JSON API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=8, help="threads for DB, retrieval and model calls")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers,
+                          ready=lambda p: print(f"SousChef API listening on http://{args.host}:{p}", flush=True)))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
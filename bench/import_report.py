@@ -0,0 +1,76 @@
+"""
+Import-time report for the app's entry points.
+
+    python -m bench.import_report                 # streamlit_app, first render included
+    python -m bench.import_report agent jobs --top 20
+
+Runs each module in a fresh interpreter with `python -X importtime` and
+prints the total import time, the slowest top-level packages (cumulative
+time) and which heavy dependencies got loaded. For streamlit_app the report
+also renders the first page (main(), default Inventory page) against an
+empty temporary database with the app's own worker settings, then waits
+RENDER_SETTLE seconds so imports made by the job worker are counted too.
+The Streamlit entry point should not pull in the LLM/RAG stack (openai,
+httpx, numpy, pandas) until the Recipe page is used. --no-render measures
+the bare import only.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ["openai", "httpx", "numpy", "pandas", "pyarrow"]
+RENDER_SETTLE = 3.0  # seconds to let the job worker pick up anything main() queued
+
+
+def import_times(module, render=False):
+    """{top-level package: cumulative seconds} and total seconds for importing `module` cold."""
+    code = f"import {module}"
+    if render:
+        code += f"; {module}.main(); import time; time.sleep({RENDER_SETTLE})"
+    with tempfile.TemporaryDirectory(prefix="souschef-import-") as tmp:
+        env = dict(os.environ, SOUSCHEF_DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'report.db')}")
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+        )
+    if proc.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{proc.stderr[-2000:]}")
+    packages = {}
+    total = 0.0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = (p.strip() for p in line[len("import time:"):].split("|"))
+        if name == module:
+            total = int(cumulative) / 1e6
+        top = name.split(".")[0]
+        # Cumulative time of the outermost import of each package
+        packages[top] = max(packages.get(top, 0.0), int(cumulative) / 1e6)
+    return packages, total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report import time of SousChef modules.")
+    parser.add_argument("modules", nargs="*", default=["streamlit_app"])
+    parser.add_argument("--top", type=int, default=12)
+    parser.add_argument("--no-render", action="store_true", help="don't run streamlit_app.main() after importing")
+    args = parser.parse_args(argv)
+
+    for module in args.modules:
+        render = module == "streamlit_app" and not args.no_render
+        packages, total = import_times(module, render)
+        print(f"{module}{' (import + first render)' if render else ''}: {total * 1000:.0f} ms")
+        for name, seconds in sorted(packages.items(), key=lambda kv: -kv[1])[: args.top]:
+            print(f"  {name:<24} {seconds * 1000:>8.1f} ms")
+        loaded = [h for h in HEAVY if h in packages]
+        print(f"  heavy deps loaded: {', '.join(loaded) if loaded else 'none'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
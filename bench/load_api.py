@@ -0,0 +1,185 @@
+"""
+Load test for the HTTP API (api.py).
+
+    python -m bench.load_api --recipes 5000 --concurrency 32 --duration 10
+
+Starts the mock OpenAI server and the API in a subprocess against a
+temporary database seeded with synthetic recipes and a pantry, then drives
+it with `--concurrency` keep-alive connections for `--duration` seconds
+using a request mix of pantry reads, retrieval queries, grocery lists and
+pantry updates (plus recommendations with --recommend-share). Reports
+requests/s and p50/p99 latency per endpoint, and how many retrieval queries
+the server batched together.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from bench.run_bench import REPO_ROOT
+from bench.synthetic import CATALOG
+
+
+class Client:
+    """Minimal HTTP/1.1 keep-alive JSON client on asyncio streams."""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, payload=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+        head = f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(body)}\r\n"
+        if body:
+            head += "Content-Type: application/json\r\n"
+        self.writer.write((head + "\r\n").encode("latin-1") + body)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            if key.strip().lower() == "content-length":
+                length = int(value)
+        data = await self.reader.readexactly(length) if length else b""
+        return status, (json.loads(data) if data else None)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def _start_api(env):
+    proc = subprocess.Popen(
+        [sys.executable, "api.py", "--port", "0"],
+        cwd=REPO_ROOT, env=env, stdout=subprocess.PIPE, text=True,
+    )
+    line = proc.stdout.readline()
+    if "listening on" not in line:
+        proc.kill()
+        raise RuntimeError("API server did not start")
+    return proc, int(line.strip().rsplit(":", 1)[1])
+
+
+async def _drive(port, concurrency, duration, recommend_share, seed):
+    rng = random.Random(seed)
+    names = [c[0] for c in CATALOG]
+    samples = {}
+    errors = {}
+
+    setup = Client("127.0.0.1", port)
+    _, pantry = await setup.request("GET", "/pantry?household_id=1")
+    item_ids = [i["id"] for i in pantry["items"]]
+    setup.close()
+
+    def pick():
+        r = rng.random()
+        if r < recommend_share:
+            return "recommend", "POST", "/recommendations", {}
+        r = rng.random()
+        if r < 0.35:
+            return "query", "POST", "/recipes/query", {"ingredients": rng.sample(names, 4), "top_k": 5}
+        if r < 0.6:
+            return "pantry_list", "GET", "/pantry?household_id=1", None
+        if r < 0.8:
+            return "grocery", "POST", "/grocery", {"recipe_ids": rng.sample(range(1, 200), 3), "household_id": 1}
+        return "pantry_update", "PATCH", f"/pantry/{rng.choice(item_ids)}", {"quantity": round(rng.uniform(1, 500), 1)}
+
+    async def worker():
+        client = Client("127.0.0.1", port)
+        deadline = time.perf_counter() + duration
+        try:
+            while time.perf_counter() < deadline:
+                name, method, path, payload = pick()
+                t0 = time.perf_counter()
+                status, _ = await client.request(method, path, payload)
+                samples.setdefault(name, []).append(time.perf_counter() - t0)
+                if status >= 400:
+                    errors[name] = errors.get(name, 0) + 1
+        finally:
+            client.close()
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - t0
+
+    stats = Client("127.0.0.1", port)
+    _, health = await stats.request("GET", "/health")
+    stats.close()
+    return samples, errors, elapsed, health
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the SousChef HTTP API against a mock OpenAI server.")
+    parser.add_argument("--recipes", type=int, default=2000)
+    parser.add_argument("--pantry-size", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="mock API latency per request")
+    parser.add_argument("--recommend-share", type=float, default=0.0, help="fraction of requests that ask the agent")
+    parser.add_argument("--workers", type=int, default=8, help="API worker threads")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    from bench.mock_openai import start_mock_server
+
+    mock, base_url = start_mock_server(latency_ms=args.latency_ms, seed=args.seed)
+    with tempfile.TemporaryDirectory(prefix="souschef-load-") as tmp:
+        env = dict(os.environ)
+        env.update(
+            {
+                "SOUSCHEF_DATABASE_URL": f"sqlite:///{os.path.join(tmp, 'load.db')}",
+                "SOUSCHEF_INDEX_DIR": os.path.join(tmp, "index"),
+                "SOUSCHEF_EMBEDDER": "openai",
+                "SOUSCHEF_WORKER": "0",
+                "OPENAI_API_KEY": "sk-mock",
+                "OPENAI_BASE_URL": base_url,
+            }
+        )
+        subprocess.run(
+            [sys.executable, "-m", "bench.synthetic", "--households", "1",
+             "--items-per-household", str(args.pantry_size), "--recipes", str(args.recipes), "--seed", str(args.seed)],
+            cwd=REPO_ROOT, env=env, check=True, stdout=subprocess.DEVNULL,
+        )
+        subprocess.run(
+            [sys.executable, "-c", "import rag; rag.build_index()"], cwd=REPO_ROOT, env=env, check=True
+        )
+        api, port = _start_api(env)
+        try:
+            samples, errors, elapsed, health = asyncio.run(
+                _drive(port, args.concurrency, args.duration, args.recommend_share, args.seed)
+            )
+        finally:
+            api.terminate()
+            api.wait()
+    mock.shutdown()
+
+    total = sum(len(s) for s in samples.values())
+    print(f"{total} requests in {elapsed:.1f}s = {total / elapsed:.0f} req/s at concurrency {args.concurrency}")
+    print(f"{'endpoint':<14} {'count':>7} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for name, s in sorted(samples.items()):
+        arr = np.asarray(s) * 1000.0
+        print(
+            f"{name:<14} {len(arr):>7} {len(arr) / elapsed:>8.1f} {np.percentile(arr, 50):>8.1f} "
+            f"{np.percentile(arr, 99):>8.1f} {errors.get(name, 0):>7}"
+        )
+    if health.get("query_batches"):
+        print(f"retrieval: {health['queries_batched']} queries in {health['query_batches']} batches "
+              f"({health['queries_batched'] / health['query_batches']:.1f} per batch)")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
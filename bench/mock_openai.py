@@ -0,0 +1,247 @@
+"""
+Local stand-in for the OpenAI HTTP API used by the benchmarks.
+
+Serves /v1/embeddings, /v1/responses, /v1/chat/completions and
+/v1/completions with deterministic outputs and configurable latency, so the
+whole recommender pipeline can run offline. Point the SDK at it with
+OPENAI_BASE_URL=http://127.0.0.1:<port>/v1 (any OPENAI_API_KEY works).
+
+- embeddings: hashed n-gram vectors (embedders.HashingEmbedder), so
+  retrieval results are meaningful and identical between runs
+- agent prompts (a JSON user message with "candidate_recipes"): picks the
+  first three candidates, copying their ingredients and splitting them
+  into used/missing against the pantry
+- best-by prompts: purchase date + 7 days
+- web search prompts: synthetic recipe pages
+
+Run standalone with `python -m bench.mock_openai --port 8765 --latency-ms 50`.
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from embedders import HashingEmbedder
+
+
+EMBED_DIM = 1536  # same width as text-embedding-3-small
+
+
+class MockConfig:
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate  # fraction of requests answered with 429
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self) -> float:
+        with self._lock:
+            jitter = self._rng.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0
+        return (self.latency_ms + jitter) / 1000.0
+
+    def should_fail(self) -> bool:
+        if not self.error_rate:
+            return False
+        with self._lock:
+            return self._rng.random() < self.error_rate
+
+
+_EMBEDDER = HashingEmbedder(dim=EMBED_DIM)
+
+
+def _tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+def _agent_answer(payload: dict) -> dict:
+    pantry_names = {(p.get("name") or "").strip().lower() for p in payload.get("pantry", [])}
+    recipes = []
+    for c in payload.get("candidate_recipes", [])[:3]:
+        ingredients = c.get("ingredients") or []
+        names = [(i.get("name") or "").strip().lower() for i in ingredients]
+        recipes.append(
+            {
+                "title": c.get("title"),
+                "used_items": [n for n in names if n in pantry_names],
+                "missing_items": [n for n in names if n not in pantry_names],
+                "explanation": "Uses pantry items closest to their best-by date.",
+                "ingredients": ingredients,
+                "source": c.get("source"),
+                "detailed_steps": c.get("steps") or "1) Cook. 2) Serve.",
+                "servings": c.get("servings") or 2,
+                "prep_time": "10 mins",
+                "cook_time": "20 mins",
+                "tags": c.get("tags") or [],
+            }
+        )
+    return {"recipes": recipes}
+
+
+def _web_answer(prompt: str) -> dict:
+    m = re.search(r"top (\d+) recipe webpages that use these ingredients: (.*?)\.\n", prompt)
+    k = int(m.group(1)) if m else 5
+    ingredients = [i.strip() for i in (m.group(2) if m else "").split(",") if i.strip()]
+    recipes = []
+    for n in range(k):
+        picked = ingredients[n % max(1, len(ingredients)):][:3] or ["water"]
+        recipes.append(
+            {
+                "title": f"Web {' '.join(picked).title()} Recipe {n + 1}",
+                "url": f"https://example.com/recipes/{'-'.join(picked).replace(' ', '-')}-{n + 1}",
+                "ingredients": [{"name": p, "amount": 100, "unit": "g"} for p in picked],
+                "steps": "Combine and cook.",
+                "detailed_steps": "1) Combine. 2) Cook.",
+                "servings": 2,
+                "prep_time": "5 mins",
+                "cook_time": "15 mins",
+                "tags": ["quick"],
+            }
+        )
+    return {"recipes": recipes}
+
+
+def answer_for(system: str, user: str) -> str:
+    """Deterministic JSON text for a (system, user) prompt pair."""
+    try:
+        payload = json.loads(user.split("\n\nThe previous response was invalid")[0])
+    except ValueError:
+        payload = None
+    if isinstance(payload, dict) and "candidate_recipes" in payload:
+        return json.dumps(_agent_answer(payload))
+    text = (system or "") + "\n" + (user or "")
+    if "best by" in text.lower() or "best_buy_date" in text:
+        m = re.search(r"Purchase date: (\d{4}-\d{2}-\d{2})", text)
+        start = date.fromisoformat(m.group(1)) if m else date.today()
+        return json.dumps({"best_buy_date": (start + timedelta(days=7)).isoformat(), "reason": "mock estimate"})
+    if "recipe webpages" in text:
+        return json.dumps(_web_answer(text + "\n"))
+    return json.dumps({"ok": True})
+
+
+def _split_messages(messages):
+    system = "\n".join(m.get("content") or "" for m in messages if m.get("role") == "system")
+    user = "\n".join(m.get("content") or "" for m in messages if m.get("role") != "system")
+    return system, user
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        req = json.loads(self.rfile.read(length) or b"{}")
+        config = self.server.config
+        time.sleep(config.delay())
+        if config.should_fail():
+            self._send(429, {"error": {"message": "mock rate limit", "type": "rate_limit_error"}})
+            return
+        path = self.path.split("?")[0].rstrip("/")
+        model = req.get("model", "mock")
+
+        if path.endswith("/embeddings"):
+            inputs = req.get("input")
+            inputs = [inputs] if isinstance(inputs, str) else list(inputs or [])
+            vectors = _EMBEDDER.embed(inputs)
+            n = sum(_tokens(t) for t in inputs)
+            self._send(200, {
+                "object": "list",
+                "model": model,
+                "data": [{"object": "embedding", "index": i, "embedding": v} for i, v in enumerate(vectors)],
+                "usage": {"prompt_tokens": n, "total_tokens": n},
+            })
+        elif path.endswith("/chat/completions"):
+            system, user = _split_messages(req.get("messages") or [])
+            text = answer_for(system, user)
+            self._send(200, {
+                "id": "chatcmpl-mock",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {
+                    "prompt_tokens": _tokens(system + user),
+                    "completion_tokens": _tokens(text),
+                    "total_tokens": _tokens(system + user) + _tokens(text),
+                },
+            })
+        elif path.endswith("/responses"):
+            system, user = _split_messages(req.get("input") or [])
+            text = answer_for(system, user)
+            self._send(200, {
+                "id": "resp-mock",
+                "object": "response",
+                "created_at": int(time.time()),
+                "model": model,
+                "status": "completed",
+                "output": [{
+                    "type": "message",
+                    "id": "msg-mock",
+                    "role": "assistant",
+                    "status": "completed",
+                    "content": [{"type": "output_text", "text": text, "annotations": []}],
+                }],
+                "usage": {
+                    "input_tokens": _tokens(system + user),
+                    "output_tokens": _tokens(text),
+                    "total_tokens": _tokens(system + user) + _tokens(text),
+                },
+            })
+        elif path.endswith("/completions"):
+            prompt = req.get("prompt") or ""
+            text = answer_for("", prompt if isinstance(prompt, str) else "\n".join(prompt))
+            self._send(200, {
+                "id": "cmpl-mock",
+                "object": "text_completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "text": text, "finish_reason": "stop", "logprobs": None}],
+                "usage": {"prompt_tokens": _tokens(str(prompt)), "completion_tokens": _tokens(text), "total_tokens": 0},
+            })
+        else:
+            self._send(404, {"error": {"message": f"unknown path {self.path}"}})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_mock_server(port=0, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, seed=0):
+    """Start the mock in a daemon thread; returns (server, base_url). Port 0 picks a free port."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+    server.daemon_threads = True
+    server.config = MockConfig(latency_ms, jitter_ms, error_rate, seed)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mock OpenAI API server for offline benchmarks.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+    server, url = start_mock_server(args.port, args.latency_ms, args.jitter_ms, args.error_rate)
+    print(f"Mock OpenAI API listening on {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
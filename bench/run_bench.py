@@ -0,0 +1,215 @@
+"""
+Offline performance benchmark for the recommender pipeline.
+
+    python -m bench.run_bench --sizes 100,1000,10000 --iterations 30 --latency-ms 20
+
+Every OpenAI call goes to the local mock server (bench/mock_openai.py), so
+no network or API key is needed. For each corpus size a fresh worker
+process gets its own temporary database and index directory, loads N
+synthetic recipes plus a synthetic pantry (bench/synthetic.py), and times
+each stage:
+
+    load_corpus      bulk insert of the recipes
+    build_index      rag.build_index (embeds the whole corpus via the mock)
+    query            rag.query_recipes_by_ingredients
+    recommend        agent.recommend_recipes_with_agent
+    grocery          pantry.compute_grocery_list for 3 recipes
+    apply_recipe     pantry.apply_recipe_to_pantry
+
+It reports p50/p99 latency, throughput and peak RSS per stage. --out writes
+the results as JSON; --baseline compares against an earlier --out file and
+exits non-zero if any stage's p50 regressed by more than --tolerance.
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from bench.synthetic import CATALOG, generate_items, generate_recipes
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024.0 * 1024.0) if sys.platform == "darwin" else rss / 1024.0
+
+
+def _summarize(samples, peak_rss_mb):
+    arr = np.asarray(samples, dtype=float)
+    return {
+        "n": int(len(arr)),
+        "p50_ms": float(np.percentile(arr, 50) * 1000.0),
+        "p99_ms": float(np.percentile(arr, 99) * 1000.0),
+        "mean_ms": float(arr.mean() * 1000.0),
+        "throughput_per_s": float(len(arr) / arr.sum()) if arr.sum() > 0 else float("inf"),
+        "peak_rss_mb": peak_rss_mb,
+    }
+
+
+def _timed(fn, iterations):
+    samples = []
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - t0)
+    return _summarize(samples, _peak_rss_mb())
+
+
+def run_worker(size, pantry_size, iterations, seed):
+    """Run all stages for one corpus size in this (fresh) process; returns {stage: stats}."""
+    # App modules read their configuration at import time, after the parent set the env
+    import agent
+    import llm_metrics
+    import rag
+    from db import SessionLocal, Item, init_db
+    from pantry import apply_recipe_to_pantry, compute_grocery_list
+    from recipe_store import bulk_import
+    from bench.synthetic import load_items
+
+    init_db()
+    rng = random.Random(seed)
+    results = {}
+
+    t0 = time.perf_counter()
+    bulk_import(generate_recipes(size, seed))
+    load_items(generate_items(1, pantry_size, seed))
+    results["load_corpus"] = _summarize([time.perf_counter() - t0], _peak_rss_mb())
+    results["load_corpus"]["throughput_per_s"] = size / (time.perf_counter() - t0)  # recipes/s
+
+    t0 = time.perf_counter()
+    rag.build_index()
+    elapsed = time.perf_counter() - t0
+    results["build_index"] = _summarize([elapsed], _peak_rss_mb())
+    results["build_index"]["throughput_per_s"] = size / elapsed  # recipes/s
+
+    pantry_names = [c[0] for c in CATALOG]
+    recipes_sample = list(generate_recipes(min(size, 50), seed))
+
+    results["query"] = _timed(lambda i: rag.query_recipes_by_ingredients(rng.sample(pantry_names, 5)), iterations)
+    results["recommend"] = _timed(lambda i: agent.recommend_recipes_with_agent(), iterations)
+
+    def grocery(i):
+        session = SessionLocal()
+        pantry_items = session.query(Item).all()
+        session.close()
+        compute_grocery_list(rng.sample(recipes_sample, min(3, len(recipes_sample))), pantry_items)
+
+    results["grocery"] = _timed(grocery, iterations)
+    results["apply_recipe"] = _timed(lambda i: apply_recipe_to_pantry(rng.choice(recipes_sample)), iterations)
+
+    snap = llm_metrics.snapshot()
+    results["_llm"] = {
+        "calls": sum(c["calls"] for c in snap["calls"]),
+        "input_tokens": sum(c["input_tokens"] for c in snap["calls"]),
+        "output_tokens": sum(c["output_tokens"] for c in snap["calls"]),
+    }
+    return results
+
+
+def _run_size(size, args, base_url):
+    with tempfile.TemporaryDirectory(prefix="souschef-bench-") as tmp:
+        env = dict(os.environ)
+        env.update(
+            {
+                "SOUSCHEF_DATABASE_URL": f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+                "SOUSCHEF_INDEX_DIR": os.path.join(tmp, "index"),
+                "SOUSCHEF_EMBEDDER": "openai",
+                "OPENAI_API_KEY": "sk-mock",
+                "OPENAI_BASE_URL": base_url,
+            }
+        )
+        cmd = [
+            sys.executable, "-m", "bench.run_bench", "--worker",
+            "--size", str(size),
+            "--pantry-size", str(args.pantry_size),
+            "--iterations", str(args.iterations),
+            "--seed", str(args.seed),
+        ]
+        proc = subprocess.run(cmd, cwd=REPO_ROOT, env=env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"benchmark worker for size {size} failed:\n{proc.stderr}")
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _print_table(all_results):
+    print(f"{'size':>8} {'stage':<13} {'p50 ms':>9} {'p99 ms':>9} {'ops/s':>10} {'rss MB':>8}")
+    for size, stages in all_results.items():
+        for stage, s in stages.items():
+            if stage.startswith("_"):
+                continue
+            print(
+                f"{size:>8} {stage:<13} {s['p50_ms']:>9.2f} {s['p99_ms']:>9.2f} "
+                f"{s['throughput_per_s']:>10.1f} {s['peak_rss_mb']:>8.1f}"
+            )
+        llm = stages.get("_llm", {})
+        print(f"{size:>8} {'llm':<13} calls={llm.get('calls')} tokens in/out={llm.get('input_tokens')}/{llm.get('output_tokens')}")
+
+
+def compare(current, baseline, tolerance):
+    """Return human-readable regressions where p50 grew by more than `tolerance` (fraction)."""
+    regressions = []
+    for size, stages in current.items():
+        for stage, s in stages.items():
+            base = baseline.get(size, {}).get(stage)
+            if stage.startswith("_") or not base:
+                continue
+            if s["p50_ms"] > base["p50_ms"] * (1.0 + tolerance):
+                regressions.append(f"size={size} {stage}: p50 {base['p50_ms']:.2f} -> {s['p50_ms']:.2f} ms")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline SousChef pipeline benchmark against a mock OpenAI server.")
+    parser.add_argument("--sizes", default="100,1000,5000", help="comma-separated recipe corpus sizes")
+    parser.add_argument("--pantry-size", type=int, default=25)
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="mock API latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write results as JSON")
+    parser.add_argument("--baseline", help="JSON from an earlier --out to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p50 slowdown vs baseline (fraction)")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(run_worker(args.size, args.pantry_size, args.iterations, args.seed)))
+        return 0
+
+    from bench.mock_openai import start_mock_server
+
+    server, base_url = start_mock_server(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, seed=args.seed)
+    try:
+        results = {}
+        for size in [int(s) for s in args.sizes.split(",") if s.strip()]:
+            results[str(size)] = _run_size(size, args, base_url)
+    finally:
+        server.shutdown()
+
+    _print_table(results)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for r in regressions:
+            print("REGRESSION:", r)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
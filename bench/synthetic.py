@@ -0,0 +1,235 @@
+"""
+Synthetic households and cookbooks for scale testing.
+
+    python -m bench.synthetic --database-url sqlite:///./synthetic.db \\
+        --households 2000 --items-per-household 60 --recipes 100000
+
+Generates db.Item rows for N households (realistic names, storage
+categories, units, quantities, purchase dates and best-by dates drawn from
+per-ingredient shelf lives, a share of them already expired or missing)
+and M recipes in the seed schema (ingredients with amount/unit, tags,
+servings, prep/cook times). Rows are bulk-loaded with batched executemany
+inserts with SQLite's synchronous writes disabled for the duration of the
+load, so 10^5–10^6 rows take seconds. Point the app, the benchmarks or
+the batch jobs at the result with SOUSCHEF_DATABASE_URL.
+
+--recipes-jsonl writes the recipes to a JSON Lines file instead, for
+feeding ingest.py.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+
+# name, category, unit, typical purchase quantities, shelf life in days
+CATALOG = [
+    ("spinach", "fridge", "g", (150, 300, 500), 6),
+    ("lettuce", "fridge", "item", (1, 2), 7),
+    ("kale", "fridge", "g", (200, 400), 7),
+    ("broccoli", "fridge", "g", (300, 500), 7),
+    ("carrot", "fridge", "item", (4, 6, 10), 21),
+    ("bell pepper", "fridge", "item", (1, 2, 3), 10),
+    ("zucchini", "fridge", "item", (1, 2, 3), 10),
+    ("mushrooms", "fridge", "g", (200, 400), 6),
+    ("cucumber", "fridge", "item", (1, 2), 8),
+    ("tomatoes", "fridge", "item", (3, 4, 6), 7),
+    ("cilantro", "fridge", "g", (30, 50), 7),
+    ("basil", "fridge", "g", (20, 40), 5),
+    ("lemon", "fridge", "item", (1, 2, 4), 21),
+    ("lime", "fridge", "item", (2, 4), 21),
+    ("milk", "fridge", "ml", (1000, 2000), 7),
+    ("yogurt", "fridge", "g", (500, 1000), 14),
+    ("butter", "fridge", "g", (250, 500), 60),
+    ("cheddar", "fridge", "g", (200, 400), 30),
+    ("parmesan", "fridge", "g", (100, 200), 60),
+    ("mozzarella", "fridge", "g", (125, 250), 10),
+    ("eggs", "fridge", "item", (6, 12, 18), 28),
+    ("chicken breast", "fridge", "g", (500, 1000), 2),
+    ("ground beef", "fridge", "g", (500, 1000), 2),
+    ("salmon", "fridge", "g", (300, 600), 2),
+    ("tofu", "fridge", "g", (400, 800), 10),
+    ("bacon", "fridge", "g", (200, 400), 7),
+    ("onion", "pantry", "item", (2, 3, 5), 30),
+    ("garlic", "pantry", "clove", (10, 20), 60),
+    ("potato", "pantry", "item", (4, 6, 10), 30),
+    ("sweet potato", "pantry", "item", (2, 3, 4), 21),
+    ("rice", "pantry", "g", (1000, 2000), 365),
+    ("pasta", "pantry", "g", (500, 1000), 365),
+    ("quinoa", "pantry", "g", (500,), 365),
+    ("oats", "pantry", "g", (500, 1000), 270),
+    ("flour", "pantry", "g", (1000, 2000), 240),
+    ("sugar", "pantry", "g", (1000,), 720),
+    ("chickpeas", "pantry", "g", (400, 800), 720),
+    ("black beans", "pantry", "g", (400, 800), 720),
+    ("lentils", "pantry", "g", (500, 1000), 365),
+    ("canned tomatoes", "pantry", "g", (400, 800), 540),
+    ("coconut milk", "pantry", "ml", (400, 800), 540),
+    ("olive oil", "pantry", "ml", (500, 1000), 540),
+    ("vegetable oil", "pantry", "ml", (1000,), 365),
+    ("soy sauce", "pantry", "ml", (250, 500), 720),
+    ("honey", "pantry", "g", (250, 500), 720),
+    ("peanut butter", "pantry", "g", (350, 500), 180),
+    ("bread", "pantry", "item", (1, 2), 5),
+    ("tortillas", "pantry", "item", (8, 10), 14),
+    ("salt", "pantry", "g", (500, 1000), 1800),
+    ("black pepper", "pantry", "g", (50, 100), 720),
+    ("cumin", "pantry", "g", (50,), 720),
+    ("paprika", "pantry", "g", (50,), 720),
+    ("frozen peas", "freezer", "g", (500, 1000), 240),
+    ("frozen corn", "freezer", "g", (500, 1000), 240),
+    ("frozen berries", "freezer", "g", (300, 500), 240),
+    ("frozen shrimp", "freezer", "g", (400, 800), 180),
+    ("ice cream", "freezer", "ml", (500, 1000), 60),
+    ("chicken thighs", "freezer", "g", (500, 1000), 180),
+]
+
+# per-recipe amounts are a fraction of a typical purchase
+_RECIPE_AMOUNTS = {"g": (50, 100, 150, 200, 250, 400), "ml": (60, 120, 250, 400), "item": (1, 2, 3, 4),
+                   "clove": (2, 3, 4), "tsp": (0.5, 1, 2), "tbsp": (1, 2, 3)}
+_SPICES = {"salt", "black pepper", "cumin", "paprika"}
+_STYLES = ["Roasted", "Stir-Fried", "Creamy", "Spicy", "Lemon", "Garlic", "Herbed", "Baked", "Smoky", "Sheet-Pan"]
+_DISHES = ["Curry", "Salad", "Soup", "Pasta", "Bowl", "Tacos", "Skillet", "Stew", "Casserole", "Wraps", "Frittata"]
+_TAGS = ["quick", "vegetarian", "vegan", "gluten-free", "one-pan", "high-protein", "kid-friendly", "meal-prep"]
+
+
+def generate_items(households, items_per_household, seed=0, today=None):
+    """Yield Item column dicts for households 1..N."""
+    rng = random.Random(seed)
+    today = today or date.today()
+    for household in range(1, households + 1):
+        # Households differ in size: some keep a sparse fridge, some a full pantry
+        n = max(1, int(rng.gauss(items_per_household, items_per_household * 0.3)))
+        for _ in range(n):
+            name, category, unit, quantities, shelf_life = rng.choice(CATALOG)
+            purchase = today - timedelta(days=int(rng.expovariate(1 / 10.0)))
+            best_by = None
+            source = "user"
+            if rng.random() < 0.9:  # ~10% of items never got a best-by date
+                life = max(1, int(shelf_life * rng.lognormvariate(0, 0.25)))
+                best_by = purchase + timedelta(days=life)
+                source = "ai" if rng.random() < 0.6 else "user"
+            yield {
+                "household_id": household,
+                "name": name,
+                "category": category,
+                # Partially used: anything between a sliver and a full pack
+                "quantity": round(rng.choice(quantities) * rng.uniform(0.1, 1.0), 1),
+                "unit": unit,
+                "purchase_date": purchase,
+                "best_buy_date": best_by,
+                "best_buy_source": source,
+            }
+
+
+def generate_recipes(count, seed=0):
+    """Yield recipe dicts in the seed_recipes.json schema (no id; the store assigns one)."""
+    rng = random.Random(seed + 1)
+    for i in range(count):
+        main = rng.choice(CATALOG)
+        others = rng.sample(CATALOG, rng.randint(3, 9))
+        picks = [main] + [c for c in others if c[0] != main[0]]
+        ingredients = []
+        for name, _, unit, _, _ in picks:
+            if name in _SPICES:
+                unit = "tsp"
+            ingredients.append({"name": name, "amount": rng.choice(_RECIPE_AMOUNTS.get(unit, (1,))), "unit": unit})
+        prep = rng.choice([5, 10, 15, 20, 30])
+        cook = rng.choice([0, 10, 15, 20, 30, 45, 60, 90])
+        yield {
+            "title": f"{rng.choice(_STYLES)} {main[0].title()} {rng.choice(_DISHES)} #{i}",
+            "ingredients": ingredients,
+            "steps": "1) Prep the ingredients. 2) Cook the main ingredient. 3) Combine, season and serve.",
+            "detailed_steps": None,
+            "source": None,
+            "servings": rng.choice([1, 2, 2, 4, 4, 4, 6, 8]),
+            "prep_time": f"{prep} mins",
+            "cook_time": f"{cook} mins",
+            "tags": rng.sample(_TAGS, rng.randint(1, 3)),
+        }
+
+
+def _batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def load_items(rows, batch_size=10_000) -> int:
+    """Bulk insert Item dicts with executemany in one transaction."""
+    from sqlalchemy import insert
+
+    from db import Item, engine
+
+    total = 0
+    previous = None
+    with engine.connect() as conn:
+        try:
+            with conn.begin():
+                if engine.dialect.name == "sqlite":
+                    # Bulk load only: skip the per-commit fsync; the final commit still lands atomically
+                    previous = conn.exec_driver_sql("PRAGMA synchronous").scalar()
+                    conn.exec_driver_sql("PRAGMA synchronous=OFF")
+                for batch in _batched(rows, batch_size):
+                    conn.execute(insert(Item), batch)
+                    total += len(batch)
+        finally:
+            if previous is not None:
+                # The connection goes back to the pool; later writes must be synced again
+                conn.exec_driver_sql(f"PRAGMA synchronous={int(previous)}")
+                conn.commit()
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic pantries and recipes for scale testing.")
+    parser.add_argument("--database-url", help="target database (default: SOUSCHEF_DATABASE_URL or souschef.db)")
+    parser.add_argument("--households", type=int, default=100)
+    parser.add_argument("--items-per-household", type=int, default=50)
+    parser.add_argument("--recipes", type=int, default=10_000)
+    parser.add_argument("--recipes-jsonl", help="write recipes to this JSONL file instead of the database")
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.database_url:
+        # db reads the URL at import time
+        os.environ["SOUSCHEF_DATABASE_URL"] = args.database_url
+    from db import init_db
+    from recipe_store import bulk_import
+
+    init_db()
+
+    t0 = time.perf_counter()
+    n_items = load_items(generate_items(args.households, args.items_per_household, args.seed), args.batch_size)
+    elapsed = time.perf_counter() - t0
+    print(f"items: {n_items} rows for {args.households} households in {elapsed:.1f}s ({n_items / max(elapsed, 1e-9):,.0f} rows/s)")
+
+    t0 = time.perf_counter()
+    recipes = generate_recipes(args.recipes, args.seed)
+    if args.recipes_jsonl:
+        n_recipes = 0
+        with open(args.recipes_jsonl, "w") as f:
+            for r in recipes:
+                f.write(json.dumps(r) + "\n")
+                n_recipes += 1
+        where = args.recipes_jsonl
+    else:
+        n_recipes = bulk_import(recipes, batch_size=args.batch_size)
+        where = "recipes table"
+    elapsed = time.perf_counter() - t0
+    print(f"recipes: {n_recipes} -> {where} in {elapsed:.1f}s ({n_recipes / max(elapsed, 1e-9):,.0f} rows/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
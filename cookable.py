@@ -0,0 +1,249 @@
+"""
+"Cookable now" index: for every cookbook recipe, how many of its required
+ingredients the pantry can't cover.
+
+recipe_ingredients holds one row per amounted ingredient (the same ones
+compute_grocery_list counts) with a `satisfied` flag; recipe_feasibility
+holds the per-recipe count of unsatisfied rows. When a pantry write commits
+(db.add_pantry_listener), only the rows for the changed ingredient names
+are re-checked, and only recipes whose flags flipped get their count
+adjusted. Finding every recipe with nothing missing is then an indexed
+`missing = 0` lookup instead of a scan of the cookbook.
+
+Importing this module registers the listener, so processes that write the
+pantry (the app, api.py) keep the index current. counters["cookable"]
+records which pantry version the index reflects. A reader that finds it
+behind, for example after a write from a process that never imported this
+module, re-checks everything. Recipes added since the last read are
+indexed then too. The listener likewise re-checks everything when the
+index is more than the one commit it is handling behind. Like the Recipe
+page, the index covers the whole items table, not one household.
+"""
+
+import threading
+
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.dialects.sqlite import insert
+
+from db import (
+    Counter, Item, Recipe, RecipeFeasibility, RecipeIngredient, SessionLocal, add_pantry_listener, init_db,
+    pantry_version,
+)
+from pantry import convert_amount
+
+
+INDEX_COUNTER = "cookable"
+_LOCK = threading.Lock()
+
+
+def _name(s) -> str:
+    return (s or "").strip().lower()
+
+
+def _stock(session, names=None):
+    """{name: [(quantity, unit)]} for the given names (all items if None)."""
+    q = select(Item.name, Item.quantity, Item.unit)
+    if names is not None:
+        q = q.where(func.lower(func.trim(Item.name)).in_(list(names)))
+    stock = {}
+    for name, qty, unit in session.execute(q):
+        stock.setdefault(_name(name), []).append((float(qty or 0.0), (unit or "").strip().lower()))
+    return stock
+
+
+def _satisfied(stock, name, amount, unit) -> bool:
+    # Same comparison as pantry.compute_grocery_list, so "cookable" means an empty grocery list
+    have = 0.0
+    for qty, item_unit in stock.get(name, []):
+        converted, ok = convert_amount(qty, item_unit or unit, unit)
+        if ok:
+            have += float(converted)
+    return have >= amount
+
+
+def _index_new_recipes(session):
+    """Add rows for recipes that aren't indexed yet; returns how many."""
+    rows = session.execute(
+        select(Recipe.id, Recipe.ingredients)
+        .outerjoin(RecipeFeasibility, RecipeFeasibility.recipe_id == Recipe.id)
+        .where(RecipeFeasibility.recipe_id.is_(None))
+    ).all()
+    if not rows:
+        return 0
+    stock = _stock(session)
+    ingredient_rows, feasibility_rows = [], []
+    for recipe_id, ingredients in rows:
+        required = missing = 0
+        for ing in ingredients or []:
+            if not isinstance(ing, dict):
+                continue
+            name = _name(ing.get("name"))
+            try:
+                amount = float(ing.get("amount") or 0.0)
+            except (TypeError, ValueError):
+                amount = 0.0
+            if not name or amount <= 0:
+                continue
+            unit = (ing.get("unit") or "").strip().lower()
+            ok = _satisfied(stock, name, amount, unit)
+            ingredient_rows.append(
+                {"recipe_id": recipe_id, "name": name, "amount": amount, "unit": unit, "satisfied": ok}
+            )
+            required += 1
+            missing += 0 if ok else 1
+        feasibility_rows.append({"recipe_id": recipe_id, "required": required, "missing": missing})
+    if ingredient_rows:
+        session.execute(insert(RecipeIngredient), ingredient_rows)
+    session.execute(insert(RecipeFeasibility).on_conflict_do_nothing(), feasibility_rows)
+    return len(rows)
+
+
+def _refresh(session, names=None):
+    """Re-check the ingredient rows for `names` (all if None) and adjust the affected recipes' counts."""
+    stock = _stock(session, names)
+    q = select(RecipeIngredient.id, RecipeIngredient.recipe_id, RecipeIngredient.name,
+               RecipeIngredient.amount, RecipeIngredient.unit, RecipeIngredient.satisfied)
+    if names is not None:
+        q = q.where(RecipeIngredient.name.in_(list(names)))
+    flipped, deltas = [], {}
+    for row_id, recipe_id, name, amount, unit, was in session.execute(q):
+        now = _satisfied(stock, name, amount, unit)
+        if now != bool(was):
+            flipped.append({"row_id": row_id, "now": now})
+            deltas[recipe_id] = deltas.get(recipe_id, 0) + (-1 if now else 1)
+    if not flipped:
+        return 0
+    conn = session.connection()
+    conn.execute(
+        update(RecipeIngredient).where(RecipeIngredient.id == bindparam("row_id")).values(satisfied=bindparam("now")),
+        flipped,
+    )
+    conn.execute(
+        update(RecipeFeasibility)
+        .where(RecipeFeasibility.recipe_id == bindparam("rid"))
+        .values(missing=RecipeFeasibility.missing + bindparam("delta")),
+        [{"rid": rid, "delta": d} for rid, d in deltas.items() if d],
+    )
+    return len(deltas)
+
+
+def _set_version(session, version):
+    stmt = insert(Counter).values(name=INDEX_COUNTER, value=version)
+    session.execute(stmt.on_conflict_do_update(index_elements=[Counter.name], set_={"value": version}))
+
+
+def sync():
+    """Index new recipes and catch up with pantry writes this process didn't see."""
+    with _LOCK:
+        session = SessionLocal()
+        try:
+            version = pantry_version(session)
+            indexed = session.get(Counter, INDEX_COUNTER)
+            if indexed is not None and indexed.value != version:
+                _refresh(session)
+            _index_new_recipes(session)
+            _set_version(session, version)
+            session.commit()
+        finally:
+            session.close()
+
+
+def on_pantry_change(names):
+    """
+    Pantry listener: re-check only the recipes that use the changed
+    ingredients, provided the index was current up to this commit. If other
+    writes landed in between (another process, a concurrent commit), their
+    names are unknown, so everything is re-checked.
+    """
+    with _LOCK:
+        session = SessionLocal()
+        try:
+            indexed = session.get(Counter, INDEX_COUNTER)
+            if indexed is None:
+                return  # never built in this database; the first read builds it
+            version = pantry_version(session)
+            if indexed.value in (version, version - 1):  # each pantry commit bumps the version by one
+                _refresh(session, {_name(n) for n in names})
+            else:
+                _refresh(session)
+            _set_version(session, version)
+            session.commit()
+        finally:
+            session.close()
+
+
+add_pantry_listener(on_pantry_change)
+
+
+def _feasible(max_missing):
+    return (RecipeFeasibility.required > 0) & (RecipeFeasibility.missing <= max_missing)
+
+
+def cookable_count(max_missing=0) -> int:
+    """How many cookbook recipes miss at most `max_missing` ingredients (one COUNT query)."""
+    from recipe_store import ensure_seeded
+
+    ensure_seeded()
+    sync()
+    session = SessionLocal()
+    try:
+        return session.execute(select(func.count()).select_from(RecipeFeasibility).where(_feasible(max_missing))).scalar()
+    finally:
+        session.close()
+
+
+def cookable_recipes(max_missing=0, limit=None, titles=None):
+    """
+    Cookbook recipes missing at most `max_missing` ingredients, fewest missing
+    first, as recipe dicts with "used_items" and "missing_items" added.
+    `titles` restricts the result to those titles (case-insensitive).
+    """
+    from recipe_store import ensure_seeded, recipe_to_dict
+
+    ensure_seeded()
+    sync()
+    session = SessionLocal()
+    try:
+        q = (
+            select(Recipe, RecipeFeasibility.missing)
+            .join(RecipeFeasibility, RecipeFeasibility.recipe_id == Recipe.id)
+            .where(_feasible(max_missing))
+            .order_by(RecipeFeasibility.missing, Recipe.id)
+        )
+        if titles is not None:
+            q = q.where(func.lower(Recipe.title).in_({(t or "").lower() for t in titles}))
+        if limit:
+            q = q.limit(limit)
+        rows = session.execute(q).all()
+        flags = {}
+        if rows:
+            for recipe_id, name, ok in session.execute(
+                select(RecipeIngredient.recipe_id, RecipeIngredient.name, RecipeIngredient.satisfied)
+                .where(RecipeIngredient.recipe_id.in_([r.id for r, _ in rows]))
+            ):
+                flags.setdefault(recipe_id, []).append((name, ok))
+    finally:
+        session.close()
+    results = []
+    for recipe, missing in rows:
+        data = recipe_to_dict(recipe)
+        data["used_items"] = [n for n, ok in flags.get(recipe.id, []) if ok]
+        data["missing_items"] = [n for n, ok in flags.get(recipe.id, []) if not ok]
+        data["missing_count"] = missing
+        results.append(data)
+    return results
+
+
+def rebuild():
+    """Drop and rebuild the whole index."""
+    init_db()
+    with _LOCK:
+        session = SessionLocal()
+        try:
+            session.query(RecipeIngredient).delete()
+            session.query(RecipeFeasibility).delete()
+            session.query(Counter).filter(Counter.name == INDEX_COUNTER).delete()
+            session.commit()
+        finally:
+            session.close()
+    sync()
@@ -1,10 +1,15 @@
+import os
+import uuid
 from datetime import datetime, date
 from sqlalchemy import (
-    create_engine, Column, Integer, String, Float, Date, DateTime
+    create_engine, event, inspect, select, text, Boolean, Column, Integer, String, Float, Date, DateTime, Text, JSON,
+    LargeBinary, ForeignKey, UniqueConstraint
 )
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import declarative_base, sessionmaker
 
-DATABASE_URL = "sqlite:///./souschef.db"
+# Override to point tools (benchmarks, generators, batch jobs) at another database
+DATABASE_URL = os.getenv("SOUSCHEF_DATABASE_URL", "sqlite:///./souschef.db")
 
 engine = create_engine(
     DATABASE_URL,
@@ -18,15 +23,321 @@ class Item(Base):
     __tablename__ = "items"
 
     id = Column(Integer, primary_key=True, index=True)
+    household_id = Column(Integer, default=1, index=True)  # which pantry the item belongs to
     name = Column(String, index=True)
     category = Column(String)        # pantry / fridge / freezer
     quantity = Column(Float)
     unit = Column(String)
     purchase_date = Column(Date)
     best_buy_date = Column(Date, nullable=True)
-    best_buy_source = Column(String, default="user")  # user / ai
+    best_buy_source = Column(String, default="user")  # user / ai / pending (AI estimate queued)
     last_updated = Column(DateTime, default=datetime.utcnow)
 
 
+class Recipe(Base):
+    __tablename__ = "recipes"
+    # AUTOINCREMENT keeps ids monotonic: a deleted recipe's id is never reused
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True)
+    title = Column(String, nullable=False, index=True)
+    ingredients = Column(JSON, default=list)  # list of {name, amount, unit}
+    steps = Column(Text)
+    source = Column(String, nullable=True)
+    detailed_steps = Column(Text, nullable=True)
+    servings = Column(Integer, nullable=True)
+    prep_time = Column(String, nullable=True)
+    cook_time = Column(String, nullable=True)
+    tags = Column(JSON, default=list)
+    # sha1 of normalized title + ingredient names; dedups repeated imports
+    content_hash = Column(String, unique=True, index=True, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class RecipeEmbedding(Base):
+    __tablename__ = "recipe_embeddings"
+
+    recipe_id = Column(Integer, ForeignKey("recipes.id", ondelete="CASCADE"), primary_key=True)
+    model = Column(String, primary_key=True)  # embedding model the vector came from
+    dim = Column(Integer)
+    vector = Column(LargeBinary)  # float32 bytes
+
+
+class WebCandidate(Base):
+    """A recipe page returned by web search, deduplicated by URL (or title)."""
+    __tablename__ = "web_candidates"
+
+    id = Column(Integer, primary_key=True)
+    url_key = Column(String, unique=True, index=True, nullable=True)  # normalized URL
+    title_key = Column(String, index=True)  # normalized title
+    payload = Column(JSON)  # recipe dict as returned to callers
+    first_seen = Column(DateTime, default=datetime.utcnow)
+    last_seen = Column(DateTime, default=datetime.utcnow)
+    times_seen = Column(Integer, default=1)
+
+
+class WebSearchCache(Base):
+    __tablename__ = "web_search_cache"
+
+    key = Column(String, primary_key=True)  # sha1 of the sorted ingredient set + top_k
+    ingredients = Column(JSON)
+    candidate_ids = Column(JSON)  # ordered web_candidates ids
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class Job(Base):
+    """Background work item, run by jobs.py workers."""
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, index=True)
+    payload = Column(JSON, default=dict)
+    dedup_key = Column(String, index=True, nullable=True)  # at most one queued job per key
+    status = Column(String, default="queued", index=True)  # queued / running / done / failed
+    attempts = Column(Integer, default=0)
+    error = Column(Text, nullable=True)
+    run_after = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class Counter(Base):
+    __tablename__ = "counters"
+
+    name = Column(String, primary_key=True)
+    value = Column(Integer, default=0)
+
+
+class PrecomputedRecommendation(Base):
+    __tablename__ = "precomputed_recommendations"
+
+    pantry_version = Column(Integer, primary_key=True)  # counters["pantry"] the result was computed for
+    result = Column(JSON)  # {"recipes": [...]} as returned by the agent
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class RecommendationCache(Base):
+    """Agent answers keyed by a fingerprint of the pantry and candidate set (rec_cache.py)."""
+    __tablename__ = "recommendation_cache"
+
+    key = Column(String, primary_key=True)  # sha1 of features + candidates
+    features = Column(JSON)  # bucketed pantry tokens, for near-match lookups
+    candidates = Column(JSON)  # candidate recipe keys
+    result = Column(JSON)
+    hits = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class NightlyReport(Base):
+    """One household's expiry report and recommendations for one nightly run (nightly.py)."""
+    __tablename__ = "nightly_reports"
+    __table_args__ = (UniqueConstraint("run_date", "household_id"),)
+
+    id = Column(Integer, primary_key=True)
+    run_date = Column(Date, index=True)
+    household_id = Column(Integer, index=True)
+    status = Column(String)  # done / failed
+    expired = Column(JSON)  # [{id, name, category, best_buy_date}]
+    expiring_soon = Column(JSON)
+    recommendations = Column(JSON, nullable=True)  # {"recipes": [...]} or None if skipped
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class RecipeIngredient(Base):
+    """One amounted ingredient of a cookbook recipe and whether the pantry covers it (cookable.py)."""
+    __tablename__ = "recipe_ingredients"
+
+    id = Column(Integer, primary_key=True)
+    recipe_id = Column(Integer, ForeignKey("recipes.id", ondelete="CASCADE"), index=True)
+    name = Column(String, index=True)  # lowercased, as matched against Item.name
+    amount = Column(Float)
+    unit = Column(String)
+    satisfied = Column(Boolean, default=False)
+
+
+class RecipeFeasibility(Base):
+    __tablename__ = "recipe_feasibility"
+
+    recipe_id = Column(Integer, ForeignKey("recipes.id", ondelete="CASCADE"), primary_key=True)
+    required = Column(Integer, default=0)  # amounted ingredients
+    missing = Column(Integer, default=0, index=True)  # of those, how many the pantry can't cover
+
+
+class InventoryEvent(Base):
+    """Append-only record of one item's quantity change (ledger.py)."""
+    __tablename__ = "inventory_events"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True)
+    batch_id = Column(String, index=True)  # one per committed transaction
+    reason = Column(String, index=True)  # add / edit / delete / cook / undo
+    note = Column(String, nullable=True)  # e.g. the cooked recipe's title
+    undo_of = Column(String, nullable=True, index=True)  # batch this one compensates
+    item_id = Column(Integer, index=True)
+    household_id = Column(Integer)
+    name = Column(String, index=True)
+    unit = Column(String)
+    delta = Column(Float)
+    quantity_after = Column(Float, nullable=True)  # None once the item is deleted
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class InventorySnapshot(Base):
+    __tablename__ = "inventory_snapshots"
+
+    id = Column(Integer, primary_key=True)
+    event_id = Column(Integer)  # last inventory_events.id folded into `state`
+    state = Column(JSON)  # {item_id: [household_id, name, unit, quantity]}
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+_COLUMNS_CHECKED = False
+
+
+def _add_missing_columns():
+    """
+    create_all() never alters existing tables, so add columns (and their
+    indexes) introduced after a database file was first created.
+    """
+    global _COLUMNS_CHECKED
+    if _COLUMNS_CHECKED:
+        return
+    insp = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not insp.has_table(table.name):
+                continue
+            existing = {c["name"] for c in insp.get_columns(table.name)}
+            missing = [c for c in table.columns if c.name not in existing]
+            for col in missing:
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {col.name} {col.type.compile(dialect=engine.dialect)}"
+                if col.default is not None and col.default.is_scalar:
+                    ddl += f" DEFAULT {col.default.arg!r}"
+                conn.execute(text(ddl))
+            added = {c.name for c in missing}
+            for index in table.indexes:
+                if added & {c.name for c in index.columns}:
+                    index.create(conn, checkfirst=True)
+    _COLUMNS_CHECKED = True
+
+
 def init_db():
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
+
+
+# ---------- Pantry change tracking ----------
+# The first flush of a transaction that adds, changes or deletes an Item bumps
+# counters["pantry"] in that transaction, so each pantry commit moves the
+# version by exactly one; after the commit, listeners get the changed names.
+# Core bulk inserts (bench/synthetic.py) bypass the session and aren't tracked.
+
+PANTRY_COUNTER = "pantry"
+_PANTRY_LISTENERS = []
+
+
+def add_pantry_listener(fn):
+    """Call fn(changed_names) after every commit that changed the pantry."""
+    if fn not in _PANTRY_LISTENERS:
+        _PANTRY_LISTENERS.append(fn)
+
+
+def pantry_version(session=None) -> int:
+    own = session is None
+    session = session or SessionLocal()
+    try:
+        value = session.execute(select(Counter.value).where(Counter.name == PANTRY_COUNTER)).scalar()
+        return int(value or 0)
+    finally:
+        if own:
+            session.close()
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _track_pantry_writes(session, flush_context):
+    changed = {o for o in list(session.new) + list(session.deleted) if isinstance(o, Item)}
+    changed |= {o for o in session.dirty if isinstance(o, Item) and session.is_modified(o)}
+    if not changed:
+        return
+    if "pantry_changed" not in session.info:
+        stmt = sqlite_insert(Counter).values(name=PANTRY_COUNTER, value=1)
+        stmt = stmt.on_conflict_do_update(index_elements=[Counter.name], set_={"value": Counter.value + 1})
+        session.connection().execute(stmt)
+    session.info.setdefault("pantry_changed", set()).update((o.name or "").strip().lower() for o in changed)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _notify_pantry_listeners(session):
+    names = session.info.pop("pantry_changed", None)
+    if not names:
+        return
+    for fn in list(_PANTRY_LISTENERS):
+        try:
+            fn(names)
+        except Exception:
+            # A failing listener must not break the write that triggered it
+            pass
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_pantry_changes(session):
+    session.info.pop("pantry_changed", None)
+
+
+# ---------- Inventory ledger ----------
+# The same flush also appends one inventory_events row per quantity change.
+# Callers label a transaction through session.info before committing:
+# "ledger_reason" (otherwise add / edit / delete per item), "ledger_note" and
+# "ledger_undo_of". Every event of one commit shares a batch id.
+
+_LEDGER_KEYS = ("ledger_batch", "ledger_reason", "ledger_note", "ledger_undo_of")
+
+
+def _quantity_change(session, obj):
+    """(old, new) quantity for an Item in this flush, or None if unchanged."""
+    if obj in session.deleted:
+        hist = inspect(obj).attrs.quantity.history
+        old = hist.deleted[0] if hist.deleted else obj.quantity
+        return float(old or 0.0), None
+    if obj in session.new:
+        return 0.0, float(obj.quantity or 0.0)
+    hist = inspect(obj).attrs.quantity.history
+    if not hist.has_changes():
+        return None
+    old, new = float((hist.deleted[0] if hist.deleted else 0.0) or 0.0), float(obj.quantity or 0.0)
+    return (old, new) if old != new else None
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _record_inventory_events(session, flush_context):
+    items = [o for o in list(session.new) + list(session.dirty) + list(session.deleted) if isinstance(o, Item)]
+    rows = []
+    for obj in items:
+        change = _quantity_change(session, obj)
+        if change is None:
+            continue
+        old, new = change
+        default = "add" if obj in session.new else "delete" if obj in session.deleted else "edit"
+        rows.append({
+            "batch_id": session.info.setdefault("ledger_batch", uuid.uuid4().hex),
+            "reason": session.info.get("ledger_reason") or default,
+            "note": session.info.get("ledger_note"),
+            "undo_of": session.info.get("ledger_undo_of"),
+            "item_id": obj.id,
+            "household_id": obj.household_id,
+            "name": obj.name,
+            "unit": obj.unit,
+            "delta": (new or 0.0) - old,
+            "quantity_after": new,
+        })
+    if rows:
+        session.connection().execute(InventoryEvent.__table__.insert(), rows)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+@event.listens_for(SessionLocal, "after_rollback")
+def _end_ledger_batch(session):
+    for key in _LEDGER_KEYS:
+        session.info.pop(key, None)
@@ -0,0 +1,249 @@
+"""
+Near-duplicate recipe detection with MinHash and LSH.
+
+    python dedup.py                                  # report on recipes/seed_recipes.json
+    python dedup.py recipes.jsonl --write clean.jsonl
+    python dedup.py --db --threshold 0.6             # report on the cookbook table
+
+recipe_store.content_hash only catches exact repeats. Web results and
+"Add to cookbook" also bring in the same dish as "Easy Spinach & Chickpea
+Curry" with "chickpea" instead of "chickpeas". Each recipe is therefore
+reduced to a set of shingles:
+
+- its normalized ingredient names (singularized, counted INGREDIENT_WEIGHT
+  times so a reworded title alone can't hide a copy)
+- the character 3-grams of its title
+
+The shingle set is summarized as a NUM_PERM-value MinHash signature. The
+fraction of equal signature values estimates the Jaccard similarity of two
+sets. The LSH index files every signature under BANDS band hashes. A
+lookup compares a recipe only with those sharing at least one band, not the
+whole cookbook, and reports the ones at or above THRESHOLD.
+
+recipe_store.add_recipe reports a near-duplicate whose title names the same
+dish (same_title) instead of inserting it.
+Online search results and the agent's merged candidate list are filtered
+with unique().
+"""
+
+import argparse
+import json
+import re
+import sys
+import threading
+import zlib
+
+import numpy as np
+
+
+NUM_PERM = 64
+BANDS = 16  # 16 bands x 4 rows: pairs above ~0.5 similarity usually share a band
+ROWS = NUM_PERM // BANDS
+THRESHOLD = 0.7  # estimated Jaccard similarity at which two recipes count as the same
+INGREDIENT_WEIGHT = 3
+_TITLE_FILLER = {"a", "an", "and", "the", "with", "of", "in", "on"}
+
+_PRIME = (1 << 31) - 1  # a * x + b stays below 2**63 for 31-bit a, b and x
+_rng = np.random.RandomState(7)  # fixed: signatures must be comparable across runs
+_A = _rng.randint(1, _PRIME, size=NUM_PERM).astype(np.uint64)
+_B = _rng.randint(0, _PRIME, size=NUM_PERM).astype(np.uint64)
+
+
+def _words(s):
+    words = re.findall(r"[a-z0-9]+", (s or "").lower())
+    # Cheap singular form: "tomatoes"/"tomato", "chickpeas"/"chickpea"
+    return [w[:-2] if w.endswith("oes") else w[:-1] if len(w) > 3 and w.endswith("s") and not w.endswith("ss") else w
+            for w in words]
+
+
+def shingles(recipe) -> set:
+    out = set()
+    for ing in recipe.get("ingredients") or []:
+        if isinstance(ing, dict):
+            name = " ".join(_words(ing.get("name")))
+            if name:
+                out.update(f"i{k}:{name}" for k in range(INGREDIENT_WEIGHT))
+    title = " ".join(_words(recipe.get("title")))
+    out.update("t:" + title[j:j + 3] for j in range(len(title) - 2))
+    return out
+
+
+def same_title(a, b) -> bool:
+    """
+    Whether two titles name the same dish: the words of one (singularized,
+    filler dropped) all appear in the other. "Easy Spinach & Chickpea Curry"
+    matches "Spinach and Chickpea Curry"; "Tomato Soup" and "Tomato Sauce"
+    don't match, however close their ingredients are.
+    """
+    wa = set(_words(a)) - _TITLE_FILLER
+    wb = set(_words(b)) - _TITLE_FILLER
+    return bool(wa and wb) and (wa <= wb or wb <= wa)
+
+
+def signature(shingle_set):
+    """MinHash signature (NUM_PERM,) of a shingle set, or None if it is empty."""
+    if not shingle_set:
+        return None
+    x = np.fromiter((zlib.crc32(s.encode("utf-8")) & _PRIME for s in shingle_set), dtype=np.uint64)
+    return ((_A[:, None] * x[None, :] + _B[:, None]) % _PRIME).min(axis=1).astype(np.uint32)
+
+
+def similarity(sig_a, sig_b) -> float:
+    return float(np.count_nonzero(sig_a == sig_b)) / NUM_PERM
+
+
+class LSHIndex:
+    """Signatures bucketed by band; query() only looks at keys sharing a band."""
+
+    def __init__(self):
+        self.buckets = {}
+        self.signatures = {}
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def add(self, key, sig):
+        self.signatures[key] = sig
+        for band in range(BANDS):
+            self.buckets.setdefault((band, sig[band * ROWS:(band + 1) * ROWS].tobytes()), []).append(key)
+
+    def query(self, sig, threshold=THRESHOLD):
+        """[(key, similarity)] at or above threshold, most similar first."""
+        candidates = set()
+        for band in range(BANDS):
+            candidates.update(self.buckets.get((band, sig[band * ROWS:(band + 1) * ROWS].tobytes()), ()))
+        hits = [(key, similarity(sig, self.signatures[key])) for key in candidates]
+        return sorted((h for h in hits if h[1] >= threshold), key=lambda h: -h[1])
+
+
+def unique(recipes, threshold=THRESHOLD) -> list:
+    """Drop recipes that near-duplicate an earlier one in the list."""
+    index = LSHIndex()
+    out = []
+    for pos, r in enumerate(recipes):
+        if not isinstance(r, dict):
+            continue
+        sig = signature(shingles(r))
+        if sig is not None:
+            if index.query(sig, threshold):
+                continue
+            index.add(pos, sig)
+        out.append(r)
+    return out
+
+
+# ---------- Cookbook index ----------
+# Built lazily from the recipes table and extended with rows added since
+# (ids only grow, see db.Recipe), so each check costs one short query.
+
+_COOKBOOK = None
+_COOKBOOK_TITLES = {}
+_COOKBOOK_LAST_ID = 0
+_LOCK = threading.Lock()
+
+
+def _cookbook_index():
+    global _COOKBOOK, _COOKBOOK_LAST_ID
+    from sqlalchemy import select
+
+    from db import Recipe, SessionLocal
+
+    with _LOCK:
+        if _COOKBOOK is None:
+            _COOKBOOK = LSHIndex()
+        session = SessionLocal()
+        try:
+            rows = session.execute(
+                select(Recipe.id, Recipe.title, Recipe.ingredients)
+                .where(Recipe.id > _COOKBOOK_LAST_ID)
+                .order_by(Recipe.id)
+            ).all()
+        finally:
+            session.close()
+        for recipe_id, title, ingredients in rows:
+            sig = signature(shingles({"title": title, "ingredients": ingredients}))
+            if sig is not None:
+                _COOKBOOK.add(recipe_id, sig)
+                _COOKBOOK_TITLES[recipe_id] = title
+            _COOKBOOK_LAST_ID = recipe_id
+        return _COOKBOOK
+
+
+def find_duplicate(recipe, threshold=THRESHOLD, match_title=False):
+    """
+    (recipe_id, similarity, title) of the closest cookbook recipe at or above
+    threshold, or None. With match_title only recipes whose title names the
+    same dish (same_title) count.
+    """
+    sig = signature(shingles(recipe))
+    if sig is None:
+        return None
+    for recipe_id, sim in _cookbook_index().query(sig, threshold):
+        title = _COOKBOOK_TITLES.get(recipe_id)
+        if not match_title or same_title(recipe.get("title"), title):
+            return recipe_id, sim, title
+    return None
+
+
+# ---------- Batch pass ----------
+
+def clusters(recipes, threshold=THRESHOLD):
+    """[(kept_position, [(duplicate_position, similarity), ...])] for every group of near-duplicates."""
+    index = LSHIndex()
+    groups = {}
+    for pos, r in enumerate(recipes):
+        sig = signature(shingles(r))
+        if sig is None:
+            continue
+        hits = index.query(sig, threshold)
+        if hits:
+            groups.setdefault(hits[0][0], []).append((pos, hits[0][1]))
+        else:
+            index.add(pos, sig)
+    return sorted(groups.items())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find near-duplicate recipes with MinHash/LSH.")
+    parser.add_argument("files", nargs="*", help=".json or .jsonl recipe files (default: the seed file)")
+    parser.add_argument("--db", action="store_true", help="check the cookbook table instead of files")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--write", help="write the recipes without duplicates to this .json/.jsonl file")
+    args = parser.parse_args(argv)
+
+    if args.db:
+        from recipe_store import iter_recipes
+
+        recipes = list(iter_recipes())
+    else:
+        from ingest import iter_records
+        from recipe_store import SEED_FILE
+
+        recipes = [r for path in (args.files or [SEED_FILE]) for r in iter_records(path) if isinstance(r, dict)]
+
+    groups = clusters(recipes, args.threshold)
+    dropped = {pos for _, dups in groups for pos, _ in dups}
+
+    def label(r):
+        return f"{r.get('title')!r}" + (f" (id {r['id']})" if r.get("id") is not None else "")
+
+    for kept, dups in groups:
+        print(f"keep {label(recipes[kept])}")
+        for pos, sim in dups:
+            print(f"  duplicate {label(recipes[pos])}  similarity {sim:.2f}")
+    print(f"{len(recipes)} recipes, {len(dropped)} near-duplicates in {len(groups)} groups")
+
+    if args.write:
+        kept = [r for pos, r in enumerate(recipes) if pos not in dropped]
+        with open(args.write, "w") as f:
+            if args.write.endswith(".jsonl") or args.write.endswith(".ndjson"):
+                for r in kept:
+                    f.write(json.dumps(r) + "\n")
+            else:
+                json.dump(kept, f, indent=2)
+        print(f"wrote {len(kept)} recipes to {args.write}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+"""
+Pluggable text embedders for the recipe index.
+
+Two implementations ship with the app:
+
+- OpenAIEmbedder: `text-embedding-3-small` over the API, sent in bounded
+  concurrent batches with backoff on rate limits.
+- HashingEmbedder: a local CPU embedder (signed feature hashing of word
+  uni/bigrams and character trigrams with sublinear TF weighting, projected
+  into a fixed number of dimensions). It needs no network, no API key and
+  no model download.
+
+Select one with SOUSCHEF_EMBEDDER=openai|local|auto (default auto: OpenAI
+when an API key is configured, otherwise local). Every embedder has a
+stable `id`; stored vectors and indexes are tagged with it so vectors from
+different models are never compared with each other.
+"""
+
+import contextvars
+import hashlib
+import os
+import re
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from llm_adapter import LLM_TIMEOUT, call_with_retries, get_client
+from scheduler import single_flight
+
+
+# The embeddings endpoint accepts up to 2048 inputs and ~300k tokens per
+# request; stay well below both so one oversized batch can't fail the load.
+EMBED_BATCH_SIZE = 256
+EMBED_BATCH_TOKENS = 100_000
+EMBED_MAX_WORKERS = 4
+EMBED_MAX_RETRIES = 6
+
+
+class Embedder:
+    """Base interface: `id` tags stored vectors, `embed` maps texts to float vectors."""
+
+    id = "base"
+
+    def embed(self, texts):
+        raise NotImplementedError
+
+
+def _approx_tokens(text: str) -> int:
+    # ~4 characters per token for English text; good enough for batch sizing
+    return len(text) // 4 + 1
+
+
+def _batches(texts, batch_size, max_tokens):
+    batch, tokens = [], 0
+    for t in texts:
+        n = _approx_tokens(t)
+        if batch and (len(batch) >= batch_size or tokens + n > max_tokens):
+            yield batch
+            batch, tokens = [], 0
+        batch.append(t)
+        tokens += n
+    if batch:
+        yield batch
+
+
+class OpenAIEmbedder(Embedder):
+    # The id predates the embedder interface; keep it so stored vectors stay valid
+    id = "text-embedding-3-small"
+    model = "text-embedding-3-small"
+
+    def _embed_batch(self, client, batch):
+        """One embeddings request under the shared retry/backoff, scheduler and circuit-breaker policy."""
+
+        def request():
+            resp = call_with_retries(
+                lambda: client.embeddings.create(model=self.model, input=batch, timeout=LLM_TIMEOUT),
+                max_retries=EMBED_MAX_RETRIES,
+                tokens=sum(_approx_tokens(t) for t in batch),
+            )
+            return [d.embedding for d in resp.data]
+
+        # Identical concurrent batches (usually the same query) share one request
+        key = hashlib.sha1("\x00".join(batch).encode("utf-8")).hexdigest()
+        return single_flight(("embed", self.model, key), request)
+
+    def embed(self, texts, batch_size=None, max_workers=None):
+        """
+        Embed any number of texts, split into bounded batches that are sent
+        concurrently (at most `max_workers` requests in flight). Output order
+        matches input order.
+        """
+        batch_size = batch_size or EMBED_BATCH_SIZE
+        max_workers = max_workers or EMBED_MAX_WORKERS
+        client = get_client()
+        batches = list(_batches(texts, batch_size, EMBED_BATCH_TOKENS))
+        if len(batches) == 1:
+            results = [self._embed_batch(client, batches[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                # Run each batch in a copy of the caller's context so metrics labels carry over
+                futures = [
+                    pool.submit(contextvars.copy_context().run, self._embed_batch, client, b) for b in batches
+                ]
+                results = [f.result() for f in futures]
+        return [v for chunk in results for v in chunk]
+
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+class HashingEmbedder(Embedder):
+    """
+    Local embedder: signed feature hashing into `dim` buckets.
+
+    Features are word unigrams, word bigrams and character trigrams of each
+    word (so "tomato" and "tomatoes" still overlap). Counts are weighted
+    with 1 + log(tf) and the result is L2-normalized. Deterministic across
+    processes (crc32, not Python's salted hash).
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+        self.id = f"local-hash-{dim}-v1"
+
+    def _features(self, text: str):
+        words = _TOKEN_RE.findall((text or "").lower())
+        feats = list(words)
+        feats += [f"{a}_{b}" for a, b in zip(words, words[1:])]
+        for w in words:
+            padded = f"#{w}#"
+            feats += ["~" + padded[i:i + 3] for i in range(len(padded) - 2)]
+        return feats
+
+    def embed(self, texts, batch_size=None, max_workers=None):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts = {}
+            for f in self._features(text):
+                counts[f] = counts.get(f, 0) + 1
+            if not counts:
+                continue
+            hashes = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in counts), dtype=np.uint32, count=len(counts))
+            tf = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+            # Low bits pick the bucket, the top bit picks the sign
+            signs = np.where(hashes >> 31, -1.0, 1.0).astype(np.float32)
+            np.add.at(out[row], hashes % self.dim, signs * (1.0 + np.log(tf)))
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (out / norms).tolist()
+
+
+_EMBEDDERS = {}  # id -> instance
+
+
+def _register(embedder: Embedder) -> Embedder:
+    return _EMBEDDERS.setdefault(embedder.id, embedder)
+
+
+def embedder_mode() -> str:
+    return (os.getenv("SOUSCHEF_EMBEDDER") or "auto").strip().lower()
+
+
+def local_embedder() -> Embedder:
+    return _register(HashingEmbedder())
+
+
+def get_embedder(embedder_id: str = None) -> Embedder:
+    """
+    Return the embedder with the given id, or the configured default.
+
+    Pass the id an index was built with to embed queries for that index.
+    """
+    if embedder_id:
+        if embedder_id in _EMBEDDERS:
+            return _EMBEDDERS[embedder_id]
+        if embedder_id == OpenAIEmbedder.id:
+            return _register(OpenAIEmbedder())
+        if embedder_id.startswith("local-hash-"):
+            return _register(HashingEmbedder(dim=int(embedder_id.split("-")[2])))
+        raise ValueError(f"Unknown embedder id: {embedder_id}")
+
+    mode = embedder_mode()
+    if mode == "local":
+        return local_embedder()
+    if mode == "openai":
+        return _register(OpenAIEmbedder())
+    # auto: use OpenAI only when a key is configured
+    try:
+        get_client()
+        return _register(OpenAIEmbedder())
+    except Exception:
+        return local_embedder()
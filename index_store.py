@@ -0,0 +1,193 @@
+"""
+Publish the recipe index once and share it between worker processes.
+
+A build writes the index arrays as .npy files into a new generation
+directory and then atomically repoints CURRENT at it:
+
+    <SOUSCHEF_INDEX_DIR>/<embedder id>-<dtype>-<database fingerprint>/
+        CURRENT          generation number of the live index
+        build.lock       serializes builders across processes
+        gen-<N>/         vectors.npy, scales.npy (int8 only), ids.npy, meta.json
+
+meta.json records the recipe count and highest recipe id the generation was
+built from, so a reader can tell when the recipe store has moved on.
+
+Workers attach with np.load(mmap_mode="r"): the arrays are read-only views
+of the same page-cache pages, so N processes hold one copy of the vectors
+instead of N. Each query stats CURRENT; when a rebuild has published a new
+generation the worker swaps to it without restarting.
+
+Set SOUSCHEF_SHARED_INDEX=0 to keep a private in-process index instead.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from db import engine
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process build lock, builds may duplicate work
+    fcntl = None
+
+
+KEEP_GENERATIONS = 2  # the previous generation stays on disk for workers still mapped to it
+
+
+def shared_index_enabled() -> bool:
+    return os.getenv("SOUSCHEF_SHARED_INDEX", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def db_fingerprint() -> str:
+    """Short hash of the database in use, so indexes of different databases never share a directory."""
+    url = engine.url
+    if url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:"):
+        target = os.path.abspath(url.database)
+    else:
+        target = url.render_as_string(hide_password=True)
+    return hashlib.sha1(target.encode("utf-8")).hexdigest()[:12]
+
+
+def index_dir(embedder_id: str, dtype: str) -> str:
+    root = os.getenv("SOUSCHEF_INDEX_DIR") or ".index_cache"
+    return os.path.join(root, f"{embedder_id}-{dtype}-{db_fingerprint()}")
+
+
+def _current_path(base: str) -> str:
+    return os.path.join(base, "CURRENT")
+
+
+def _read_generation(base: str):
+    try:
+        with open(_current_path(base), "r") as f:
+            return int(f.read().strip())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _current_stamp(base: str):
+    try:
+        st = os.stat(_current_path(base))
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+    except FileNotFoundError:
+        return None
+
+
+@contextmanager
+def build_lock(embedder_id: str, dtype: str):
+    """Exclusive cross-process lock held while a generation is built and published."""
+    base = index_dir(embedder_id, dtype)
+    os.makedirs(base, exist_ok=True)
+    with open(os.path.join(base, "build.lock"), "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def current_generation(embedder_id: str, dtype: str):
+    return _read_generation(index_dir(embedder_id, dtype))
+
+
+def publish(index: dict, dtype: str) -> int:
+    """
+    Write `index` (vectors, scales, ids, embedder, store) as the next generation.
+
+    Call with build_lock held. Returns the new generation number.
+    """
+    base = index_dir(index["embedder"], dtype)
+    os.makedirs(base, exist_ok=True)
+    generation = (_read_generation(base) or 0) + 1
+    final = os.path.join(base, f"gen-{generation}")
+    tmp = final + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    np.save(os.path.join(tmp, "vectors.npy"), index["vectors"])
+    np.save(os.path.join(tmp, "ids.npy"), np.asarray(index["ids"], dtype=np.int64))
+    if index.get("scales") is not None:
+        np.save(os.path.join(tmp, "scales.npy"), index["scales"])
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(
+            {
+                "generation": generation,
+                "embedder": index["embedder"],
+                "dtype": dtype,
+                "count": int(len(index["ids"])),
+                "store": list(index["store"]),  # recipe_store.store_stamp() at build time
+                "built_at": time.time(),
+            },
+            f,
+        )
+    os.replace(tmp, final)
+
+    # Repoint CURRENT atomically; readers see either the old or the new number
+    cur_tmp = _current_path(base) + ".tmp"
+    with open(cur_tmp, "w") as f:
+        f.write(str(generation))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(cur_tmp, _current_path(base))
+
+    _prune(base, generation)
+    return generation
+
+
+def _prune(base: str, generation: int) -> None:
+    for name in os.listdir(base):
+        if not name.startswith("gen-") or name.endswith(".tmp"):
+            continue
+        try:
+            gen = int(name[len("gen-"):])
+        except ValueError:
+            continue
+        if gen <= generation - KEEP_GENERATIONS:
+            # Safe on POSIX even if a worker still maps it: the pages live until unmapped
+            shutil.rmtree(os.path.join(base, name), ignore_errors=True)
+
+
+def attach(embedder_id: str, dtype: str):
+    """Map the live generation read-only, or return None if nothing is published yet."""
+    base = index_dir(embedder_id, dtype)
+    stamp = _current_stamp(base)
+    generation = _read_generation(base)
+    if generation is None:
+        return None
+    path = os.path.join(base, f"gen-{generation}")
+    try:
+        with open(os.path.join(path, "meta.json"), "r") as f:
+            meta = json.load(f)
+        vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        ids = np.load(os.path.join(path, "ids.npy"), mmap_mode="r")
+        scales_path = os.path.join(path, "scales.npy")
+        scales = np.load(scales_path, mmap_mode="r") if os.path.exists(scales_path) else None
+    except FileNotFoundError:
+        return None  # pruned between reading CURRENT and opening; caller retries or rebuilds
+    if meta.get("embedder") != embedder_id or meta.get("dtype") != dtype:
+        return None
+    return {
+        "vectors": vectors,
+        "scales": scales,
+        "ids": ids,
+        "embedder": embedder_id,
+        "dtype": dtype,
+        "generation": generation,
+        "stamp": stamp,
+        "store": tuple(meta.get("store") or ()),
+    }
+
+
+def is_stale(index: dict) -> bool:
+    """True when a newer generation has been published since `index` was attached."""
+    if index.get("generation") is None:
+        return False  # private in-process index
+    return _current_stamp(index_dir(index["embedder"], index["dtype"])) != index.get("stamp")
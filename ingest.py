@@ -0,0 +1,147 @@
+"""
+Bulk recipe ingestion into the cookbook.
+
+    python ingest.py recipes.jsonl [more.jsonl ...] [--chunk-size 1000]
+                     [--batch-size 256] [--workers 4] [--no-embed]
+
+Input files are JSON Lines (one recipe object per line, streamed) or plain
+JSON (a list of recipes, or an object with a "recipes" list; loaded whole,
+so prefer JSONL for very large datasets). Recipes use the seed schema:
+title, ingredients [{name, amount, unit}], steps, servings, tags, ...
+
+Records are deduplicated by a hash of title + ingredient names, inserted in
+chunks and embedded in bounded-size concurrent batches with rate-limit
+backoff (see embedders.OpenAIEmbedder); vectors are stored for the
+configured embedder (SOUSCHEF_EMBEDDER). After every chunk the number of
+records consumed per file is written to the checkpoint file, so re-running
+the same command after an interruption resumes where it stopped.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import embedders
+import rag
+from recipe_store import bulk_import, content_hash, ensure_seeded, ids_for_hashes
+
+
+CHECKPOINT_FILE = ".ingest_checkpoint.json"
+
+
+def iter_records(path, skip=0):
+    """Yield recipe dicts from a .jsonl or .json file, skipping the first `skip` records."""
+    if path.endswith(".jsonl") or path.endswith(".ndjson"):
+        with open(path, "r") as f:
+            seen = 0
+            for line in f:
+                if not line.strip():
+                    continue
+                seen += 1
+                if seen <= skip:
+                    continue  # don't pay for json parsing of already-ingested lines
+                yield json.loads(line)
+        return
+
+    with open(path, "r") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("recipes", [])
+    for rec in data[skip:]:
+        yield rec
+
+
+def _valid(rec) -> bool:
+    return (
+        isinstance(rec, dict)
+        and bool(rec.get("title"))
+        and isinstance(rec.get("ingredients"), list)
+        and all(isinstance(i, dict) and i.get("name") for i in rec["ingredients"])
+    )
+
+
+def load_checkpoint(path=CHECKPOINT_FILE) -> dict:
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_checkpoint(data: dict, path=CHECKPOINT_FILE) -> None:
+    # Write-then-rename so a crash mid-write never leaves a truncated checkpoint
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _chunks(records, size):
+    chunk = []
+    for rec in records:
+        chunk.append(rec)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def ingest_file(path, checkpoint, checkpoint_path=CHECKPOINT_FILE, chunk_size=1000, embed=True):
+    """Ingest one file, updating `checkpoint` after each chunk. Returns (read, inserted, embedded)."""
+    key = os.path.abspath(path)
+    done = checkpoint.get(key, 0)
+    read = inserted = embedded = 0
+    for chunk in _chunks(iter_records(path, skip=done), chunk_size):
+        valid = [r for r in chunk if _valid(r)]
+        inserted += bulk_import(valid)
+        if embed and valid:
+            # Embed by hash rather than "newly inserted" so a chunk that was
+            # inserted but not embedded before a crash is completed on resume.
+            ids = ids_for_hashes({content_hash(r) for r in valid})
+            embedded += rag.embed_missing(ids)
+        read += len(chunk)
+        checkpoint[key] = done + read
+        save_checkpoint(checkpoint, checkpoint_path)
+        print(
+            f"[ingest] {path}: {done + read} records read, {inserted} new, {embedded} embedded",
+            file=sys.stderr,
+        )
+    return read, inserted, embedded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-load recipes into the SousChef cookbook.")
+    parser.add_argument("files", nargs="+", help=".jsonl/.ndjson or .json recipe files")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="records inserted per transaction/checkpoint")
+    parser.add_argument("--batch-size", type=int, default=embedders.EMBED_BATCH_SIZE, help="texts per embeddings request")
+    parser.add_argument("--workers", type=int, default=embedders.EMBED_MAX_WORKERS, help="concurrent embeddings requests")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_FILE, help="progress file used to resume")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start from the beginning")
+    parser.add_argument("--no-embed", action="store_true", help="only insert recipes; embed later at index build")
+    args = parser.parse_args(argv)
+
+    embedders.EMBED_BATCH_SIZE = args.batch_size
+    embedders.EMBED_MAX_WORKERS = args.workers
+
+    ensure_seeded()
+    checkpoint = {} if args.restart else load_checkpoint(args.checkpoint)
+    totals = [0, 0, 0]
+    for path in args.files:
+        counts = ingest_file(
+            path,
+            checkpoint,
+            checkpoint_path=args.checkpoint,
+            chunk_size=args.chunk_size,
+            embed=not args.no_embed,
+        )
+        totals = [a + b for a, b in zip(totals, counts)]
+    if totals[1] and not args.no_embed:
+        # Publish a new index generation; running app workers hot-swap to it
+        rag.build_index()
+    print(f"[ingest] done: {totals[0]} read, {totals[1]} new recipes, {totals[2]} embedded", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""
+Background jobs backed by the `jobs` table.
+
+Work is queued as rows and run by a small thread pool inside the app
+process (start_worker), so nothing is lost on a restart and several
+processes can share one queue: a job is claimed with a single
+UPDATE ... WHERE status = 'queued', which only one worker can win.
+
+Two kinds of work ship with the app:
+
+- best_by: fill in the AI best-by estimate for an item that was added with
+  best_buy_source="pending", so "Add item" returns immediately.
+- recommend: whenever the pantry changes (db.add_pantry_listener), or
+  when the Recipe page finds nothing stored, precompute the agent's
+  recommendations for the current pantry version. The Recipe page serves
+  the stored result instantly while it still matches the current version.
+
+SOUSCHEF_WORKER=0 disables the in-app worker; SOUSCHEF_WORKER_THREADS sets
+the pool size (default 2). `python jobs.py` drains the queue once and exits.
+"""
+
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import delete, select, update
+
+from db import (
+    Item, Job, PrecomputedRecommendation, SessionLocal, add_pantry_listener, init_db, pantry_version,
+)
+from scheduler import BACKGROUND, priority
+
+
+MAX_ATTEMPTS = 3
+POLL_INTERVAL = 2.0  # seconds between queue checks when nothing was enqueued in-process
+STALE_AFTER = timedelta(minutes=10)  # running this long means the worker died
+
+HANDLERS = {}  # kind -> fn(payload)
+
+
+def handler(kind):
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+
+    return register
+
+
+# ---------- Queue ----------
+
+_WAKE = threading.Event()
+
+
+def enqueue(kind, payload=None, dedup_key=None) -> int:
+    """Queue a job; with a dedup_key, an already queued job with that key is reused."""
+    session = SessionLocal()
+    try:
+        if dedup_key:
+            existing = session.execute(
+                select(Job.id).where(Job.dedup_key == dedup_key, Job.status == "queued")
+            ).scalar()
+            if existing:
+                return existing
+        job = Job(kind=kind, payload=payload or {}, dedup_key=dedup_key)
+        session.add(job)
+        session.commit()
+        job_id = job.id
+    finally:
+        session.close()
+    _WAKE.set()
+    return job_id
+
+
+def claim():
+    """Atomically take the oldest runnable job; returns (id, kind, payload) or None."""
+    session = SessionLocal()
+    try:
+        while True:
+            now = datetime.utcnow()
+            row = session.execute(
+                select(Job.id, Job.kind, Job.payload)
+                .where(Job.status == "queued", Job.run_after <= now)
+                .order_by(Job.id)
+                .limit(1)
+            ).first()
+            if row is None:
+                return None
+            won = session.execute(
+                update(Job)
+                .where(Job.id == row.id, Job.status == "queued")
+                .values(status="running", started_at=now, attempts=Job.attempts + 1)
+            ).rowcount
+            session.commit()
+            if won:
+                return row.id, row.kind, row.payload or {}
+            # Another worker got it first; try the next one
+    finally:
+        session.close()
+
+
+def _finish(job_id, error=None):
+    session = SessionLocal()
+    try:
+        job = session.get(Job, job_id)
+        job.finished_at = datetime.utcnow()
+        if error is None:
+            job.status, job.error = "done", None
+        elif job.attempts < MAX_ATTEMPTS:
+            # Back off 30s, 60s, ... before the next attempt
+            job.status, job.error = "queued", error
+            job.run_after = datetime.utcnow() + timedelta(seconds=30 * job.attempts)
+        else:
+            job.status, job.error = "failed", error
+        session.commit()
+        return job.status
+    finally:
+        session.close()
+
+
+def run_job(job_id, kind, payload):
+    fn = HANDLERS.get(kind)
+    try:
+        if fn is None:
+            raise ValueError(f"No handler for job kind {kind!r}")
+        with priority(BACKGROUND):  # users waiting on the model go first
+            fn(payload)
+    except Exception as e:
+        if _finish(job_id, f"{type(e).__name__}: {e}") == "failed" and kind == "best_by":
+            _give_up_best_by(payload)
+        return False
+    _finish(job_id)
+    return True
+
+
+def run_pending(max_jobs=None) -> int:
+    """Run queued jobs in this thread until the queue is empty; returns how many ran."""
+    n = 0
+    while max_jobs is None or n < max_jobs:
+        job = claim()
+        if job is None:
+            break
+        run_job(*job)
+        n += 1
+    return n
+
+
+def requeue_stale():
+    """Put back jobs left 'running' by a worker that died."""
+    session = SessionLocal()
+    try:
+        session.execute(
+            update(Job)
+            .where(Job.status == "running", Job.started_at < datetime.utcnow() - STALE_AFTER)
+            .values(status="queued")
+        )
+        session.commit()
+    finally:
+        session.close()
+
+
+def queue_stats() -> dict:
+    session = SessionLocal()
+    try:
+        rows = session.execute(select(Job.status, Job.kind)).all()
+    finally:
+        session.close()
+    stats = {}
+    for status, kind in rows:
+        stats.setdefault(status, {}).setdefault(kind, 0)
+        stats[status][kind] += 1
+    return stats
+
+
+# ---------- Worker ----------
+
+_WORKER = None
+_WORKER_LOCK = threading.Lock()
+
+
+def worker_enabled() -> bool:
+    return os.getenv("SOUSCHEF_WORKER", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def _worker_loop(pool, slots):
+    while True:
+        _WAKE.wait(POLL_INTERVAL)
+        _WAKE.clear()
+        while slots.acquire(blocking=False):
+            job = claim()
+            if job is None:
+                slots.release()
+                break
+
+            def run(job=job):
+                try:
+                    run_job(*job)
+                finally:
+                    slots.release()
+                    _WAKE.set()  # look for more work
+
+            pool.submit(run)
+
+
+def start_worker(max_workers=None):
+    """Start the in-process worker once (no-op when disabled or already running)."""
+    global _WORKER
+    if not worker_enabled():
+        return None
+    with _WORKER_LOCK:
+        if _WORKER is not None:
+            return _WORKER
+        init_db()
+        requeue_stale()
+        _queue_pending_best_by()
+        add_pantry_listener(on_pantry_change)
+        max_workers = max_workers or int(os.getenv("SOUSCHEF_WORKER_THREADS") or 2)
+        pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="souschef-job")
+        _WORKER = threading.Thread(
+            target=_worker_loop, args=(pool, threading.Semaphore(max_workers)), name="souschef-jobs", daemon=True
+        )
+        _WORKER.start()
+        _WAKE.set()
+        return _WORKER
+
+
+# ---------- Best-by estimates ----------
+
+def queue_best_by(item_id):
+    return enqueue("best_by", {"item_id": item_id}, dedup_key=f"best_by:{item_id}")
+
+
+def _queue_pending_best_by():
+    session = SessionLocal()
+    try:
+        ids = session.execute(select(Item.id).where(Item.best_buy_source == "pending")).scalars().all()
+    finally:
+        session.close()
+    for item_id in ids:
+        queue_best_by(item_id)
+
+
+@handler("best_by")
+def _fill_best_by(payload):
+    from ai import estimate_best_buy
+
+    session = SessionLocal()
+    try:
+        item = session.get(Item, payload["item_id"])
+        if item is None or item.best_buy_source != "pending":
+            return  # deleted, or the user set a date meanwhile
+        result = estimate_best_buy(item.name, item.category, item.purchase_date or date.today())
+        item.best_buy_date = date.fromisoformat(result["best_buy_date"])
+        item.best_buy_source = "ai"
+        session.commit()
+    finally:
+        session.close()
+
+
+def _give_up_best_by(payload):
+    """After the last failed attempt, stop showing the item as pending."""
+    session = SessionLocal()
+    try:
+        item = session.get(Item, payload.get("item_id"))
+        if item is not None and item.best_buy_source == "pending":
+            item.best_buy_source = "user"
+            session.commit()
+    finally:
+        session.close()
+
+
+# ---------- Precomputed recommendations ----------
+
+def on_pantry_change(names):
+    enqueue("recommend", dedup_key="recommend")
+
+
+def request_recommendations():
+    """
+    Queue a precompute for the current pantry (the handler skips it if one is
+    stored). The Recipe page calls this when it finds nothing ready; nothing
+    is precomputed at startup, so the app doesn't load the LLM stack before
+    anyone asks for it.
+    """
+    if worker_enabled():
+        on_pantry_change(set())
+
+
+def precomputed_recommendations():
+    """The stored recommendations if they match the current pantry, else None."""
+    session = SessionLocal()
+    try:
+        row = session.get(PrecomputedRecommendation, pantry_version(session))
+        return row.result if row is not None else None
+    finally:
+        session.close()
+
+
+@handler("recommend")
+def _precompute_recommendations(payload):
+    from agent import recommend_recipes_with_agent
+
+    version = pantry_version()
+    session = SessionLocal()
+    try:
+        if session.get(PrecomputedRecommendation, version) is not None:
+            return
+    finally:
+        session.close()
+
+    result = recommend_recipes_with_agent()
+
+    session = SessionLocal()
+    try:
+        # Results for older pantry versions can never be served again
+        session.execute(delete(PrecomputedRecommendation).where(PrecomputedRecommendation.pantry_version < version))
+        session.merge(PrecomputedRecommendation(pantry_version=version, result=result))
+        session.commit()
+    finally:
+        session.close()
+    if pantry_version() != version:
+        # The pantry changed while the agent was running; compute again for the new version
+        on_pantry_change(set())
+
+
+def main(argv=None):
+    init_db()
+    requeue_stale()
+    _queue_pending_best_by()
+    n = run_pending()
+    print(f"ran {n} jobs; queue: {queue_stats()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
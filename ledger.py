@@ -0,0 +1,227 @@
+"""
+Inventory ledger: history, undo and consumption rates.
+
+db.py appends an inventory_events row for every quantity change in the
+same flush that makes it: adding an item, Save, Delete, "Cook this", and
+API writes. items.quantity stays the live value, and the ledger is the
+history behind it. Events are never updated or deleted.
+
+current_state() rebuilds the pantry from the latest inventory_snapshots row
+plus the events after it. Once that tail reaches SNAPSHOT_EVERY events, a
+new snapshot is written, so reads stay short however long the history
+gets. The first snapshot is the items table itself, so pantries that
+predate the ledger start from what they hold.
+
+undo(batch_id) compensates one committed batch, for example a cooked
+recipe, by applying the opposite deltas in a new batch. The cost depends
+only on the size of that batch. consumption_rates() and
+reorder_suggestions() turn the cook and edit history into per-day usage
+for the Grocery List page, once the ledger covers MIN_HISTORY_DAYS.
+"""
+
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from db import InventoryEvent, InventorySnapshot, Item, SessionLocal
+from pantry import convert_amount
+
+
+SNAPSHOT_EVERY = 500  # tail length at which current_state() writes a new snapshot
+KEEP_SNAPSHOTS = 3
+CONSUMPTION_REASONS = ("cook", "edit")  # decreases that count as usage (not deletes)
+MIN_HISTORY_DAYS = 7  # a younger ledger has too little history for a daily rate
+
+
+def _name(s) -> str:
+    return (s or "").strip().lower()
+
+
+def _store_snapshot(session, state, event_id):
+    session.add(InventorySnapshot(event_id=event_id, state=state))
+    old = session.execute(
+        select(InventorySnapshot.id).order_by(InventorySnapshot.id.desc()).offset(KEEP_SNAPSHOTS - 1)
+    ).scalars().all()
+    if old:
+        session.query(InventorySnapshot).filter(InventorySnapshot.id.in_(old)).delete(synchronize_session=False)
+    session.commit()
+
+
+def _latest_snapshot(session):
+    snap = session.execute(
+        select(InventorySnapshot).order_by(InventorySnapshot.id.desc()).limit(1)
+    ).scalar_one_or_none()
+    if snap is not None:
+        return snap.state, snap.event_id
+    # Baseline: the items table as it is now, which already reflects every event so far
+    last = session.execute(select(func.max(InventoryEvent.id))).scalar() or 0
+    state = {str(i.id): [i.household_id, i.name, i.unit, float(i.quantity or 0.0)] for i in session.query(Item)}
+    _store_snapshot(session, state, last)
+    return state, last
+
+
+def _fold(state, events):
+    for e in events:
+        if e.quantity_after is None:
+            state.pop(str(e.item_id), None)
+        else:
+            state[str(e.item_id)] = [e.household_id, e.name, e.unit, e.quantity_after]
+
+
+def current_state(household_id=None):
+    """[{item_id, household_id, name, unit, quantity}] from the latest snapshot plus the event tail."""
+    session = SessionLocal()
+    try:
+        snap, event_id = _latest_snapshot(session)
+        tail = session.execute(
+            select(InventoryEvent).where(InventoryEvent.id > event_id).order_by(InventoryEvent.id)
+        ).scalars().all()
+        state = dict(snap)
+        _fold(state, tail)
+        if len(tail) >= SNAPSHOT_EVERY:
+            _store_snapshot(session, state, tail[-1].id)
+    finally:
+        session.close()
+    return [
+        {"item_id": int(k), "household_id": h, "name": name, "unit": unit, "quantity": qty}
+        for k, (h, name, unit, qty) in state.items()
+        if household_id is None or h == household_id
+    ]
+
+
+def _same_item(item, event):
+    """Whether the live row is still the item `event` was recorded for (ids can be reused)."""
+    return (_name(item.name), _name(item.unit)) == (_name(event.name), _name(event.unit))
+
+
+def undo(batch_id):
+    """Apply the opposite of every delta in `batch_id` as one new batch; returns its id."""
+    session = SessionLocal()
+    try:
+        if session.execute(select(InventoryEvent.id).where(InventoryEvent.undo_of == batch_id).limit(1)).first():
+            raise ValueError(f"Batch {batch_id} was already undone")
+        events = session.execute(
+            select(InventoryEvent).where(InventoryEvent.batch_id == batch_id).order_by(InventoryEvent.id.desc())
+        ).scalars().all()
+        if not events:
+            raise ValueError(f"No inventory batch {batch_id}")
+        new_batch = uuid.uuid4().hex
+        session.info.update(ledger_batch=new_batch, ledger_reason="undo", ledger_undo_of=batch_id,
+                            ledger_note=events[0].note)
+        for e in events:
+            item = session.get(Item, e.item_id)
+            if item is not None and not _same_item(item, e):
+                item = None  # SQLite reused a deleted item's id for another item
+            if item is None:
+                if e.quantity_after is None:
+                    # Deleted in that batch: bring it back (name, unit and quantity only), under
+                    # its old id unless another item has taken it since
+                    taken = session.get(Item, e.item_id) is not None
+                    session.add(Item(id=None if taken else e.item_id, household_id=e.household_id, name=e.name,
+                                     unit=e.unit, quantity=-e.delta))
+                continue  # deleted since; nothing left to compensate
+            item.quantity = max(0.0, float(item.quantity or 0.0) - e.delta)
+            item.last_updated = datetime.utcnow()
+        session.commit()
+        return new_batch
+    finally:
+        session.close()
+
+
+def recent_batches(reason="cook", limit=5, household_id=None):
+    """Newest batches of one kind: [{batch_id, note, created_at, items, undone}]."""
+    session = SessionLocal()
+    try:
+        q = (
+            select(InventoryEvent.batch_id, func.max(InventoryEvent.note), func.min(InventoryEvent.created_at),
+                   func.count(InventoryEvent.id))
+            .where(InventoryEvent.reason == reason)
+            .group_by(InventoryEvent.batch_id)
+            .order_by(func.max(InventoryEvent.id).desc())
+            .limit(limit)
+        )
+        if household_id is not None:
+            q = q.where(InventoryEvent.household_id == household_id)
+        rows = session.execute(q).all()
+        undone = set(session.execute(
+            select(InventoryEvent.undo_of).where(InventoryEvent.undo_of.in_([r[0] for r in rows]))
+        ).scalars())
+    finally:
+        session.close()
+    return [
+        {"batch_id": b, "note": note, "created_at": created, "items": n, "undone": b in undone}
+        for b, note, created, n in rows
+    ]
+
+
+def consumption_rates(days=28, household_id=None, now=None):
+    """
+    {name: {"unit", "per_day"}} from cook/edit decreases over the last `days`,
+    excluding undone batches. Empty until the ledger spans MIN_HISTORY_DAYS.
+    """
+    now = now or datetime.utcnow()
+    since = now - timedelta(days=days)
+    session = SessionLocal()
+    try:
+        undone = select(InventoryEvent.undo_of).where(InventoryEvent.undo_of.isnot(None))
+        q = (
+            select(InventoryEvent.name, InventoryEvent.unit, func.sum(InventoryEvent.delta))
+            .where(
+                InventoryEvent.created_at >= since,
+                InventoryEvent.delta < 0,
+                InventoryEvent.reason.in_(CONSUMPTION_REASONS),
+                InventoryEvent.batch_id.notin_(undone),
+            )
+            .group_by(InventoryEvent.name, InventoryEvent.unit)
+        )
+        if household_id is not None:
+            q = q.where(InventoryEvent.household_id == household_id)
+        rows = session.execute(q).all()
+        first = session.execute(select(func.min(InventoryEvent.created_at))).scalar()
+    finally:
+        session.close()
+    observed = (now - first).total_seconds() / 86400.0 if first else 0.0
+    if observed < MIN_HISTORY_DAYS:
+        return {}  # one cook right after install is not a daily rate
+    # Don't spread usage over days the ledger didn't record
+    span = min(float(days), observed)
+    totals = {}
+    for name, unit, total in rows:
+        key = _name(name)
+        unit = (unit or "").strip().lower()
+        if key not in totals:
+            totals[key] = [unit, 0.0]
+        converted, ok = convert_amount(-float(total), unit or totals[key][0], totals[key][0] or unit)
+        if ok:
+            totals[key][1] += converted
+    return {name: {"unit": unit, "per_day": used / span} for name, (unit, used) in totals.items() if used > 0}
+
+
+def reorder_suggestions(horizon_days=7, lookback_days=28, household_id=None):
+    """
+    Items that will run out within `horizon_days` at the recent usage rate:
+    [{name, unit, amount, per_day, days_left}] with `amount` enough to last the horizon.
+    """
+    rates = consumption_rates(lookback_days, household_id)
+    have = {}
+    for row in current_state(household_id):
+        key = _name(row["name"])
+        if key not in rates:
+            continue
+        converted, ok = convert_amount(row["quantity"] or 0.0, row["unit"] or rates[key]["unit"], rates[key]["unit"])
+        if ok:
+            have[key] = have.get(key, 0.0) + converted
+    suggestions = []
+    for name, rate in rates.items():
+        stock = have.get(name, 0.0)
+        amount = rate["per_day"] * horizon_days - stock
+        if amount > 0:
+            suggestions.append({
+                "name": name,
+                "unit": rate["unit"],
+                "amount": round(amount, 2),
+                "per_day": round(rate["per_day"], 2),
+                "days_left": round(stock / rate["per_day"], 1),
+            })
+    return sorted(suggestions, key=lambda s: s["days_left"])
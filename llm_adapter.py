@@ -0,0 +1,364 @@
+"""
+One entry point for JSON completions from OpenAI.
+
+The SDK differs between versions (Responses API, chat completions, legacy
+completions) and so do compatible endpoints. Instead of every caller trying
+each shape in turn, the adapter picks a path once per process: when the
+module is loaded the SDK is probed for the first shape it exposes, and if
+the endpoint rejects that shape (missing route, unsupported arguments) the
+adapter moves to the next one and remembers the choice. Errors about the
+request itself, such as an unknown model, never change the path. The
+client itself is built once and reused.
+
+All calls share one policy: a per-request timeout (SOUSCHEF_LLM_TIMEOUT,
+default 60s), retries with exponential backoff and jitter on rate limits
+and transient errors, and a circuit breaker that fails fast for a while
+after repeated upstream failures instead of stacking up timeouts. Each
+attempt waits for its turn in the process-wide scheduler (scheduler.py:
+rate limits, priorities), and identical concurrent completions share one
+call.
+
+    from llm_adapter import complete_json
+    data = complete_json(system, user, schema={"best_buy_date": "YYYY-MM-DD", "reason": "..."})
+"""
+
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+
+from llm_metrics import record_retry
+from openai_utils import get_openai_client, response_text
+from scheduler import SCHEDULER, single_flight
+
+
+DEFAULT_MODEL = "gpt-4.1-mini"
+LEGACY_MODEL = "gpt-3.5-turbo-instruct"
+LLM_TIMEOUT = float(os.getenv("SOUSCHEF_LLM_TIMEOUT") or 60)
+LLM_MAX_RETRIES = 4
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+BREAKER_THRESHOLD = 5  # consecutive upstream failures before the breaker opens
+BREAKER_COOLDOWN = 30.0  # seconds to fail fast before letting one trial call through
+OUTPUT_TOKENS_ESTIMATE = 1000  # counted against the TPM budget on top of the prompt
+
+
+class LLMError(RuntimeError):
+    pass
+
+
+class CircuitOpenError(LLMError):
+    pass
+
+
+class InvalidJSONError(LLMError):
+    """The model answered, but not with a JSON object. `raw` holds the text."""
+
+    def __init__(self, message, raw=None):
+        super().__init__(message)
+        self.raw = raw
+
+
+# ---------- Retry policy ----------
+
+def is_retryable(exc) -> bool:
+    try:
+        import openai
+    except Exception:
+        return False
+    return isinstance(
+        exc,
+        (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError),
+    )
+
+
+def is_rate_limit(exc) -> bool:
+    try:
+        import openai
+    except Exception:
+        return False
+    return isinstance(exc, openai.RateLimitError)
+
+
+def is_connection_error(exc) -> bool:
+    if isinstance(exc, CircuitOpenError):
+        return True
+    try:
+        import openai
+    except Exception:
+        return False
+    return isinstance(exc, (openai.APIConnectionError, openai.APITimeoutError))
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter on top: attempt 0 sleeps 1-2s, capped at BACKOFF_MAX."""
+    delay = min(BACKOFF_BASE * (2 ** attempt), BACKOFF_MAX)
+    return delay + random.uniform(0, delay)
+
+
+class CircuitBreaker:
+    """Closed -> open after `threshold` consecutive failures -> one trial call after `cooldown`."""
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half-open" if time.monotonic() - self._opened_at >= self.cooldown else "open"
+
+    def before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < self.cooldown or self._trial_running:
+                raise CircuitOpenError("OpenAI upstream is failing; not calling it for a while")
+            self._trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+
+BREAKER = CircuitBreaker()
+
+
+def call_with_retries(fn, max_retries=None, tokens=1):
+    """
+    Run fn() under the shared policy: fail fast while the breaker is open,
+    wait for a scheduler slot (`tokens` is the request's estimated size),
+    retry transient errors with backoff, and feed the outcome to the breaker.
+    Non-transient errors are raised immediately and don't trip the breaker.
+    """
+    max_retries = max_retries or LLM_MAX_RETRIES
+    for attempt in range(max_retries):
+        BREAKER.before_call()
+        SCHEDULER.acquire(tokens)
+        try:
+            result = fn()
+        except Exception as e:
+            if not is_retryable(e):
+                BREAKER.record_success()  # the upstream answered
+                raise
+            BREAKER.record_failure()
+            if attempt == max_retries - 1:
+                raise
+            record_retry(type(e).__name__)
+            delay = backoff_delay(attempt)
+            if is_rate_limit(e):
+                SCHEDULER.pause(delay)  # everyone backs off, not just this caller
+            time.sleep(delay)
+            continue
+        BREAKER.record_success()
+        return result
+
+
+# ---------- Client and path ----------
+
+_CLIENT = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def get_client():
+    """The process-wide instrumented OpenAI client (built on first use)."""
+    global _CLIENT
+    if _CLIENT is None:
+        with _CLIENT_LOCK:
+            if _CLIENT is None:
+                _CLIENT = get_openai_client()
+    return _CLIENT
+
+
+def _messages(system, user):
+    return ([{"role": "system", "content": system}] if system else []) + [{"role": "user", "content": user}]
+
+
+class UnsupportedShapeError(LLMError):
+    """This SDK or endpoint doesn't take a request of this shape; the next path should be tried."""
+
+
+def _create(create, **kwargs):
+    """Call an SDK create(); an argument this SDK version doesn't know means the shape is unsupported."""
+    try:
+        return create(**kwargs)
+    except TypeError as e:
+        if "unexpected keyword argument" in str(e):
+            raise UnsupportedShapeError(str(e)) from e
+        raise
+
+
+def _via_responses(client, system, user, model, timeout):
+    resp = _create(
+        client.responses.create,
+        model=model,
+        input=_messages(system, user),
+        text={"format": {"type": "json_object"}},
+        timeout=timeout,
+    )
+    return response_text(resp)
+
+
+def _via_chat(client, system, user, model, timeout):
+    resp = _create(
+        client.chat.completions.create,
+        model=model,
+        messages=_messages(system, user),
+        response_format={"type": "json_object"},
+        timeout=timeout,
+    )
+    return response_text(resp)
+
+
+def _via_completions(client, system, user, model, timeout):
+    prompt = (system + "\n" if system else "") + user + "\nRespond ONLY in JSON."
+    resp = _create(client.completions.create, model=LEGACY_MODEL, prompt=prompt, timeout=timeout)
+    return response_text(resp)
+
+
+# Preference order; each entry is (name, SDK feature check, call)
+PATHS = [
+    ("responses", lambda c: hasattr(c, "responses"), _via_responses),
+    ("chat", lambda c: hasattr(c, "chat") and hasattr(c.chat, "completions"), _via_chat),
+    ("completions", lambda c: hasattr(c, "completions"), _via_completions),
+]
+
+_PATH = None  # name of the path in use
+_REJECTED = set()  # paths the SDK or endpoint doesn't support
+_PATH_LOCK = threading.Lock()
+
+
+def _unsupported(exc) -> bool:
+    """
+    Errors meaning this request shape can't work here: an SDK without the
+    arguments it needs, or an endpoint without the route. A 404 about the
+    model (a typo, no access) is the caller's error and says nothing about
+    the shape, nor does anything raised while reading the answer.
+    """
+    if isinstance(exc, UnsupportedShapeError):
+        return True
+    try:
+        import openai
+    except Exception:
+        return False
+    if not isinstance(exc, openai.NotFoundError):
+        return False
+    body = getattr(exc, "body", None)
+    message = (body.get("message") if isinstance(body, dict) else None) or str(exc)
+    return "model" not in f"{getattr(exc, 'code', None) or ''} {message}".lower()
+
+
+def probe(client=None) -> str:
+    """Pick (once) the first path the SDK exposes that hasn't been rejected; returns its name."""
+    global _PATH
+    if _PATH is not None:
+        return _PATH
+    client = client or get_client()
+    with _PATH_LOCK:
+        if _PATH is None:
+            for name, available, _ in PATHS:
+                if name not in _REJECTED and available(client):
+                    _PATH = name
+                    break
+            else:
+                raise LLMError("The installed OpenAI SDK exposes no supported completion API")
+    return _PATH
+
+
+def current_path():
+    return _PATH
+
+
+def warm_up():
+    """
+    Build the client and pick the path now, at process start. If that isn't
+    possible yet (no API key configured), the first call does it and reports
+    the error.
+    """
+    try:
+        probe()
+    except Exception:
+        pass
+
+
+def _reject(name):
+    global _PATH
+    with _PATH_LOCK:
+        _REJECTED.add(name)
+        if _PATH == name:
+            _PATH = None
+
+
+# ---------- JSON completions ----------
+
+def parse_json(raw: str) -> dict:
+    """Parse a JSON object from model output, tolerating prose around it."""
+    try:
+        data = json.loads(raw)
+    except (TypeError, ValueError):
+        m = re.search(r"\{.*\}", raw or "", re.DOTALL)
+        try:
+            data = json.loads(m.group(0)) if m else None
+        except ValueError:
+            data = None
+    if not isinstance(data, dict):
+        raise InvalidJSONError("Model response is not a JSON object", raw=raw)
+    return data
+
+
+def complete_json(system: str, user: str, schema=None, model=None, timeout=None) -> dict:
+    """
+    Ask the model for a JSON object and return it parsed.
+
+    `schema` is an example object; when given it is appended to the system
+    prompt as the shape to answer in. Raises InvalidJSONError (with the raw
+    text) if the answer doesn't parse, CircuitOpenError while the upstream
+    is failing, or the SDK error once retries are exhausted.
+    """
+    model = model or DEFAULT_MODEL
+    timeout = timeout or LLM_TIMEOUT
+    if schema is not None:
+        system = (system + "\n" if system else "") + "Return ONLY JSON matching this shape:\n" + json.dumps(schema)
+    key = hashlib.sha1(json.dumps([model, system, user]).encode("utf-8")).hexdigest()
+    return single_flight(("complete_json", key), lambda: _complete_json(system, user, model, timeout))
+
+
+def _complete_json(system, user, model, timeout):
+    tokens = (len(system) + len(user)) // 4 + OUTPUT_TOKENS_ESTIMATE
+    client = get_client()
+    while True:
+        name = probe(client)
+        call = next(c for n, _, c in PATHS if n == name)
+        try:
+            raw = call_with_retries(lambda: call(client, system, user, model, timeout), tokens=tokens)
+        except Exception as e:
+            if not _unsupported(e):
+                raise
+            # The endpoint doesn't take this shape; fall back and remember that
+            record_retry(f"fallback_from_{name}")
+            _reject(name)
+            continue
+        return parse_json(raw)
+
+
+# Processes load this module when they start using the model (the app does
+# so only once the recommender is used), so that is when the SDK is probed.
+warm_up()
@@ -0,0 +1,330 @@
+"""
+Latency, token and retry accounting for every OpenAI call.
+
+get_openai_client() returns the SDK client wrapped by instrument_client():
+each `*.create` call on responses / chat.completions / completions /
+embeddings is timed and its usage block recorded, labelled with
+
+- operation: the app-level call site, set with `with operation("..."):`
+- shape: which API shape actually served it (responses, chat, completions,
+  embeddings), i.e. which fallback was taken
+- model
+
+Call sites add their own retries (record_retry) and cache lookups
+(record_cache); the request scheduler reports queue depth as a gauge
+(record_gauge) and time spent waiting as a counter (add_counter). Metrics are process-wide and can be read as a dict
+(snapshot), as Prometheus text (prometheus_text), written to the JSON file
+named by SOUSCHEF_METRICS_FILE, or scraped from the HTTP endpoint started
+when SOUSCHEF_METRICS_PORT is set.
+"""
+
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+_DUMP_INTERVAL = 1.0  # seconds between JSON file rewrites
+
+_operation = contextvars.ContextVar("souschef_llm_operation", default="unknown")
+
+_LOCK = threading.Lock()
+_CALLS = {}    # (operation, shape, model) -> stats dict
+_RETRIES = {}  # (operation, reason) -> count
+_CACHE = {}    # cache name -> {"hits": n, "misses": n}
+_GAUGES = {}   # (name, sorted label items) -> value
+_COUNTERS = {}  # (name, sorted label items) -> running total
+_CALL_LISTENERS = []  # fn(operation, seconds) after every call, in the calling thread
+_STARTED_AT = time.time()
+_last_dump = 0.0
+_server = None
+_server_lock = threading.Lock()
+
+
+@contextmanager
+def operation(name: str):
+    """
+    Label OpenAI calls made inside the block (including nested helpers) with
+    `name`. Also usable as a function decorator.
+    """
+    token = _operation.set(name)
+    try:
+        yield
+    finally:
+        _operation.reset(token)
+
+
+def current_operation() -> str:
+    return _operation.get()
+
+
+def _new_stats():
+    return {
+        "calls": 0,
+        "errors": 0,
+        "latency_sum": 0.0,
+        "latency_max": 0.0,
+        "buckets": [0] * (len(LATENCY_BUCKETS) + 1),
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "cached_tokens": 0,
+    }
+
+
+def _usage_counts(resp):
+    """(input, output, cached) tokens from a Responses, Chat, Completions or Embeddings usage block."""
+    usage = getattr(resp, "usage", None)
+    if usage is None:
+        return 0, 0, 0
+    inp = getattr(usage, "input_tokens", None)
+    if inp is None:
+        inp = getattr(usage, "prompt_tokens", 0)
+    out = getattr(usage, "output_tokens", None)
+    if out is None:
+        out = getattr(usage, "completion_tokens", 0)
+    details = getattr(usage, "input_tokens_details", None) or getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", 0) if details is not None else 0
+    return int(inp or 0), int(out or 0), int(cached or 0)
+
+
+def record_call(op, shape, model, seconds, resp=None, error=False):
+    inp, out, cached = _usage_counts(resp) if resp is not None else (0, 0, 0)
+    with _LOCK:
+        stats = _CALLS.setdefault((op, shape, model or "unknown"), _new_stats())
+        stats["calls"] += 1
+        stats["errors"] += int(bool(error))
+        stats["latency_sum"] += seconds
+        stats["latency_max"] = max(stats["latency_max"], seconds)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                stats["buckets"][i] += 1
+                break
+        else:
+            stats["buckets"][-1] += 1
+        stats["input_tokens"] += inp
+        stats["output_tokens"] += out
+        stats["cached_tokens"] += cached
+    for fn in _CALL_LISTENERS:
+        fn(op, seconds)
+    _maybe_dump()
+
+
+def add_call_listener(fn):
+    """Call fn(operation, seconds) after every OpenAI call (used by profiling.py)."""
+    if fn not in _CALL_LISTENERS:
+        _CALL_LISTENERS.append(fn)
+
+
+def record_retry(reason: str, op: str = None):
+    with _LOCK:
+        key = (op or current_operation(), reason)
+        _RETRIES[key] = _RETRIES.get(key, 0) + 1
+
+
+def record_cache(name: str, hit: bool):
+    with _LOCK:
+        entry = _CACHE.setdefault(name, {"hits": 0, "misses": 0})
+        entry["hits" if hit else "misses"] += 1
+
+
+def record_gauge(name: str, value: float, **labels):
+    with _LOCK:
+        _GAUGES[(name, tuple(sorted(labels.items())))] = value
+
+
+def add_counter(name: str, amount: float, **labels):
+    with _LOCK:
+        key = (name, tuple(sorted(labels.items())))
+        _COUNTERS[key] = _COUNTERS.get(key, 0) + amount
+
+
+# ---------- Client wrapper ----------
+
+_SHAPES = {
+    ("responses",): "responses",
+    ("chat", "completions"): "chat",
+    ("completions",): "completions",
+    ("embeddings",): "embeddings",
+}
+
+
+class _InstrumentedResource:
+    """
+    Transparent proxy over the SDK client and its resources.
+
+    Attribute lookups fall through to the wrapped object, so feature checks
+    like hasattr(client, "responses") behave exactly as on the real client.
+    """
+
+    def __init__(self, target, path=()):
+        self._target = target
+        self._path = path
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        path = self._path + (name,)
+        if name == "create" and self._path in _SHAPES:
+            return self._wrap_create(attr, _SHAPES[self._path])
+        if name in ("responses", "chat", "completions", "embeddings"):
+            return _InstrumentedResource(attr, path)
+        return attr
+
+    def _wrap_create(self, create, shape):
+        def create_instrumented(*args, **kwargs):
+            op = current_operation()
+            start = time.perf_counter()
+            try:
+                resp = create(*args, **kwargs)
+            except Exception:
+                record_call(op, shape, kwargs.get("model"), time.perf_counter() - start, error=True)
+                raise
+            record_call(op, shape, kwargs.get("model"), time.perf_counter() - start, resp=resp)
+            return resp
+
+        return create_instrumented
+
+
+def instrument_client(client):
+    return _InstrumentedResource(client)
+
+
+# ---------- Export ----------
+
+def snapshot() -> dict:
+    with _LOCK:
+        calls = []
+        for (op, shape, model), s in sorted(_CALLS.items()):
+            calls.append(
+                {
+                    "operation": op,
+                    "shape": shape,
+                    "model": model,
+                    "calls": s["calls"],
+                    "errors": s["errors"],
+                    "latency_avg_s": s["latency_sum"] / s["calls"] if s["calls"] else 0.0,
+                    "latency_max_s": s["latency_max"],
+                    "latency_sum_s": s["latency_sum"],
+                    "latency_buckets": dict(zip([*map(str, LATENCY_BUCKETS), "+Inf"], s["buckets"])),
+                    "input_tokens": s["input_tokens"],
+                    "output_tokens": s["output_tokens"],
+                    "cached_tokens": s["cached_tokens"],
+                }
+            )
+        retries = [{"operation": op, "reason": reason, "count": n} for (op, reason), n in sorted(_RETRIES.items())]
+        caches = [{"cache": name, **counts} for name, counts in sorted(_CACHE.items())]
+        gauges = [{"name": name, "labels": dict(labels), "value": v} for (name, labels), v in sorted(_GAUGES.items())]
+        counters = [{"name": name, "labels": dict(labels), "value": v} for (name, labels), v in sorted(_COUNTERS.items())]
+    return {"started_at": _STARTED_AT, "calls": calls, "retries": retries, "caches": caches, "gauges": gauges,
+            "counters": counters}
+
+
+def _labels(**kw) -> str:
+    parts = []
+    for k, v in kw.items():
+        v = str(v).replace("\\", "\\\\").replace('"', '\\"')
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def prometheus_text() -> str:
+    snap = snapshot()
+    lines = [
+        "# HELP souschef_llm_requests_total OpenAI requests by call site, API shape and model.",
+        "# TYPE souschef_llm_requests_total counter",
+    ]
+    for c in snap["calls"]:
+        lines.append(f"souschef_llm_requests_total{_labels(operation=c['operation'], shape=c['shape'], model=c['model'])} {c['calls']}")
+    lines += ["# TYPE souschef_llm_errors_total counter"]
+    for c in snap["calls"]:
+        lines.append(f"souschef_llm_errors_total{_labels(operation=c['operation'], shape=c['shape'], model=c['model'])} {c['errors']}")
+    lines += ["# TYPE souschef_llm_tokens_total counter"]
+    for c in snap["calls"]:
+        for kind in ("input", "output", "cached"):
+            labels = _labels(operation=c["operation"], shape=c["shape"], model=c["model"], kind=kind)
+            lines.append(f"souschef_llm_tokens_total{labels} {c[kind + '_tokens']}")
+    lines += ["# TYPE souschef_llm_latency_seconds histogram"]
+    for c in snap["calls"]:
+        cumulative = 0
+        for bound, n in c["latency_buckets"].items():
+            cumulative += n
+            labels = _labels(operation=c["operation"], shape=c["shape"], model=c["model"], le=bound)
+            lines.append(f"souschef_llm_latency_seconds_bucket{labels} {cumulative}")
+        base = _labels(operation=c["operation"], shape=c["shape"], model=c["model"])
+        lines.append(f"souschef_llm_latency_seconds_sum{base} {c['latency_sum_s']:.6f}")
+        lines.append(f"souschef_llm_latency_seconds_count{base} {c['calls']}")
+    lines += ["# TYPE souschef_llm_retries_total counter"]
+    for r in snap["retries"]:
+        lines.append(f"souschef_llm_retries_total{_labels(operation=r['operation'], reason=r['reason'])} {r['count']}")
+    lines += ["# TYPE souschef_cache_lookups_total counter"]
+    for c in snap["caches"]:
+        lines.append(f"souschef_cache_lookups_total{_labels(cache=c['cache'], result='hit')} {c['hits']}")
+        lines.append(f"souschef_cache_lookups_total{_labels(cache=c['cache'], result='miss')} {c['misses']}")
+    for kind, metrics in (("gauge", snap["gauges"]), ("counter", snap["counters"])):
+        for name in sorted({m["name"] for m in metrics}):
+            lines += [f"# TYPE souschef_{name} {kind}"]
+            for m in metrics:
+                if m["name"] == name:
+                    lines.append(f"souschef_{name}{_labels(**m['labels'])} {m['value']}")
+    return "\n".join(lines) + "\n"
+
+
+def dump_json(path: str) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(snapshot(), f, indent=2)
+    os.replace(tmp, path)
+
+
+def _maybe_dump():
+    global _last_dump
+    path = os.getenv("SOUSCHEF_METRICS_FILE")
+    if not path:
+        return
+    now = time.time()
+    if now - _last_dump < _DUMP_INTERVAL:
+        return
+    _last_dump = now
+    try:
+        dump_json(path)
+    except OSError:
+        pass  # metrics must never break a request
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/metrics.json"):
+            body, ctype = json.dumps(snapshot()).encode("utf-8"), "application/json"
+        elif self.path.startswith("/metrics"):
+            body, ctype = prometheus_text().encode("utf-8"), "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # keep scrapes out of the app log
+
+
+def start_metrics_server(port: int = None):
+    """Serve /metrics (Prometheus text) and /metrics.json from a daemon thread, once per process."""
+    global _server
+    port = port or int(os.getenv("SOUSCHEF_METRICS_PORT") or 0)
+    if not port:
+        return None
+    with _server_lock:
+        if _server is not None:
+            return _server
+        try:
+            _server = ThreadingHTTPServer(("127.0.0.1", port), _MetricsHandler)
+        except OSError:
+            return None  # another worker process already serves this port
+        threading.Thread(target=_server.serve_forever, daemon=True).start()
+        return _server
@@ -0,0 +1,180 @@
+"""
+Nightly expiry reports and recommendations for every pantry.
+
+    python nightly.py                          # all households, today
+    python nightly.py --date 2026-03-01 --processes 8 --llm-concurrency 4
+    python nightly.py --households 1,2,3 --no-recommend
+
+For each household (db.Item.household_id) the run classifies items into
+expired / expiring soon (pantry.classify_expiry, the Toss-Out page logic)
+and asks the agent for recommendations for that household's pantry. One
+row per household and run date goes into the nightly_reports table.
+
+Households are processed in parallel by a process pool; a semaphore shared
+by all workers bounds how many agent calls are in flight at once. The run
+is resumable: households that already have a report for the date are
+skipped, so re-running after a crash or Ctrl-C only does the rest
+(--retry-failed also redoes the failed ones, --force redoes everything).
+"""
+
+import argparse
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+
+from sqlalchemy import select
+
+from db import Item, NightlyReport, SessionLocal, init_db
+
+
+_LLM_SLOTS = None  # per-worker handle on the shared semaphore
+
+
+def _init_worker(llm_slots):
+    global _LLM_SLOTS
+    _LLM_SLOTS = llm_slots
+    # Connections inherited from the parent can't be shared across processes
+    from db import engine
+
+    engine.dispose(close=False)
+    adapter = sys.modules.get("llm_adapter")
+    if adapter is not None:
+        adapter._CLIENT = None  # its HTTP connection pool belongs to the parent
+
+
+def _item_summary(i):
+    return {
+        "id": i.id,
+        "name": i.name,
+        "category": i.category,
+        "best_buy_date": i.best_buy_date.isoformat() if i.best_buy_date else None,
+    }
+
+
+def process_household(household_id, run_date, soon_days, recommend):
+    """Build one household's report; runs in a pool worker. Returns a dict for NightlyReport."""
+    from pantry import classify_expiry
+
+    session = SessionLocal()
+    try:
+        items = session.query(Item).filter(Item.household_id == household_id).all()
+    finally:
+        session.close()
+    expired, expiring_soon = classify_expiry(items, run_date, soon_days)
+    report = {
+        "household_id": household_id,
+        "status": "done",
+        "expired": [_item_summary(i) for i in expired],
+        "expiring_soon": [_item_summary(i) for i in expiring_soon],
+        "recommendations": None,
+        "error": None,
+    }
+    if recommend and items:
+        from agent import recommend_recipes_with_agent
+
+        try:
+            if _LLM_SLOTS is not None:
+                with _LLM_SLOTS:
+                    report["recommendations"] = recommend_recipes_with_agent(household_id=household_id)
+            else:
+                report["recommendations"] = recommend_recipes_with_agent(household_id=household_id)
+        except Exception as e:
+            report["status"] = "failed"
+            report["error"] = f"{type(e).__name__}: {e}"
+    return report
+
+
+def households_to_run(run_date, only=None, retry_failed=False, force=False):
+    session = SessionLocal()
+    try:
+        households = only or sorted(
+            h for h in session.execute(select(Item.household_id).distinct()).scalars() if h is not None
+        )
+        if force:
+            return list(households)
+        done = select(NightlyReport.household_id).where(NightlyReport.run_date == run_date)
+        if retry_failed:
+            done = done.where(NightlyReport.status == "done")
+        finished = set(session.execute(done).scalars())
+    finally:
+        session.close()
+    return [h for h in households if h not in finished]
+
+
+def save_report(run_date, report):
+    session = SessionLocal()
+    try:
+        existing = session.execute(
+            select(NightlyReport).where(
+                NightlyReport.run_date == run_date, NightlyReport.household_id == report["household_id"]
+            )
+        ).scalar_one_or_none()
+        row = existing or NightlyReport(run_date=run_date, household_id=report["household_id"])
+        for key, value in report.items():
+            setattr(row, key, value)
+        session.add(row)
+        session.commit()
+    finally:
+        session.close()
+
+
+def run(run_date, households=None, processes=None, llm_concurrency=4, soon_days=2,
+        recommend=True, retry_failed=False, force=False, progress=print):
+    """Process every household without a report for run_date; returns {"done": n, "failed": n}."""
+    init_db()
+    todo = households_to_run(run_date, households, retry_failed, force)
+    counts = {"done": 0, "failed": 0}
+    if not todo:
+        return counts
+    if recommend:
+        # Build (or attach to) the shared recipe index once, before the workers need it
+        import rag
+
+        rag.ensure_index()
+
+    ctx = multiprocessing.get_context()
+    llm_slots = ctx.BoundedSemaphore(max(1, llm_concurrency))
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=processes, mp_context=ctx,
+                             initializer=_init_worker, initargs=(llm_slots,)) as pool:
+        futures = {pool.submit(process_household, h, run_date, soon_days, recommend): h for h in todo}
+        for n, fut in enumerate(as_completed(futures), 1):
+            household_id = futures[fut]
+            try:
+                report = fut.result()
+            except Exception as e:
+                report = {"household_id": household_id, "status": "failed", "expired": None,
+                          "expiring_soon": None, "recommendations": None, "error": f"{type(e).__name__}: {e}"}
+            # Written as each household finishes, so an interrupted run resumes where it stopped
+            save_report(run_date, report)
+            counts[report["status"]] += 1
+            if progress and (n % 50 == 0 or n == len(todo)):
+                progress(f"{n}/{len(todo)} households ({time.perf_counter() - start:.1f}s)")
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Nightly expiry reports and recommendations per household.")
+    parser.add_argument("--date", type=date.fromisoformat, default=date.today(), help="run date (default today)")
+    parser.add_argument("--households", help="comma-separated household ids (default: all)")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--llm-concurrency", type=int, default=4, help="max agent calls in flight across workers")
+    parser.add_argument("--soon-days", type=int, default=2, help="'expiring soon' window in days")
+    parser.add_argument("--no-recommend", action="store_true", help="expiry reports only")
+    parser.add_argument("--retry-failed", action="store_true", help="also redo households whose report failed")
+    parser.add_argument("--force", action="store_true", help="redo every household for this date")
+    args = parser.parse_args(argv)
+
+    households = [int(h) for h in args.households.split(",") if h.strip()] if args.households else None
+    counts = run(
+        args.date, households, args.processes, args.llm_concurrency, args.soon_days,
+        recommend=not args.no_recommend, retry_failed=args.retry_failed, force=args.force,
+    )
+    print(f"nightly run {args.date}: {counts['done']} done, {counts['failed']} failed")
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,13 @@
 import json
-import streamlit as st
-from openai import OpenAI
 
+from llm_metrics import instrument_client
+
+
+def get_openai_client():
+    """An instrumented OpenAI client. The SDK (and Streamlit, for secrets) is imported on first use."""
+    import streamlit as st
+    from openai import OpenAI
 
-def get_openai_client() -> OpenAI:
     api_key = None
     # Prefer Streamlit secrets if available. Support both a top-level
     # `OPENAI_API_KEY` and a `[general]` table (common pattern in README).
@@ -54,7 +58,9 @@ def get_openai_client() -> OpenAI:
     except Exception:
         http_client = None
 
-    return OpenAI(api_key=api_key, http_client=http_client)
+    # Every call through the returned client is timed and its token usage recorded.
+    # Retries are left to llm_adapter's shared policy, so the SDK's own are off.
+    return instrument_client(OpenAI(api_key=api_key, http_client=http_client, max_retries=0))
 
 
 def response_text(resp) -> str:
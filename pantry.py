@@ -0,0 +1,291 @@
+"""
+Pantry arithmetic shared by the Streamlit pages, the benchmarks and batch
+jobs: unit normalization/conversion, scaling recipes to a servings count,
+applying a cooked recipe to the inventory, computing the grocery list for
+selected recipes, and sorting items into expired / expiring soon.
+"""
+
+import re
+import uuid
+from datetime import date, timedelta
+
+from sqlalchemy import func
+
+from db import SessionLocal, Item
+
+
+def normalize_unit(u: str) -> str:
+    u = (u or "").strip().lower()
+    aliases = {
+        "g": "g",
+        "gram": "g",
+        "grams": "g",
+        "kg": "kg",
+        "kilogram": "kg",
+        "kilograms": "kg",
+        "oz": "oz",
+        "ounce": "oz",
+        "ounces": "oz",
+        "lb": "lb",
+        "lbs": "lb",
+        "pound": "lb",
+        "pounds": "lb",
+        "ml": "ml",
+        "milliliter": "ml",
+        "milliliters": "ml",
+        "l": "l",
+        "liter": "l",
+        "liters": "l",
+        "tsp": "tsp",
+        "teaspoon": "tsp",
+        "teaspoons": "tsp",
+        "tbsp": "tbsp",
+        "tablespoon": "tbsp",
+        "tablespoons": "tbsp",
+        "cup": "cup",
+        "cups": "cup",
+        "item": "item",
+        "items": "item",
+        "pcs": "item",
+        "piece": "item",
+        "pieces": "item",
+    }
+    return aliases.get(u, u)
+
+
+# Grams / millilitres per unit. Any two units of one table convert through it,
+# so a scaled "1.2 l" still meets a pantry counted in cups.
+MASS_G = {"g": 1.0, "kg": 1000.0, "oz": 28.3495, "lb": 453.592}
+VOLUME_ML = {"ml": 1.0, "l": 1000.0, "tsp": 4.92892, "tbsp": 14.7868, "cup": 240.0}  # US kitchen measures
+
+
+def convert_amount(amount: float, from_unit: str, to_unit: str):
+    from_u = normalize_unit(from_unit)
+    to_u = normalize_unit(to_unit)
+    if from_u == to_u:
+        return amount, True
+    for table in (MASS_G, VOLUME_ML):
+        if from_u in table and to_u in table:
+            return amount * table[from_u] / table[to_u], True
+    # not convertible
+    return amount, False
+
+
+# ---------- Servings ----------
+
+# Units a scaled amount may move between, smallest first, with the least
+# amount worth writing in each larger unit (4 tbsp reads better as 1/4 cup)
+_UNIT_LADDERS = (("tsp", "tbsp", "cup"), ("g", "kg"), ("ml", "l"), ("oz", "lb"))
+_LEAST_AMOUNT = {"tbsp": 1.0, "cup": 0.25, "kg": 1.0, "l": 1.0, "lb": 1.0}
+
+
+def express_amount(amount: float, unit: str):
+    """
+    (amount, unit) re-expressed in the unit that reads best: the largest one
+    of its ladder holding at least _LEAST_AMOUNT (1500 g -> 1.5 kg,
+    6 tsp -> 2 tbsp, 0.2 kg -> 200 g). Other units are returned unchanged.
+    """
+    u = normalize_unit(unit)
+    for ladder in _UNIT_LADDERS:
+        if u not in ladder:
+            continue
+        for bigger in reversed(ladder[1:]):
+            converted, ok = convert_amount(amount, u, bigger)
+            if ok and converted >= _LEAST_AMOUNT[bigger] * 0.98:  # the tsp/tbsp/cup factors are approximate
+                return converted, bigger
+        return convert_amount(amount, u, ladder[0])[0], ladder[0]
+    return amount, unit
+
+
+def _amount(ing):
+    """An ingredient's amount as a float, or None when there is no number ("to taste")."""
+    try:
+        return float(ing["amount"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def display_ingredient(ing):
+    """Copy of an ingredient with its amount in the unit that reads best, for showing to people."""
+    amount = _amount(ing) if isinstance(ing, dict) else None
+    if amount is None:
+        return ing
+    amount, unit = express_amount(amount, ing.get("unit") or "")
+    return dict(ing, amount=round(amount, 3), unit=unit)
+
+
+def recipe_servings(recipe):
+    """The servings a recipe's amounts are written for ("4", 4 or "4 servings"), or None."""
+    match = re.search(r"\d+(\.\d+)?", str(recipe.get("servings") or ""))
+    value = float(match.group()) if match else 0.0
+    return value if value > 0 else None
+
+
+def _target_servings(recipe, servings):
+    """`servings` is None, one count for every recipe, or {title: count}."""
+    if isinstance(servings, dict):
+        return servings.get(recipe.get("title"))
+    return servings
+
+
+def scale_recipe(recipe, servings):
+    """
+    Copy of `recipe` with its ingredient amounts for `servings` people, in
+    the recipe's own units (express_amount() is for display). Returned as is
+    when no scaling applies (no target, or the recipe doesn't say how many
+    it serves).
+    """
+    base = recipe_servings(recipe)
+    if not servings or base is None or float(servings) == base:
+        return recipe
+    factor = float(servings) / base
+    ingredients = []
+    for ing in recipe.get("ingredients") or []:
+        amount = _amount(ing) if isinstance(ing, dict) else None
+        if amount is not None:
+            ing = dict(ing, amount=round(amount * factor, 3))
+        ingredients.append(ing)
+    return dict(recipe, servings=servings, ingredients=ingredients)
+
+
+def recipe_demand(recipes, servings=None):
+    """
+    {(name, unit): amount} needed to cook all `recipes`, each scaled to its
+    target servings first. Amounts of one ingredient are summed in the first
+    unit it appeared in; only units that don't convert get their own entry.
+    """
+    demand = {}  # name -> [[unit, amount], ...]
+    for r in recipes:
+        r = scale_recipe(r, _target_servings(r, servings))
+        for ing in r.get("ingredients", []):
+            if not isinstance(ing, dict):
+                continue
+            name = (ing.get("name") or "").strip().lower()
+            amount = _amount(ing) or 0.0
+            unit = (ing.get("unit") or "").strip().lower()
+            if not name or amount <= 0:
+                continue
+            entries = demand.setdefault(name, [])
+            for entry in entries:
+                converted, ok = convert_amount(amount, unit, entry[0])
+                if ok:
+                    entry[1] += converted
+                    break
+            else:
+                entries.append([unit, amount])
+    return {(name, unit): amount for name, entries in demand.items() for unit, amount in entries}
+
+
+def apply_recipe_to_pantry(recipe, servings=None):
+    """
+    Decrements pantry/fridge quantities based on a recipe's ingredients,
+    scaled to `servings` when given. Assumes recipe['ingredients'] is a list
+    of {name, amount, unit}. The matching items are loaded with one query
+    and updated in one commit.
+    Returns the ledger batch id of the change (ledger.undo() reverts it),
+    or None if nothing in the pantry was used.
+    """
+    demand = recipe_demand([recipe], servings)
+    if not demand:
+        return None
+
+    session = SessionLocal()
+    session.info["ledger_reason"] = "cook"
+    session.info["ledger_note"] = recipe.get("title")
+    batch_id = session.info["ledger_batch"] = uuid.uuid4().hex
+
+    # Case-insensitive name match; the oldest item wins when names repeat
+    items = {}
+    names = {name for name, _ in demand}
+    for item in session.query(Item).filter(func.lower(Item.name).in_(names)).order_by(Item.id):
+        items.setdefault((item.name or "").lower(), item)
+
+    for (name, unit), amount in demand.items():
+        item = items.get(name)
+        if not item:
+            continue
+
+        # Try to convert recipe amount to the stored item's unit (basic conversions)
+        target_unit = (item.unit or "").strip().lower()
+        amt_to_subtract = amount
+        ok_unit = True
+        if unit and target_unit:
+            converted, ok_unit = convert_amount(amount, unit, target_unit)
+            if ok_unit:
+                amt_to_subtract = converted
+        elif not unit and target_unit:
+            # Recipe unit missing but item has unit; only subtract if item unit is 'item'
+            if normalize_unit(target_unit) != "item":
+                ok_unit = False
+        # (item without a unit: subtract the recipe amount directly)
+
+        if not ok_unit:
+            continue
+
+        # Subtract quantity and clamp at zero
+        current_qty = float(item.quantity or 0.0)
+        item.quantity = max(0.0, current_qty - amt_to_subtract)
+
+    changed = any(session.is_modified(o) for o in session.dirty)
+    session.commit()
+    session.close()
+    return batch_id if changed else None
+
+
+def compute_grocery_list(selected_recipes, pantry_items, servings=None):
+    """
+    Return {(name, unit): amount_to_buy} for the selected recipes given the
+    current pantry rows (db.Item or any object with name/unit/quantity).
+    `servings` scales the recipes first: one count for all of them or
+    {title: count}. Demand is summed over all recipes before the pantry is
+    subtracted, so stock shared by two recipes is only counted once.
+    """
+    # Build a map of pantry availability: name -> {unit, quantity}
+    pantry_map = {}
+    for p in pantry_items:
+        key = (p.name or "").strip().lower()
+        pantry_map.setdefault(key, []).append({
+            "unit": (p.unit or "").strip().lower(),
+            "quantity": float(p.quantity or 0.0),
+        })
+
+    def available_amount(name: str, unit: str) -> float:
+        key = (name or "").strip().lower()
+        total = 0.0
+        for entry in pantry_map.get(key, []):
+            qty = entry["quantity"]
+            ent_unit = entry["unit"]
+            converted, ok = convert_amount(qty, ent_unit or unit, unit)
+            if ok:
+                total += float(converted)
+        return total
+
+    needed = {}
+    for (name, unit), amount in recipe_demand(selected_recipes, servings).items():
+        short = amount - available_amount(name, unit)
+        if short > 0:
+            short, unit = express_amount(short, unit)
+            key = (name, normalize_unit(unit))
+            needed[key] = needed.get(key, 0.0) + short
+
+    return needed
+
+
+def classify_expiry(items, today=None, soon_days=2):
+    """
+    Split items into (expired, expiring_soon) by best_buy_date: expired on or
+    before today, expiring within `soon_days` after it. Items without a
+    date are in neither list.
+    """
+    today = today or date.today()
+    soon = today + timedelta(days=soon_days)
+    expired = []
+    expiring_soon = []
+    for i in items:
+        if not i.best_buy_date:
+            continue
+        if i.best_buy_date <= today:
+            expired.append(i)
+        elif today <= i.best_buy_date <= soon:
+            expiring_soon.append(i)
+    return expired, expiring_soon
@@ -0,0 +1,209 @@
+"""
+N-day meal planner that uses up the pantry before it expires.
+
+plan_meals() schedules one recipe per meal slot, day by day, greedily:
+every slot picks the recipe that consumes the largest share of the stock
+closest to expiry, less a penalty per ingredient that would have to be
+bought. The chosen recipe's amounts are then taken from the pantry (oldest
+best-by first), so later slots see what is actually left and two meals
+can't both count on the same spinach. Stock is used only on days before
+its best-by date, the same boundary as pantry.classify_expiry, which lists
+an item as expired from its best-by day on.
+
+Recipes become rows of a dense (recipes x pantry ingredients) matrix of
+required amounts, converted to each pantry item's unit; each slot is then
+a handful of vectorized NumPy operations, so planning a week over
+thousands of recipes takes milliseconds once the matrix is built.
+
+The result also carries the net grocery list (what the planned meals need
+beyond the stock left at that point) and the stock that will still expire
+unused within the plan.
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+
+from db import Item, SessionLocal
+from pantry import convert_amount, normalize_unit
+
+
+MISSING_PENALTY = 0.15  # score cost of each ingredient a recipe would need to buy
+BASE_URGENCY = 0.05  # weight of stock with no best-by date (or far beyond the plan)
+
+
+def _name(s) -> str:
+    return " ".join((s or "").lower().split())
+
+
+class _Stock:
+    """Per-ingredient lots [best_by or None, quantity] in the unit of the first pantry item seen."""
+
+    def __init__(self, items, start):
+        self.names = []
+        self.units = []
+        self.lots = []
+        index = {}
+        for item in items:
+            name = _name(item.name)
+            qty = float(item.quantity or 0.0)
+            if not name or qty <= 0:
+                continue
+            if item.best_buy_date and item.best_buy_date <= start:
+                continue  # already expired: toss, don't plan around it
+            if name not in index:
+                index[name] = len(self.names)
+                self.names.append(name)
+                self.units.append((item.unit or "").strip().lower())
+                self.lots.append([])
+            i = index[name]
+            converted, ok = convert_amount(qty, item.unit or self.units[i], self.units[i] or item.unit)
+            if ok:
+                self.lots[i].append([item.best_buy_date, converted])
+        for lots in self.lots:
+            lots.sort(key=lambda lot: (lot[0] is None, lot[0] or date.max))
+        self.index = index
+
+    def available(self, day):
+        """(quantities, urgency) vectors of stock still good on `day`."""
+        qty = np.zeros(len(self.names), dtype=np.float64)
+        urgency = np.full(len(self.names), BASE_URGENCY)
+        for i, lots in enumerate(self.lots):
+            usable = [lot for lot in lots if lot[1] > 0 and (lot[0] is None or lot[0] > day)]
+            qty[i] = sum(lot[1] for lot in usable)
+            dated = [lot[0] for lot in usable if lot[0] is not None]
+            if dated:
+                # Sooner best-by => more urgent: 1.0 on its last usable day, fading with distance
+                urgency[i] = max(BASE_URGENCY, 1.0 / (min(dated) - day).days)
+        return qty, urgency
+
+    def take(self, i, amount, day):
+        """Consume `amount` of ingredient i, oldest usable lot first; returns what was actually taken."""
+        taken = 0.0
+        for lot in self.lots[i]:
+            if amount - taken <= 1e-9:
+                break
+            if lot[1] <= 0 or (lot[0] is not None and lot[0] <= day):
+                continue
+            use = min(lot[1], amount - taken)
+            lot[1] -= use
+            taken += use
+        return taken
+
+
+def _recipe_matrix(recipes, stock):
+    """
+    Required amounts per pantry ingredient (R), presence-only requirements
+    (P: listed without an amount) and the ingredients the pantry can't supply at all.
+    """
+    n, m = len(recipes), len(stock.names)
+    R = np.zeros((n, m), dtype=np.float64)
+    P = np.zeros((n, m), dtype=bool)
+    outside = [[] for _ in range(n)]  # (name, amount, unit) the pantry never has
+    for r, recipe in enumerate(recipes):
+        for ing in recipe.get("ingredients") or []:
+            if not isinstance(ing, dict):
+                continue
+            name = _name(ing.get("name"))
+            if not name:
+                continue
+            unit = (ing.get("unit") or "").strip().lower()
+            try:
+                amount = float(ing.get("amount") or 0.0)
+            except (TypeError, ValueError):
+                amount = 0.0
+            i = stock.index.get(name)
+            if i is None:
+                outside[r].append((name, amount, unit))
+                continue
+            if amount <= 0:
+                P[r, i] = True
+                continue
+            converted, ok = convert_amount(amount, unit or stock.units[i], stock.units[i] or unit)
+            if ok:
+                R[r, i] += converted
+            else:
+                outside[r].append((name, amount, unit))  # can't compare units: treat as a purchase
+    return R, P, outside
+
+
+def plan_meals(days=7, meals_per_day=1, household_id=None, start=None, recipes=None, pantry_items=None,
+               missing_penalty=MISSING_PENALTY, allow_repeats=False):
+    """
+    Build a plan for `days` days from `start` (default today).
+
+    Returns {"start", "days": [{"date", "meals": [{"recipe", "uses", "missing"}]}],
+    "grocery": [{"name", "unit", "amount"}], "expiring_unused": [{"name", "quantity", "unit", "best_buy_date"}]}.
+    """
+    start = start or date.today()
+    if pantry_items is None:
+        session = SessionLocal()
+        try:
+            q = session.query(Item)
+            if household_id is not None:
+                q = q.filter(Item.household_id == household_id)
+            pantry_items = q.all()
+        finally:
+            session.close()
+    if recipes is None:
+        from recipe_store import iter_recipes
+
+        recipes = list(iter_recipes())
+
+    stock = _Stock(pantry_items, start)
+    R, P, outside = _recipe_matrix(recipes, stock)
+    outside_count = np.array([len(o) for o in outside], dtype=np.float64)
+    initial, _ = stock.available(start)
+    scale = np.where(initial > 0, initial, 1.0)
+    taken_slots = np.zeros(len(recipes), dtype=bool)
+
+    needed = {}
+    plan_days = []
+    for d in range(days):
+        day = start + timedelta(days=d)
+        meals = []
+        for _ in range(meals_per_day):
+            avail, urgency = stock.available(day)
+            used = np.minimum(R, avail)  # (recipes, ingredients)
+            # Share of each ingredient's stock the recipe would use up, weighted by urgency
+            gain = (used / scale) @ urgency
+            short = (R - used > 1e-9) | (P & (avail <= 0))
+            score = gain - missing_penalty * (short.sum(axis=1) + outside_count)
+            eligible = (((R > 0) | P) & (avail > 0)).any(axis=1)  # uses something still in stock
+            if not allow_repeats:
+                eligible &= ~taken_slots
+            score = np.where(eligible & (gain > 0), score, -np.inf)
+            if len(score) == 0 or not np.isfinite(score.max()):
+                break
+            r = int(np.argmax(score))
+            taken_slots[r] = True
+
+            uses, missing = [], []
+            for i in np.nonzero((R[r] > 0) | P[r])[0]:
+                name = stock.names[i]
+                got = stock.take(i, R[r, i], day) if R[r, i] > 0 else 0.0
+                shortfall = R[r, i] - got
+                if shortfall > 1e-9 or (P[r, i] and avail[i] <= 0):
+                    missing.append(name)
+                    if shortfall > 1e-9:
+                        key = (name, normalize_unit(stock.units[i]))
+                        needed[key] = needed.get(key, 0.0) + shortfall
+                if got > 0 or (P[r, i] and avail[i] > 0):
+                    uses.append(name)
+            for name, amount, unit in outside[r]:
+                missing.append(name)
+                if amount > 0:
+                    key = (name, normalize_unit(unit))
+                    needed[key] = needed.get(key, 0.0) + amount
+            meals.append({"recipe": recipes[r], "uses": uses, "missing": missing})
+        plan_days.append({"date": day, "meals": meals})
+
+    horizon_end = start + timedelta(days=days)
+    expiring_unused = [
+        {"name": stock.names[i], "quantity": round(float(lot[1]), 2), "unit": stock.units[i], "best_buy_date": lot[0]}
+        for i, lots in enumerate(stock.lots)
+        for lot in lots
+        if lot[0] is not None and lot[0] < horizon_end and lot[1] > 1e-9
+    ]
+    grocery = [{"name": n, "unit": u, "amount": round(float(a), 2)} for (n, u), a in sorted(needed.items())]
+    return {"start": start, "days": plan_days, "grocery": grocery, "expiring_unused": expiring_unused}
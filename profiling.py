@@ -0,0 +1,208 @@
+"""
+Opt-in render profiling for the Streamlit app.
+
+    SOUSCHEF_PROFILE=1 streamlit run streamlit_app.py      # or open the app with ?profile=1
+    python profiling.py profiles/inventory-*.prof           # top functions of a saved profile
+
+When it is on, every rerun collects a Report:
+
+- a timed span for the whole rerun and one for the page function, plus any
+  `with span("..."):` block inside them
+- for each span, the SQL statements run and the time spent in them (cursor
+  events on db.engine), the DB sessions opened and how long their
+  transactions stayed open, and the OpenAI calls made and their latency
+- how many Streamlit elements of each type (button, text_input, markdown,
+  ...) the rerun sent to the browser
+
+What is left of a span after SQL and OpenAI time is Python and widget
+construction. The report is shown in the "Render profile" sidebar expander.
+With SOUSCHEF_PROFILE_DIR set, each page function also runs under cProfile
+and its stats are written there as <page>-<timestamp>.prof. Those files
+work with pstats, snakeviz, or flameprof for a flame graph.
+
+Only the script thread of a profiled rerun is measured. The job worker and
+other browser sessions don't touch the report.
+"""
+
+import contextvars
+import cProfile
+import os
+import pstats
+import re
+import sys
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+import llm_metrics
+from db import SessionLocal, engine
+
+
+PROFILE_DIR = os.getenv("SOUSCHEF_PROFILE_DIR") or None
+
+_report = contextvars.ContextVar("souschef_profile_report", default=None)
+
+
+def enabled(query_params=None) -> bool:
+    """On with SOUSCHEF_PROFILE=1, or per browser tab with ?profile=1."""
+    if os.getenv("SOUSCHEF_PROFILE", "0").strip().lower() not in ("", "0", "false", "no", "off"):
+        return True
+    return query_params is not None and query_params.get("profile") in ("1", "true")
+
+
+class Report:
+    def __init__(self):
+        self.spans = []  # in start order, so a parent comes before its children
+        self.elements = {}  # element type -> count
+        self.profiles = []  # .prof files written during the rerun
+        self._open = []
+
+    def add(self, kind, seconds):
+        """Count one SQL statement / session / OpenAI call against every open span."""
+        for s in self._open:
+            s[kind] += 1
+            s[kind + "_s"] += seconds
+
+
+def _new_span(name, depth):
+    return {"name": name, "depth": depth, "seconds": 0.0,
+            "sql": 0, "sql_s": 0.0, "session": 0, "session_s": 0.0, "llm": 0, "llm_s": 0.0}
+
+
+@contextmanager
+def span(name):
+    """Time the block as a child of the current span (no-op outside a profiled rerun)."""
+    report = _report.get()
+    if report is None:
+        yield None
+        return
+    s = _new_span(name, len(report._open))
+    report.spans.append(s)
+    report._open.append(s)
+    start = time.perf_counter()
+    try:
+        yield s
+    finally:
+        s["seconds"] = time.perf_counter() - start
+        report._open.remove(s)
+
+
+@contextmanager
+def rerun(active=True):
+    """Collect a Report for the block when `active`; yields it (or None)."""
+    if not active:
+        yield None
+        return
+    _patch_streamlit()
+    report = Report()
+    token = _report.set(report)
+    try:
+        with span("rerun"):
+            yield report
+    finally:
+        _report.reset(token)
+
+
+def _slug(name) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-") or "page"
+
+
+def run_page(name, fn):
+    """Call a page function inside its own span, under cProfile when SOUSCHEF_PROFILE_DIR is set."""
+    report = _report.get()
+    with span(name):
+        if report is None or not PROFILE_DIR:
+            return fn()
+        prof = cProfile.Profile()
+        prof.enable()
+        try:
+            return fn()
+        finally:
+            prof.disable()
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            path = os.path.join(PROFILE_DIR, f"{_slug(name)}-{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 10**6:06d}.prof")
+            prof.dump_stats(path)
+            report.profiles.append(path)
+
+
+# ---------- Hooks ----------
+# Registered once at import and cheap when no rerun is being profiled: each
+# checks the context variable and returns.
+
+@event.listens_for(engine, "before_cursor_execute")
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if _report.get() is not None:
+        conn.info.setdefault("souschef_profile_t", []).append(time.perf_counter())
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    report = _report.get()
+    started = conn.info.get("souschef_profile_t")
+    if report is not None and started:
+        report.add("sql", time.perf_counter() - started.pop())
+
+
+@event.listens_for(SessionLocal, "after_begin")
+def _session_begin(session, transaction, connection):
+    if _report.get() is not None:
+        session.info.setdefault("souschef_profile_t", time.perf_counter())
+
+
+@event.listens_for(SessionLocal, "after_transaction_end")
+def _session_end(session, transaction):
+    if transaction.parent is not None:
+        return  # savepoint; the outer transaction is still open
+    started = session.info.pop("souschef_profile_t", None)
+    report = _report.get()
+    if report is not None and started is not None:
+        report.add("session", time.perf_counter() - started)
+
+
+def _on_llm_call(op, seconds):
+    report = _report.get()
+    if report is not None:
+        report.add("llm", seconds)
+
+
+llm_metrics.add_call_listener(_on_llm_call)
+
+_patched = False
+
+
+def _patch_streamlit():
+    """Count elements by wrapping DeltaGenerator._enqueue, which every st.* element goes through."""
+    global _patched
+    if _patched:
+        return
+    _patched = True
+    try:
+        from streamlit.delta_generator import DeltaGenerator
+    except ImportError:
+        return
+    enqueue = getattr(DeltaGenerator, "_enqueue", None)
+    if enqueue is None:
+        return  # internals changed; element counts stay empty
+
+    def counting_enqueue(self, delta_type, *args, **kwargs):
+        report = _report.get()
+        if report is not None:
+            report.elements[delta_type] = report.elements.get(delta_type, 0) + 1
+        return enqueue(self, delta_type, *args, **kwargs)
+
+    DeltaGenerator._enqueue = counting_enqueue
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print("usage: python profiling.py FILE.prof [FILE.prof ...]")
+        return 2
+    stats = pstats.Stats(*argv)
+    stats.sort_stats("cumulative").print_stats(25)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,24 +1,36 @@
-import json
 import os
+
 import numpy as np
-from openai_utils import get_openai_client
+import index_store
+from llm_metrics import operation
+from llm_adapter import is_connection_error
+from embedders import embedder_mode, get_embedder, local_embedder
+from recipe_store import iter_recipes, load_embeddings, save_embeddings, get_recipes, store_stamp
+from scheduler import BACKGROUND, priority
+from vector_quant import dequantize, index_dtype, mmr, quantize, scores, shortlist_size, top_candidates
 
 
 _INDEX = None  # lazy in-memory index of recipe embeddings
 
-
-def load_seed_recipes():
-    with open("recipes/seed_recipes.json", "r") as f:
-        return json.load(f)
+# Diversity of query results (maximal marginal relevance): 1.0 is the plain
+# cosine top-k; lower values trade relevance for results less like each other.
+MMR_LAMBDA = float(os.getenv("SOUSCHEF_MMR_LAMBDA", "0.6"))
+MMR_FETCH = 4  # candidates over-fetched per result before diversifying
 
 
-def embed_texts(texts):
-    client = get_openai_client()
-    resp = client.embeddings.create(
-        model="text-embedding-3-small",
-        input=texts,
-    )
-    vectors = [d.embedding for d in resp.data]
+def load_seed_recipes():
+    # Streams from the recipe store (seeded from recipes/seed_recipes.json on first use)
+    return iter_recipes()
+
+
+@operation("rag.embed_texts")
+def embed_texts(texts, embedder=None):
+    """Embed texts with `embedder` (default: the configured embedder, see embedders.py)."""
+    texts = list(texts)
+    if not texts:
+        return []
+    embedder = embedder or get_embedder()
+    vectors = embedder.embed(texts)
     return np.array(vectors).tolist()  # Chroma wants plain Python lists
 
 
@@ -26,75 +38,199 @@ def _normalize_ingredient_name(s: str) -> str:
     return (s or "").strip().lower()
 
 
-def build_index():
-    global _INDEX
-    recipes = load_seed_recipes()
-    # Create simple textual representation focused on ingredients and title
-    docs = []
-    metas = []
-    for r in recipes:
-        ingredient_names = [ing["name"] for ing in r["ingredients"]]
-        doc = f"{r['title']} | ingredients: {', '.join(ingredient_names)}"
-        docs.append(doc)
-        metas.append(
-            {
-                "id": r["id"],
-                "title": r["title"],
-                "ingredients": r["ingredients"],
-                "steps": r.get("steps"),
-                # Optional source URL or attribution; may be missing for bundled recipes
-                "source": r.get("source"),
-                "detailed_steps": r.get("detailed_steps"),
-                "servings": r.get("servings"),
-                "prep_time": r.get("prep_time"),
-                "cook_time": r.get("cook_time"),
-                "tags": r.get("tags"),
-            }
-        )
+def recipe_document(r) -> str:
+    # Simple textual representation focused on ingredients and title
+    ingredient_names = [ing["name"] for ing in r["ingredients"]]
+    return f"{r['title']} | ingredients: {', '.join(ingredient_names)}"
+
+
+def embed_recipes(recipes, embedder=None):
+    """Embed recipes and persist the vectors (tagged by embedder id) so later index builds can reuse them."""
+    recipes = list(recipes)
+    embedder = embedder or get_embedder()
+    vectors = embed_texts([recipe_document(r) for r in recipes], embedder)
+    save_embeddings(embedder.id, zip((r["id"] for r in recipes), vectors))
+    return vectors
+
 
-    vectors = np.array(embed_texts(docs))  # shape: (N, D)
+def embed_missing(recipe_ids, embedder=None):
+    """Embed the given recipes that have no stored vector yet; returns how many were embedded."""
+    recipe_ids = list(recipe_ids)
+    embedder = embedder or get_embedder()
+    have = load_embeddings(embedder.id, recipe_ids)
+    todo = get_recipes([i for i in recipe_ids if i not in have])
+    if todo:
+        embed_recipes(todo, embedder)
+    return len(todo)
+
+
+def build_index(embedder=None, force=True):
+    """
+    Build the index from the recipe store and make it the live index.
+
+    With the shared index enabled (see index_store.py) the result is
+    published as a new generation that every worker process hot-swaps to.
+    With force=False an index another process published while we waited
+    for the build lock is attached instead of building a second one.
+    """
+    global _INDEX
+    embedder = embedder or get_embedder()
+    try:
+        with priority(BACKGROUND):  # bulk embedding must not hold up interactive calls
+            _INDEX = _build_and_publish(embedder, force)
+    except Exception as e:
+        # In auto mode an unreachable API shouldn't take retrieval down with it
+        if embedder_mode() != "auto" or not is_connection_error(e):
+            raise
+        with priority(BACKGROUND):
+            _INDEX = _build_and_publish(local_embedder(), force)
+
+
+def _build_and_publish(embedder, force):
+    dtype = index_dtype()
+    if not index_store.shared_index_enabled():
+        return _build_index(embedder, dtype)
+    seen = index_store.current_generation(embedder.id, dtype)
+    with index_store.build_lock(embedder.id, dtype):
+        if not force and index_store.current_generation(embedder.id, dtype) != seen:
+            attached = index_store.attach(embedder.id, dtype)
+            if attached is not None:
+                return attached
+        index_store.publish(_build_index(embedder, dtype), dtype)
+    return index_store.attach(embedder.id, dtype)
+
+
+def _build_index(embedder, dtype):
+    store = store_stamp()  # before reading: recipes added during the build make the index stale, not lost
+    stored = load_embeddings(embedder.id)
+    ids = []
+    vectors = []
+    missing = []  # positions whose vectors still have to be embedded
+    for r in load_seed_recipes():
+        vec = stored.get(r["id"])
+        if vec is None:
+            missing.append((len(ids), r))
+        vectors.append(vec)
+        ids.append(r["id"])
+
+    if missing:
+        fresh = embed_recipes([r for _, r in missing], embedder)
+        for (pos, _), vec in zip(missing, fresh):
+            vectors[pos] = vec
+
+    vectors = np.array(vectors, dtype=np.float32)  # shape: (N, D)
     # Normalize for cosine similarity (avoid div by zero)
     norms = np.linalg.norm(vectors, axis=1, keepdims=True)
     norms[norms == 0] = 1.0
     vectors = vectors / norms
 
-    _INDEX = {
-        "vectors": vectors,  # numpy array
-        "metas": metas,
+    data, scales = quantize(vectors, dtype)
+    # Recipe payloads are not kept in memory: results are fetched by id from
+    # the recipe store, so each worker only holds (or maps) the vectors.
+    return {
+        "vectors": data,  # numpy array in the configured storage dtype
+        "scales": scales,  # per-vector scales for int8 storage, else None
+        "ids": np.asarray(ids, dtype=np.int64),
+        "embedder": embedder.id,  # queries must be embedded with the same model
+        "dtype": dtype,
+        "generation": None,  # set when attached from a published generation
+        "store": store,  # recipe_store.store_stamp() the index was built from
     }
 
 
 def ensure_index():
+    """
+    Return the live index, attaching to (or hot-swapping to) the shared one when
+    available. An index built before recipes were added to or removed from the
+    store (ingest.py --no-embed, bench.synthetic, another process) is rebuilt.
+    """
     global _INDEX
-    if _INDEX is None:
-        build_index()
-
-
-def query_recipes_by_ingredients(ingredients, top_k=5):
-    ensure_index()
-    query_text = "ingredients: " + ", ".join(_normalize_ingredient_name(i) for i in ingredients)
-    q_vec = np.array(embed_texts([query_text])[0])
+    store = store_stamp()
+    if _INDEX is not None and not index_store.is_stale(_INDEX) and _INDEX.get("store") == store:
+        return _INDEX
+    if index_store.shared_index_enabled():
+        embedder = get_embedder()
+        attached = index_store.attach(embedder.id, index_dtype())
+        if attached is not None and attached["store"] == store:
+            _INDEX = attached
+            return _INDEX
+    build_index(force=False)
+    return _INDEX
+
+
+def _rerank_exact(index, candidates, approx_sims, q_vec):
+    """Re-score a quantized shortlist with the stored float32 vectors; returns (candidates, scores), best first."""
+    cand_ids = [int(index["ids"][i]) for i in candidates]
+    full = load_embeddings(index["embedder"], cand_ids)
+    exact = np.empty(len(candidates), dtype=np.float32)
+    for pos, (idx, rid) in enumerate(zip(candidates, cand_ids)):
+        vec = full.get(rid)
+        if vec is None:
+            exact[pos] = approx_sims[idx]  # vector vanished (recipe deleted); keep the approximation
+            continue
+        norm = np.linalg.norm(vec)
+        exact[pos] = float(vec @ q_vec) / (norm if norm else 1.0)
+    order = np.argsort(-exact, kind="stable")
+    return candidates[order], exact[order]
+
+
+def query_recipes_by_ingredients(ingredients, top_k=5, mmr_lambda=None):
+    return query_recipes_batch([ingredients], top_k, mmr_lambda)[0]
+
+
+def query_recipes_batch(ingredient_lists, top_k=5, mmr_lambda=None):
+    """
+    Run several ingredient queries together: one embedding request and one
+    pass over the index for the whole batch. Returns a result list per query.
+
+    Each query over-fetches top_k * MMR_FETCH candidates and keeps the top_k
+    picked by MMR (mmr_lambda, default MMR_LAMBDA), so near-duplicates of a
+    better match give way to recipes that use other ingredients.
+    """
+    lam = MMR_LAMBDA if mmr_lambda is None else mmr_lambda
+    if not ingredient_lists:
+        return []
+    index = ensure_index()  # local ref: a concurrent hot swap must not change it mid-query
+    texts = [
+        "ingredients: " + ", ".join(_normalize_ingredient_name(i) for i in ingredients)
+        for ingredients in ingredient_lists
+    ]
+    q = np.asarray(embed_texts(texts, get_embedder(index["embedder"])), dtype=np.float32)
     # cosine similarity with pre-normalized doc vectors
-    q_norm = np.linalg.norm(q_vec)
-    if q_norm == 0:
-        q_norm = 1.0
-    q_vec = q_vec / q_norm
-
-    mats = _INDEX["vectors"]  # (N, D)
-    sims = np.dot(mats, q_vec)  # (N,)
-    # Get top_k indices
-    top_idx = np.argsort(-sims)[:top_k]
-
-    metas = _INDEX["metas"]
+    q_norms = np.linalg.norm(q, axis=1, keepdims=True)
+    q_norms[q_norms == 0] = 1.0
+    q = q / q_norms
+
+    mats = index["vectors"]  # (N, D)
+    all_sims = scores(mats, index["scales"], q)  # (N, B)
+    top_ids = []
+    for b in range(len(q)):
+        sims = np.ascontiguousarray(all_sims[:, b])
+        fetch = top_k * MMR_FETCH if lam < 1.0 else top_k
+        candidates = top_candidates(sims, shortlist_size(fetch, len(sims), mats.dtype))
+        if mats.dtype != np.float32:
+            candidates, relevance = _rerank_exact(index, candidates, sims, q[b])
+        else:
+            relevance = sims[candidates]
+        candidates, relevance = candidates[:fetch], relevance[:fetch]
+        if len(candidates) > top_k:
+            vecs = dequantize(mats, index["scales"], candidates)
+            candidates = candidates[mmr(relevance, vecs, top_k, lam)]
+        top_ids.append([int(index["ids"][i]) for i in candidates[:top_k]])
+
+    by_id = {r["id"]: r for r in get_recipes(sorted({rid for ids in top_ids for rid in ids}))}
     results = []
-    for idx in top_idx:
-        meta = metas[int(idx)]
+    for ids in top_ids:
         results.append(
-            {
-                "id": meta["id"],
-                "title": meta["title"],
-                "ingredients": meta["ingredients"],
-                "steps": meta["steps"],
-            }
+            [
+                {
+                    "id": by_id[rid]["id"],
+                    "title": by_id[rid]["title"],
+                    "ingredients": by_id[rid]["ingredients"],
+                    "steps": by_id[rid]["steps"],
+                }
+                for rid in ids
+                if rid in by_id  # deleted since the index was built
+            ]
         )
     return results
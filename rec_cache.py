@@ -0,0 +1,164 @@
+"""
+Cache of agent recommendations keyed by pantry state.
+
+The key is a fingerprint of the pantry plus the candidate recipes offered
+to the agent. Each pantry item contributes its normalized name, unit, a
+quantity bucket (powers of two, so using a little of something usually
+keeps the bucket) and a days-to-expiry bucket (expired / 0-2 / 3-7 / 8-30
+/ later / no date). Pantries that bucket the same hit the cache exactly.
+
+Failing that, a near-match lookup compares the fingerprint tokens with
+recently cached entries (Jaccard similarity) and serves the closest one if
+both the pantry and the candidate set are at least
+SOUSCHEF_REC_CACHE_SIMILARITY similar (default 0.85). Entries expire after
+SOUSCHEF_REC_CACHE_TTL seconds (default one day).
+"""
+
+import hashlib
+import json
+import math
+import os
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+
+from db import RecommendationCache, SessionLocal
+from web_cache import title_key, url_key
+
+
+MAX_ENTRIES = 500
+NEAR_MATCH_SCAN = 200  # most recent entries compared on a near-match lookup
+
+_EXPIRY_BUCKETS = [(0, "expired"), (2, "0-2d"), (7, "3-7d"), (30, "8-30d")]
+
+
+def similarity_threshold() -> float:
+    return float(os.getenv("SOUSCHEF_REC_CACHE_SIMILARITY") or 0.85)
+
+
+def cache_ttl() -> timedelta:
+    return timedelta(seconds=float(os.getenv("SOUSCHEF_REC_CACHE_TTL") or 86400))
+
+
+def _quantity_bucket(quantity) -> str:
+    try:
+        q = float(quantity)
+    except (TypeError, ValueError):
+        return "q?"
+    if q <= 0:
+        return "q0"
+    return f"q{math.floor(math.log2(q))}"
+
+
+def _expiry_bucket(best_buy_date, today) -> str:
+    if not best_buy_date:
+        return "nodate"
+    if isinstance(best_buy_date, str):
+        try:
+            best_buy_date = date.fromisoformat(best_buy_date)
+        except ValueError:
+            return "nodate"
+    days = (best_buy_date - today).days
+    for limit, label in _EXPIRY_BUCKETS:
+        if days <= limit:
+            return label
+    return "later"
+
+
+def pantry_features(pantry, today=None) -> list:
+    """Sorted fingerprint tokens for tool_get_pantry()-style dicts."""
+    today = today or date.today()
+    tokens = set()
+    for item in pantry:
+        name = " ".join((item.get("name") or "").lower().split())
+        if not name:
+            continue
+        unit = (item.get("unit") or "").strip().lower()
+        tokens.add(name)
+        tokens.add(f"{name}|{unit}|{_quantity_bucket(item.get('quantity'))}")
+        tokens.add(f"{name}|{_expiry_bucket(item.get('best_buy_date'), today)}")
+    return sorted(tokens)
+
+
+def candidate_keys(candidates) -> list:
+    keys = set()
+    for c in candidates or []:
+        if c.get("id") is not None:
+            keys.add(f"id:{c['id']}")
+        else:
+            keys.add(url_key(c.get("url") or c.get("source")) or "t:" + title_key(c.get("title")))
+    return sorted(keys)
+
+
+def fingerprint(features, candidates) -> str:
+    return hashlib.sha1(json.dumps([features, candidates]).encode("utf-8")).hexdigest()
+
+
+def _jaccard(a, b) -> float:
+    a, b = set(a), set(b)
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def lookup(features, candidates):
+    """(result, similarity) for the best cached match, or (None, 0.0)."""
+    session = SessionLocal()
+    try:
+        cutoff = datetime.utcnow() - cache_ttl()
+        row = session.get(RecommendationCache, fingerprint(features, candidates))
+        if row is not None and row.created_at >= cutoff:
+            row.hits = (row.hits or 0) + 1
+            session.commit()
+            return row.result, 1.0
+
+        threshold = similarity_threshold()
+        best, best_sim = None, 0.0
+        recent = session.execute(
+            select(RecommendationCache)
+            .where(RecommendationCache.created_at >= cutoff)
+            .order_by(RecommendationCache.created_at.desc())
+            .limit(NEAR_MATCH_SCAN)
+        ).scalars()
+        for entry in recent:
+            if _jaccard(candidates, entry.candidates or []) < threshold:
+                continue
+            sim = _jaccard(features, entry.features or [])
+            if sim >= threshold and sim > best_sim:
+                best, best_sim = entry, sim
+        if best is None:
+            return None, 0.0
+        best.hits = (best.hits or 0) + 1
+        session.commit()
+        return best.result, best_sim
+    finally:
+        session.close()
+
+
+def store(features, candidates, result):
+    session = SessionLocal()
+    try:
+        session.merge(
+            RecommendationCache(
+                key=fingerprint(features, candidates),
+                features=features,
+                candidates=candidates,
+                result=result,
+                hits=0,
+                created_at=datetime.utcnow(),
+            )
+        )
+        try:
+            session.flush()
+        except IntegrityError:
+            # A concurrent caller (e.g. a single-flight follower) stored the same key first
+            session.rollback()
+            return
+        # Keep the table small: drop expired entries and anything beyond MAX_ENTRIES
+        session.execute(delete(RecommendationCache).where(RecommendationCache.created_at < datetime.utcnow() - cache_ttl()))
+        stale = select(RecommendationCache.key).order_by(RecommendationCache.created_at.desc()).offset(MAX_ENTRIES)
+        session.execute(delete(RecommendationCache).where(RecommendationCache.key.in_(stale)))
+        session.commit()
+    finally:
+        session.close()
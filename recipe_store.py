@@ -0,0 +1,315 @@
+"""
+Persistent recipe corpus backed by the `recipes` table in the app database.
+
+The bundled recipes/seed_recipes.json is imported once, the first time the
+store is used against an empty table. After that the table is the source of
+truth: "Add to cookbook" inserts a single row (SQLite assigns the id inside
+the insert, so concurrent sessions can't hand out the same one) and rag
+streams rows from here to build its index.
+"""
+
+import hashlib
+import json
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.exc import IntegrityError
+
+from db import SessionLocal, Recipe, RecipeEmbedding, init_db
+
+
+SEED_FILE = "recipes/seed_recipes.json"
+
+_SEEDED = False  # set once the table is known to be initialized in this process
+
+_FIELDS = (
+    "title",
+    "ingredients",
+    "steps",
+    "source",
+    "detailed_steps",
+    "servings",
+    "prep_time",
+    "cook_time",
+    "tags",
+)
+
+
+def _coerce_servings(value):
+    # Web results sometimes carry "4 servings" or "4-6"; keep the leading number
+    if value is None or isinstance(value, int):
+        return value
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        digits = ""
+        for ch in str(value).strip():
+            if not ch.isdigit():
+                break
+            digits += ch
+        return int(digits) if digits else None
+
+
+def content_hash(recipe: dict) -> str:
+    """Stable identity for dedup: normalized title plus the sorted ingredient names."""
+    title = " ".join((recipe.get("title") or "").lower().split())
+    names = sorted(
+        {" ".join((ing.get("name") or "").lower().split()) for ing in recipe.get("ingredients") or [] if isinstance(ing, dict)}
+    )
+    key = title + "|" + ",".join(n for n in names if n)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def _row_values(recipe: dict, keep_id: bool = False) -> dict:
+    """Normalize an incoming recipe dict (seed, web or agent shape) into column values."""
+    values = {
+        "title": recipe.get("title"),
+        "ingredients": recipe.get("ingredients") or [],
+        "steps": recipe.get("steps") or recipe.get("detailed_steps") or "",
+        "source": recipe.get("source") or recipe.get("url"),
+        "detailed_steps": recipe.get("detailed_steps"),
+        "servings": _coerce_servings(recipe.get("servings")),
+        "prep_time": recipe.get("prep_time"),
+        "cook_time": recipe.get("cook_time"),
+        "tags": recipe.get("tags") or [],
+        "content_hash": content_hash(recipe),
+    }
+    if keep_id and recipe.get("id") is not None:
+        values["id"] = int(recipe["id"])
+    return values
+
+
+def recipe_to_dict(row: Recipe) -> dict:
+    data = {"id": row.id}
+    for field in _FIELDS:
+        data[field] = getattr(row, field)
+    return data
+
+
+def ensure_seeded():
+    """Create the table and import the bundled seed file if the table is empty."""
+    global _SEEDED
+    if _SEEDED:
+        return
+    init_db()
+    session = SessionLocal()
+    try:
+        empty = session.execute(select(func.count(Recipe.id))).scalar_one() == 0
+    finally:
+        session.close()
+    if empty:
+        with open(SEED_FILE, "r") as f:
+            seed = json.load(f)
+        try:
+            # Keep the seed ids so existing references (and the README examples) stay valid
+            bulk_import(seed, keep_ids=True)
+        except IntegrityError:
+            # Another process seeded the table between our count and insert
+            pass
+    _SEEDED = True
+
+
+def add_recipe(recipe: dict):
+    """
+    Insert one recipe atomically. Returns (recipe_id, duplicate_of).
+
+    duplicate_of is None when the recipe was inserted. If the same recipe
+    (by content_hash) or a near-duplicate with a matching title
+    (dedup.find_duplicate) is already stored, nothing is inserted:
+    recipe_id is the stored recipe's id and duplicate_of describes it as
+    {"id", "title", "similarity"}.
+    """
+    from dedup import find_duplicate
+
+    ensure_seeded()
+    near = find_duplicate(recipe, match_title=True)
+    if near is not None:
+        recipe_id, similarity, title = near
+        return recipe_id, {"id": recipe_id, "title": title, "similarity": similarity}
+    values = _row_values(recipe)
+    session = SessionLocal()
+    try:
+        inserted = session.execute(
+            insert(Recipe).values(**values).on_conflict_do_nothing(index_elements=["content_hash"])
+        ).rowcount
+        session.commit()
+        recipe_id, title = session.execute(
+            select(Recipe.id, Recipe.title).where(Recipe.content_hash == values["content_hash"])
+        ).one()
+    finally:
+        session.close()
+    if inserted:
+        return recipe_id, None
+    return recipe_id, {"id": recipe_id, "title": title, "similarity": 1.0}
+
+
+def _insert_batch(session, batch) -> int:
+    # Skip rows whose hash is already stored (or repeated inside this batch)
+    hashes = [row["content_hash"] for row in batch]
+    existing = set(
+        session.execute(select(Recipe.content_hash).where(Recipe.content_hash.in_(hashes))).scalars()
+    )
+    fresh = []
+    for row in batch:
+        if row["content_hash"] in existing:
+            continue
+        existing.add(row["content_hash"])
+        fresh.append(row)
+    if fresh:
+        # ON CONFLICT guards against a concurrent importer racing us on the same rows
+        session.execute(insert(Recipe).on_conflict_do_nothing(index_elements=["content_hash"]), fresh)
+    session.commit()
+    return len(fresh)
+
+
+def bulk_import(recipes, batch_size: int = 500, keep_ids: bool = False) -> int:
+    """
+    Insert recipes from any iterable using executemany batches.
+
+    Each batch is committed in its own transaction so a very large import
+    never holds the write lock for long. Recipes already present (same
+    content_hash) are skipped. Returns the number of rows inserted.
+    """
+    init_db()
+    total = 0
+    batch = []
+    session = SessionLocal()
+    try:
+        for r in recipes:
+            batch.append(_row_values(r, keep_id=keep_ids))
+            if len(batch) >= batch_size:
+                total += _insert_batch(session, batch)
+                batch = []
+        if batch:
+            total += _insert_batch(session, batch)
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+    return total
+
+
+def ids_for_hashes(hashes) -> list:
+    ensure_seeded()
+    session = SessionLocal()
+    try:
+        return list(
+            session.execute(select(Recipe.id).where(Recipe.content_hash.in_(list(hashes)))).scalars()
+        )
+    finally:
+        session.close()
+
+
+def iter_recipes(batch_size: int = 500):
+    """
+    Stream all recipes as plain dicts in id order.
+
+    Uses keyset pagination (id > last_id) so memory stays bounded and each
+    page is a short read transaction, regardless of corpus size.
+    """
+    ensure_seeded()
+    last_id = 0
+    while True:
+        session = SessionLocal()
+        try:
+            rows = (
+                session.execute(
+                    select(Recipe)
+                    .where(Recipe.id > last_id)
+                    .order_by(Recipe.id)
+                    .limit(batch_size)
+                )
+                .scalars()
+                .all()
+            )
+            page = [recipe_to_dict(r) for r in rows]
+        finally:
+            session.close()
+        if not page:
+            return
+        for r in page:
+            yield r
+        last_id = page[-1]["id"]
+
+
+def count_recipes() -> int:
+    ensure_seeded()
+    session = SessionLocal()
+    try:
+        return session.execute(select(func.count(Recipe.id))).scalar_one()
+    finally:
+        session.close()
+
+
+def store_stamp() -> tuple:
+    """(recipe count, highest recipe id): changes whenever recipes are added or removed."""
+    ensure_seeded()
+    session = SessionLocal()
+    try:
+        count, max_id = session.execute(select(func.count(Recipe.id), func.max(Recipe.id))).one()
+        return int(count), int(max_id or 0)
+    finally:
+        session.close()
+
+
+def get_recipes(recipe_ids) -> list:
+    ensure_seeded()
+    session = SessionLocal()
+    try:
+        rows = session.execute(select(Recipe).where(Recipe.id.in_(list(recipe_ids)))).scalars().all()
+        return [recipe_to_dict(r) for r in rows]
+    finally:
+        session.close()
+
+
+# ---------- Stored embeddings ----------
+
+def save_embeddings(model: str, pairs) -> None:
+    """Upsert (recipe_id, vector) pairs for one embedding model as float32 blobs."""
+    rows = []
+    for recipe_id, vec in pairs:
+        arr = np.asarray(vec, dtype=np.float32)
+        rows.append({"recipe_id": int(recipe_id), "model": model, "dim": int(arr.shape[0]), "vector": arr.tobytes()})
+    if not rows:
+        return
+    ensure_seeded()
+    session = SessionLocal()
+    try:
+        stmt = insert(RecipeEmbedding)
+        session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["recipe_id", "model"],
+                set_={"dim": stmt.excluded.dim, "vector": stmt.excluded.vector},
+            ),
+            rows,
+        )
+        session.commit()
+    finally:
+        session.close()
+
+
+def load_embeddings(model: str, recipe_ids=None) -> dict:
+    """Return {recipe_id: float32 vector} for the stored embeddings of `model`."""
+    ensure_seeded()
+    session = SessionLocal()
+    try:
+        q = select(RecipeEmbedding.recipe_id, RecipeEmbedding.vector).where(RecipeEmbedding.model == model)
+        if recipe_ids is not None:
+            q = q.where(RecipeEmbedding.recipe_id.in_(list(recipe_ids)))
+        return {rid: np.frombuffer(blob, dtype=np.float32) for rid, blob in session.execute(q)}
+    finally:
+        session.close()
+
+
+def ids_missing_embeddings(model: str) -> list:
+    ensure_seeded()
+    session = SessionLocal()
+    try:
+        embedded = select(RecipeEmbedding.recipe_id).where(RecipeEmbedding.model == model)
+        return list(
+            session.execute(select(Recipe.id).where(Recipe.id.not_in(embedded)).order_by(Recipe.id)).scalars()
+        )
+    finally:
+        session.close()
@@ -0,0 +1,226 @@
+"""
+Process-wide scheduler for OpenAI requests.
+
+Every request attempt made through llm_adapter.call_with_retries (JSON
+completions and embeddings) first takes a slot here:
+
+- Two token buckets hold traffic under the account limits:
+  SOUSCHEF_LLM_RPM requests per minute (default 500) and SOUSCHEF_LLM_TPM
+  tokens per minute (default 200000, estimated from the prompt size). 0
+  disables a limit.
+- Waiting requests are served strictly by priority, then in arrival order.
+  A user waiting on the agent or a best-by estimate goes ahead of the job
+  worker and index rebuilds queued in the same process (jobs.run_job and
+  rag.build_index enter `with priority(BACKGROUND):`). The caller's priority
+  comes from a context variable and is interactive by default. Ordering is
+  per process: ingest.py and nightly.py run as separate processes with
+  their own scheduler and buckets.
+- A 429 pauses the whole queue for the retry delay, so other callers don't
+  keep hitting the limit.
+- single_flight() shares one in-flight call among identical requests. Ten
+  concurrent asks for the same pantry make one model call. The shared call
+  runs at the most urgent priority among the callers waiting on it, so a
+  user who joins a background job's identical request doesn't wait behind
+  other background work.
+
+Queue depth and wait time per priority are exported through llm_metrics
+(gauge llm_queue_depth, counter llm_queue_wait_seconds_total). Coalesced
+calls appear as hits of the "llm_single_flight" cache.
+"""
+
+import contextvars
+import copy
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from llm_metrics import add_counter, record_cache, record_gauge
+
+
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+LLM_RPM = float(os.getenv("SOUSCHEF_LLM_RPM") or 500)
+LLM_TPM = float(os.getenv("SOUSCHEF_LLM_TPM") or 200_000)
+
+_priority = contextvars.ContextVar("souschef_llm_priority", default=INTERACTIVE)
+_flight = contextvars.ContextVar("souschef_llm_flight", default=None)  # shared call run by this context
+
+
+@contextmanager
+def priority(level: int):
+    """Run the OpenAI calls made inside the block (and in copied contexts) at `level`."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> int:
+    """This context's priority, raised to that of any caller sharing its single_flight() call."""
+    level = _priority.get()
+    flight = _flight.get()
+    return min(level, flight.level) if flight is not None else level
+
+
+class TokenBucket:
+    """`per_minute` units refilled continuously, bursting up to one minute's worth."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.stamp = time.monotonic()
+
+    def wait_time(self, n, now) -> float:
+        """Seconds until `n` units are available (0 if they are now)."""
+        if self.capacity <= 0:
+            return 0.0
+        self.level = min(self.capacity, self.level + (now - self.stamp) * self.rate)
+        self.stamp = now
+        n = min(n, self.capacity)  # a request larger than the bucket would otherwise wait forever
+        return 0.0 if self.level >= n else (n - self.level) / self.rate
+
+    def take(self, n):
+        if self.capacity > 0:
+            self.level -= min(n, self.capacity)
+
+
+class Scheduler:
+    def __init__(self, rpm=LLM_RPM, tpm=LLM_TPM):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self._cond = threading.Condition()
+        self._queue = []  # heap of (priority, arrival) tickets
+        self._arrivals = itertools.count()
+        self._paused_until = 0.0
+        self._depth = dict.fromkeys(PRIORITY_NAMES, 0)
+        self._waited = dict.fromkeys(PRIORITY_NAMES, 0.0)
+
+    def _publish(self, level):
+        record_gauge("llm_queue_depth", self._depth[level], priority=PRIORITY_NAMES[level])
+
+    def _enqueue(self, ticket):
+        heapq.heappush(self._queue, ticket)
+        self._depth[ticket[0]] += 1
+        self._publish(ticket[0])
+
+    def _dequeue(self, ticket):
+        self._queue.remove(ticket)
+        heapq.heapify(self._queue)
+        self._depth[ticket[0]] -= 1
+        self._publish(ticket[0])
+
+    def acquire(self, tokens=1, level=None):
+        """Block until this request may be sent; returns the seconds it waited."""
+        fixed = level
+        start = time.monotonic()
+        with self._cond:
+            ticket = (current_priority() if fixed is None else fixed, next(self._arrivals))
+            self._enqueue(ticket)
+            try:
+                while True:
+                    level = current_priority() if fixed is None else fixed
+                    if level != ticket[0]:
+                        # A more urgent caller joined the shared call: requeue, keeping the arrival order
+                        self._dequeue(ticket)
+                        ticket = (level, ticket[1])
+                        self._enqueue(ticket)
+                    timeout = None  # not at the head: wait for the head to go
+                    if self._queue[0] == ticket:
+                        now = time.monotonic()
+                        timeout = max(
+                            self._paused_until - now,
+                            self.requests.wait_time(1, now),
+                            self.tokens.wait_time(tokens, now),
+                        )
+                        if timeout <= 0:
+                            self.requests.take(1)
+                            self.tokens.take(tokens)
+                            break
+                    self._cond.wait(timeout)
+            finally:
+                waited = time.monotonic() - start
+                self._dequeue(ticket)
+                self._waited[ticket[0]] += waited
+                add_counter("llm_queue_wait_seconds_total", waited, priority=PRIORITY_NAMES[ticket[0]])
+                self._cond.notify_all()
+        return waited
+
+    def wake(self):
+        """Make queued requests re-check their priority."""
+        with self._cond:
+            self._cond.notify_all()
+
+    def pause(self, seconds):
+        """Hold every queued request for `seconds` (after a rate-limit response)."""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                PRIORITY_NAMES[level]: {"queued": self._depth[level], "waited_s": self._waited[level]}
+                for level in PRIORITY_NAMES
+            }
+
+
+SCHEDULER = Scheduler()
+
+
+class _Flight:
+    def __init__(self, level):
+        self.done = threading.Event()
+        self.level = level  # most urgent priority among the callers waiting on it
+        self.followers = 0
+        self.result = None
+        self.error = None
+
+
+_FLIGHTS = {}
+_FLIGHTS_LOCK = threading.Lock()
+
+
+def single_flight(key, fn):
+    """
+    Run fn() once for all concurrent callers passing the same key. Everyone
+    gets the result (their own copy when it was shared) or the exception.
+    fn() runs at the most urgent priority of the callers waiting on it.
+    """
+    level = current_priority()
+    with _FLIGHTS_LOCK:
+        flight = _FLIGHTS.get(key)
+        leader = flight is None
+        if leader:
+            flight = _FLIGHTS[key] = _Flight(level)
+        else:
+            flight.followers += 1
+            promoted = level < flight.level
+            flight.level = min(flight.level, level)
+    record_cache("llm_single_flight", not leader)
+    if not leader:
+        if promoted:
+            SCHEDULER.wake()  # the leader may be queued at its own, lower priority
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return copy.deepcopy(flight.result)
+    token = _flight.set(flight)
+    try:
+        flight.result = fn()
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        _flight.reset(token)
+        with _FLIGHTS_LOCK:
+            _FLIGHTS.pop(key, None)
+            shared = flight.followers > 0
+        flight.done.set()
+    # Callers may mutate what they get back; keep the shared copy pristine
+    return copy.deepcopy(flight.result) if shared else flight.result
@@ -1,186 +1,115 @@
 import sqlite_compat  # ensure modern sqlite before any other imports (SQLAlchemy may import sqlite3)
 import streamlit as st
-from datetime import date, timedelta
-from sqlalchemy import func
+from datetime import date
 
-from db import init_db, SessionLocal, Item
-from ai import estimate_best_buy
-from rag import query_recipes_by_ingredients
-from agent import recommend_recipes_with_agent
+from db import init_db, pantry_version, SessionLocal, Item
+from pantry import (apply_recipe_to_pantry, classify_expiry, compute_grocery_list, display_ingredient, recipe_servings,
+                    scale_recipe)
+import cookable  # registers the pantry listener that keeps the "cookable now" index current
+import jobs
+import llm_metrics
+import profiling
+
+# ai, rag and agent (and with them the OpenAI SDK, httpx and NumPy) are
+# imported inside the pages that use them, so Inventory, Grocery and
+# Toss-Out render without loading the LLM/RAG stack.
+# `python -m bench.import_report` shows what the entry point imports.
 
 
 st.set_page_config(page_title="SousChef", layout="wide")
 
 
 def main():
-    init_db()
-
-    st.sidebar.title("SousChef")
-    page = st.sidebar.radio(
-        "Go to",
-        ["Inventory", "Recipe Recommender", "Grocery List", "Toss-Out / Expiring"]
-    )
-
-    if page == "Inventory":
-        inventory_page()
-    elif page == "Recipe Recommender":
-        recipe_page()
-    elif page == "Grocery List":
-        grocery_page()
-    elif page == "Toss-Out / Expiring":
-        tossout_page()
-
-
-# ---------- Helper: apply recipe to pantry ----------
-
-def _normalize_unit(u: str) -> str:
-    u = (u or "").strip().lower()
-    aliases = {
-        "g": "g",
-        "gram": "g",
-        "grams": "g",
-        "kg": "kg",
-        "kilogram": "kg",
-        "kilograms": "kg",
-        "oz": "oz",
-        "ounce": "oz",
-        "ounces": "oz",
-        "lb": "lb",
-        "lbs": "lb",
-        "pound": "lb",
-        "pounds": "lb",
-        "ml": "ml",
-        "milliliter": "ml",
-        "milliliters": "ml",
-        "l": "l",
-        "liter": "l",
-        "liters": "l",
-        "tsp": "tsp",
-        "teaspoon": "tsp",
-        "teaspoons": "tsp",
-        "tbsp": "tbsp",
-        "tablespoon": "tbsp",
-        "tablespoons": "tbsp",
-        "cup": "cup",
-        "cups": "cup",
-        "item": "item",
-        "items": "item",
-        "pcs": "item",
-        "piece": "item",
-        "pieces": "item",
-    }
-    return aliases.get(u, u)
-
-
-def _convert_amount(amount: float, from_unit: str, to_unit: str):
-    from_u = _normalize_unit(from_unit)
-    to_u = _normalize_unit(to_unit)
-    if from_u == to_u:
-        return amount, True
-    # mass (g, kg, oz, lb)
-    if from_u == "kg" and to_u == "g":
-        return amount * 1000.0, True
-    if from_u == "g" and to_u == "kg":
-        return amount / 1000.0, True
-    if from_u == "oz" and to_u == "g":
-        return amount * 28.3495, True
-    if from_u == "g" and to_u == "oz":
-        return amount / 28.3495, True
-    if from_u == "lb" and to_u == "kg":
-        return amount * 0.453592, True
-    if from_u == "kg" and to_u == "lb":
-        return amount / 0.453592, True
-    if from_u == "lb" and to_u == "g":
-        return amount * 453.592, True
-    if from_u == "g" and to_u == "lb":
-        return amount / 453.592, True
-    # volume
-    if from_u == "l" and to_u == "ml":
-        return amount * 1000.0, True
-    if from_u == "ml" and to_u == "l":
-        return amount / 1000.0, True
-    # US kitchen measures approximations via mL
-    if from_u == "tsp" and to_u == "ml":
-        return amount * 4.92892, True
-    if from_u == "ml" and to_u == "tsp":
-        return amount / 4.92892, True
-    if from_u == "tbsp" and to_u == "ml":
-        return amount * 14.7868, True
-    if from_u == "ml" and to_u == "tbsp":
-        return amount / 14.7868, True
-    if from_u == "cup" and to_u == "ml":
-        return amount * 240.0, True
-    if from_u == "ml" and to_u == "cup":
-        return amount / 240.0, True
-    # Cross conversions among tsp/tbsp/cup using ml as intermediary
-    if from_u == "tsp" and to_u == "tbsp":
-        return (amount * 4.92892) / 14.7868, True
-    if from_u == "tbsp" and to_u == "tsp":
-        return (amount * 14.7868) / 4.92892, True
-    if from_u == "tsp" and to_u == "cup":
-        return (amount * 4.92892) / 240.0, True
-    if from_u == "cup" and to_u == "tsp":
-        return (amount * 240.0) / 4.92892, True
-    if from_u == "tbsp" and to_u == "cup":
-        return (amount * 14.7868) / 240.0, True
-    if from_u == "cup" and to_u == "tbsp":
-        return (amount * 240.0) / 14.7868, True
-    # items
-    if from_u == "item" and to_u == "item":
-        return amount, True
-    # not convertible
-    return amount, False
-
-
-def apply_recipe_to_pantry(recipe):
-    """
-    Decrements pantry/fridge quantities based on a recipe's ingredients.
-    Assumes recipe['ingredients'] is a list of {name, amount, unit}.
-    """
-    session = SessionLocal()
-
-    for ing in recipe.get("ingredients", []):
-        name = (ing.get("name") or "").strip().lower()
-        amount = ing.get("amount")
-        unit = (ing.get("unit") or "").strip().lower()
-
-        if not name or amount is None:
-            continue
-
-        # Case-insensitive name match
-        item = (
-            session.query(Item)
-            .filter(func.lower(Item.name) == name)
-            .first()
+    # Opt-in: SOUSCHEF_PROFILE=1 or ?profile=1 (see profiling.py)
+    with profiling.rerun(profiling.enabled(st.query_params)) as report:
+        init_db()
+        llm_metrics.start_metrics_server()  # no-op unless SOUSCHEF_METRICS_PORT is set
+        jobs.start_worker()  # best-by estimates and precomputed recommendations; no-op if SOUSCHEF_WORKER=0
+
+        st.sidebar.title("SousChef")
+        page = st.sidebar.radio("Go to", list(PAGES))
+        profiling.run_page(page, PAGES[page])
+
+        metrics_panel()
+    if report is not None:
+        profile_panel(report)
+
+
+def metrics_panel():
+    """Sidebar summary of OpenAI latency/tokens/retries for this server process."""
+    snap = llm_metrics.snapshot()
+    with st.sidebar.expander("LLM metrics"):
+        if not snap["calls"]:
+            st.caption("No OpenAI calls yet in this process.")
+            return
+        total_calls = sum(c["calls"] for c in snap["calls"])
+        total_in = sum(c["input_tokens"] for c in snap["calls"])
+        total_out = sum(c["output_tokens"] for c in snap["calls"])
+        st.write(f"Calls: {total_calls} — tokens in/out: {total_in}/{total_out}")
+        st.table(
+            [
+                {
+                    "operation": c["operation"],
+                    "shape": c["shape"],
+                    "calls": c["calls"],
+                    "errors": c["errors"],
+                    "avg s": round(c["latency_avg_s"], 3),
+                    "max s": round(c["latency_max_s"], 3),
+                    "in tok": c["input_tokens"],
+                    "out tok": c["output_tokens"],
+                    "cached tok": c["cached_tokens"],
+                }
+                for c in snap["calls"]
+            ]
         )
-        if not item:
-            continue
-
-        # Try to convert recipe amount to the stored item's unit (basic conversions)
-        target_unit = (item.unit or "").strip().lower()
-        amt_to_subtract = float(amount)
-        ok_unit = True
-        if unit and target_unit:
-            converted, ok_unit = _convert_amount(float(amount), unit, target_unit)
-            if ok_unit:
-                amt_to_subtract = converted
-        elif unit and not target_unit:
-            # If item has no unit stored, assume direct subtraction
-            amt_to_subtract = float(amount)
-        elif not unit and target_unit:
-            # Recipe unit missing but item has unit; only subtract if item unit is 'item'
-            if _normalize_unit(target_unit) != "item":
-                ok_unit = False
-
-        if not ok_unit:
-            continue
-
-        # Subtract quantity and clamp at zero
-        current_qty = float(item.quantity or 0.0)
-        item.quantity = max(0.0, current_qty - float(amt_to_subtract))
-
-    session.commit()
-    session.close()
+        if snap["retries"]:
+            st.write("Retries / fallbacks:")
+            for r in snap["retries"]:
+                st.write(f"- {r['operation']}: {r['reason']} × {r['count']}")
+        if snap["caches"]:
+            st.write("Caches:")
+            for c in snap["caches"]:
+                st.write(f"- {c['cache']}: {c['hits']} hits / {c['misses']} misses")
+        queue = {}
+        for g in snap["gauges"] + snap["counters"]:
+            if g["name"].startswith("llm_queue_"):
+                queue.setdefault(g["labels"].get("priority"), {})[g["name"]] = g["value"]
+        if queue:
+            st.write("Request queue:")
+            for name, q in sorted(queue.items()):
+                st.write(f"- {name}: {q.get('llm_queue_depth', 0)} waiting, "
+                         f"{q.get('llm_queue_wait_seconds_total', 0):.1f}s waited in total")
+
+
+def profile_panel(report):
+    """Sidebar breakdown of the rerun that just finished (profiling mode only)."""
+    with st.sidebar.expander("Render profile", expanded=True):
+        total = report.spans[0]
+        st.write(
+            f"Rerun: {total['seconds'] * 1000:.0f} ms — {total['sql']} SQL statements "
+            f"({total['sql_s'] * 1000:.0f} ms), {total['llm']} OpenAI calls ({total['llm_s'] * 1000:.0f} ms)"
+        )
+        st.table(
+            [
+                {
+                    "span": "· " * s["depth"] + s["name"],
+                    "ms": round(s["seconds"] * 1000, 1),
+                    "sql": s["sql"],
+                    "sql ms": round(s["sql_s"] * 1000, 1),
+                    "sessions": s["session"],
+                    "session ms": round(s["session_s"] * 1000, 1),
+                    "llm": s["llm"],
+                    "llm ms": round(s["llm_s"] * 1000, 1),
+                    "other ms": round((s["seconds"] - s["sql_s"] - s["llm_s"]) * 1000, 1),
+                }
+                for s in report.spans
+            ]
+        )
+        if report.elements:
+            st.write(f"Elements: {sum(report.elements.values())}")
+            st.write(", ".join(f"{kind} × {n}" for kind, n in sorted(report.elements.items(), key=lambda e: -e[1])))
+        for path in report.profiles:
+            st.caption(f"cProfile stats: {path}")
 
 
 # ---------- Inventory ----------
@@ -212,8 +141,14 @@ def inventory_page():
             purchase_date=purchase_date,
         )
 
-        if use_ai:
+        background = use_ai and jobs.worker_enabled()
+        if background:
+            # The worker fills in the estimate; don't make the click wait for the model
+            item.best_buy_source = "pending"
+        elif use_ai:
             try:
+                from ai import estimate_best_buy
+
                 result = estimate_best_buy(name, category, purchase_date)
                 from datetime import date as dcls
                 item.best_buy_date = dcls.fromisoformat(result["best_buy_date"])
@@ -235,8 +170,10 @@ def inventory_page():
 
         session.add(item)
         session.commit()
+        if background:
+            jobs.queue_best_by(item.id)
         session.close()
-        st.success(f"Added {name}")
+        st.success(f"Added {name}" + (" — estimating best-by date in the background" if background else ""))
         # Clear inputs for convenience
         try:
             st.session_state["add_name"] = ""
@@ -282,7 +219,10 @@ def inventory_page():
             with cols[3]:
                 st.write(i.unit or "")
             with cols[4]:
-                st.write(f"{i.best_buy_date or '-'}")
+                if i.best_buy_source == "pending":
+                    st.write("estimating…")
+                else:
+                    st.write(f"{i.best_buy_date or '-'}")
             with cols[5]:
                 # Compact two small buttons in-line so they fit cleanly
                 btn_a, btn_b = st.columns([1, 1], gap="small")
@@ -313,10 +253,35 @@ def inventory_page():
     else:
         st.info("No items yet. Add some above.")
 
+    with st.expander("Recently cooked"):
+        import ledger
+
+        batches = ledger.recent_batches("cook", limit=5)
+        if not batches:
+            st.caption("Nothing cooked yet.")
+        for b in batches:
+            c1, c2 = st.columns([4, 1])
+            c1.write(f"{b['note'] or 'Recipe'} — {b['items']} item(s), {b['created_at']:%b %d %H:%M}")
+            if b["undone"]:
+                c2.write("undone")
+            elif c2.button("Undo", key=f"undo_{b['batch_id']}"):
+                try:
+                    ledger.undo(b["batch_id"])
+                except ValueError as e:
+                    st.info(str(e))  # undone meanwhile (double click, another tab)
+                    continue
+                st.success(f"Restored the pantry from before '{b['note'] or 'recipe'}'")
+                try:
+                    st.experimental_rerun()
+                except Exception:
+                    pass
+
 
 # ---------- Recipe Recommender ----------
 
 def recipe_page():
+    from agent import recommend_recipes_with_agent
+
     st.header("Recipe Recommender")
 
     # Mode selector: RAG (local) or Online (web search via Responses API)
@@ -333,6 +298,17 @@ def recipe_page():
     if "recommended_recipes" not in st.session_state:
         st.session_state["recommended_recipes"] = []
 
+    # Serve the background worker's recommendations for the current pantry, if ready
+    version = pantry_version()
+    if not mode.startswith("Online") and st.session_state.get("recommended_version") != version:
+        ready = jobs.precomputed_recommendations()
+        if ready is not None:
+            st.session_state["recommended_recipes"] = ready.get("recipes", [])
+            st.session_state["recommended_version"] = version
+            st.caption("Suggestions for your current pantry are ready.")
+        else:
+            jobs.request_recommendations()  # ready on a later visit
+
     if st.button("Suggest recipes from my pantry"):
         with st.spinner("SousChef is thinking..."):
             try:
@@ -349,12 +325,29 @@ def recipe_page():
                 result = recommend_recipes_with_agent(extra_candidates=extra)
                 recipes = result.get("recipes", [])
                 st.session_state["recommended_recipes"] = recipes
+                st.session_state["recommended_version"] = version
             except Exception as e:
                 st.error(f"Failed to get recommendations: {e}")
 
     recipes = st.session_state["recommended_recipes"]
 
-    selected_titles = []
+    col_a, col_b = st.columns([1, 2])
+    cookable_only = col_a.checkbox("Cookable now", help="Only recipes the pantry fully covers")
+    max_missing = col_b.slider("Missing ingredients allowed", 0, 3, 0, disabled=not cookable_only)
+    if cookable_only:
+        ready = cookable.cookable_recipes(max_missing=max_missing, titles=[r.get("title") for r in recipes])
+        ready_titles = {(c["title"] or "").lower() for c in ready}
+        shown = [r for r in recipes if (r.get("title") or "").lower() in ready_titles]
+        # Fill up with cookbook recipes the agent didn't suggest
+        fill = cookable.cookable_recipes(max_missing=max_missing, limit=20)
+        titles = {(r.get("title") or "").lower() for r in shown}
+        shown += [c for c in fill if (c["title"] or "").lower() not in titles][: max(0, 20 - len(shown))]
+        count = cookable.cookable_count(max_missing=max_missing)
+        st.caption(f"{count} cookbook recipes are missing at most {max_missing} ingredient(s).")
+        recipes = shown
+
+    selected_recipes = []  # the dicts, not titles: "Cookable now" shows cookbook recipes the agent didn't suggest
+    selected_servings = {}
     for idx, r in enumerate(recipes):
         col1, col2, col3 = st.columns([3, 1, 1])
         with col1:
@@ -387,54 +380,49 @@ def recipe_page():
             if tags:
                 st.write("Tags:", ", ".join(tags))
 
-            # Add to cookbook button (save web-sourced recipes into local seed_recipes.json)
+            # Amounts, "Cook this" and the grocery list follow the servings chosen here
+            base_servings = recipe_servings(r)
+            target_servings = None
+            if base_servings:
+                target_servings = st.number_input(
+                    "Cook for (servings)", min_value=1, max_value=100, value=int(round(base_servings)), step=1,
+                    key=f"servings_{idx}",
+                )
+            scaled = scale_recipe(r, target_servings)
+
+            # Add to cookbook button (save web-sourced recipes into the local recipe store)
             if st.button("Add to cookbook", key=f"add_{idx}"):
                 try:
-                    import json as _json
-                    from pathlib import Path as _Path
                     import rag as _rag
-
-                    recipes_file = _Path("recipes/seed_recipes.json")
-                    data = _json.load(open(recipes_file))
-                    max_id = max((r.get("id") or 0) for r in data) if data else 0
-                    new_id = max_id + 1
-                    # Normalize fields for storage
-                    store = {
-                        "id": new_id,
-                        "title": r.get("title"),
-                        "ingredients": r.get("ingredients", []),
-                        "steps": r.get("steps") or r.get("detailed_steps") or "",
-                        "source": r.get("source") or r.get("url"),
-                        "detailed_steps": r.get("detailed_steps"),
-                        "servings": r.get("servings"),
-                        "prep_time": r.get("prep_time"),
-                        "cook_time": r.get("cook_time"),
-                        "tags": r.get("tags", []),
-                    }
-                    data.append(store)
-                    _json.dump(data, open(recipes_file, "w"), indent=2)
-                    # Rebuild the in-memory index
-                    try:
-                        _rag.build_index()
-                    except Exception:
-                        _rag._INDEX = None
-                        _rag.build_index()
-                    st.success(f"Added '{r.get('title')}' to cookbook")
+                    from recipe_store import add_recipe
+
+                    _, duplicate_of = add_recipe(r)
+                    if duplicate_of:
+                        st.info(
+                            f"Not added: '{r.get('title')}' matches '{duplicate_of['title']}', already in the "
+                            f"cookbook ({duplicate_of['similarity']:.0%} similar)"
+                        )
+                    else:
+                        # Rebuild the in-memory index
+                        try:
+                            _rag.build_index()
+                        except Exception:
+                            _rag._INDEX = None
+                            _rag.build_index()
+                        st.success(f"Added '{r.get('title')}' to cookbook")
                 except Exception as e:
                     st.error(f"Failed to add to cookbook: {e}")
 
             with st.expander("View ingredient amounts"):
-                ings = r.get("ingredients", [])
+                ings = scaled.get("ingredients", [])
                 if ings:
-                    # Show ingredients as a small table
-                    try:
-                        import pandas as _pd
-
-                        df = _pd.DataFrame(ings)
-                        st.table(df)
-                    except Exception:
-                        for ing in ings:
-                            st.write(f"- {ing.get('name')} — {ing.get('amount')} {ing.get('unit')}")
+                    # Show ingredients as a small markdown table (no pandas needed)
+                    rows = [
+                        f"| {ing.get('name', '')} | {ing.get('amount', '')} | {ing.get('unit', '') or ''} |"
+                        for ing in map(display_ingredient, ings)
+                        if isinstance(ing, dict)
+                    ]
+                    st.markdown("\n".join(["| name | amount | unit |", "| --- | --- | --- |", *rows]))
                 else:
                     st.write("No ingredients available.")
             # Detailed step-by-step instructions (preferred over the short `steps`)
@@ -478,14 +466,19 @@ def recipe_page():
 
         with col2:
             if st.checkbox("Select", key=f"select_{idx}"):
-                selected_titles.append(r["title"])
+                selected_recipes.append(r)
+                if target_servings:
+                    selected_servings[r["title"]] = target_servings
 
         with col3:
             if st.button("Cook this", key=f"cook_{idx}"):
-                apply_recipe_to_pantry(r)
-                st.success(f"Updated pantry based on '{r['title']}'")
+                if apply_recipe_to_pantry(r, servings=target_servings):
+                    st.success(f"Updated pantry based on '{r['title']}' (undo under Inventory → Recently cooked)")
+                else:
+                    st.info(f"Nothing in the pantry matched '{r['title']}'")
 
-    st.session_state["selected_recipe_titles"] = selected_titles
+    st.session_state["selected_recipes"] = selected_recipes
+    st.session_state["selected_recipe_servings"] = selected_servings
 
 
 # ---------- Grocery List ----------
@@ -493,10 +486,18 @@ def recipe_page():
 def grocery_page():
     st.header("Grocery List")
 
-    recipes = st.session_state.get("recommended_recipes", [])
-    selected_titles = st.session_state.get("selected_recipe_titles", [])
+    import ledger
 
-    selected_recipes = [r for r in recipes if r["title"] in selected_titles]
+    reorder = ledger.reorder_suggestions(horizon_days=7)
+    if reorder:
+        st.markdown("### Running low (at your usage over the last 4 weeks)")
+        for item in reorder:
+            st.write(
+                f"- {item['name']}: buy {item['amount']:.2f} {item['unit']} "
+                f"(~{item['per_day']} {item['unit']}/day, {item['days_left']} days left)"
+            )
+
+    selected_recipes = st.session_state.get("selected_recipes", [])
 
     if not selected_recipes:
         st.info("No recipes selected yet. Go to Recipe Recommender and select some.")
@@ -508,44 +509,12 @@ def grocery_page():
     pantry_items = session.query(Item).all()
     session.close()
 
-    # Build a map of pantry availability: name -> {unit, quantity}
-    pantry_map = {}
-    for p in pantry_items:
-        key = (p.name or "").strip().lower()
-        pantry_map.setdefault(key, []).append({
-            "unit": (p.unit or "").strip().lower(),
-            "quantity": float(p.quantity or 0.0),
-        })
-
-    def available_amount(name: str, unit: str) -> float:
-        key = (name or "").strip().lower()
-        total = 0.0
-        for entry in pantry_map.get(key, []):
-            qty = entry["quantity"]
-            ent_unit = entry["unit"]
-            converted, ok = _convert_amount(qty, ent_unit or unit, unit)
-            if ok:
-                total += float(converted)
-        return total
-
-    # Aggregate required amounts per ingredient
-    needed = {}
-    for r in selected_recipes:
-        for ing in r.get("ingredients", []):
-            name = (ing.get("name") or "").strip().lower()
-            amount = float(ing.get("amount") or 0.0)
-            unit = (ing.get("unit") or "").strip().lower()
-            if not name or amount <= 0:
-                continue
-            have = available_amount(name, unit)
-            short = max(0.0, amount - have)
-            if short > 0:
-                key = (name, _normalize_unit(unit))
-                needed[key] = needed.get(key, 0.0) + short
+    servings = st.session_state.get("selected_recipe_servings", {})
+    needed = compute_grocery_list(selected_recipes, pantry_items, servings=servings)
 
     st.markdown("### Recipes selected")
     for r in selected_recipes:
-        st.write(f"- {r['title']}")
+        st.write(f"- {r['title']}" + (f" (for {servings[r['title']]})" if r["title"] in servings else ""))
 
     st.markdown("### Items to buy")
     if needed:
@@ -555,27 +524,62 @@ def grocery_page():
         st.success("You already have everything you need for these recipes.")
 
 
+# ---------- Meal Plan ----------
+
+def meal_plan_page():
+    st.header("Meal Plan")
+    st.caption("Plans meals from the cookbook so the items closest to their best-by date get used first.")
+
+    col1, col2 = st.columns(2)
+    days = col1.number_input("Days", min_value=1, max_value=14, value=7, step=1)
+    meals_per_day = col2.number_input("Meals per day", min_value=1, max_value=3, value=1, step=1)
+
+    if st.button("Plan meals"):
+        from planner import plan_meals
+
+        with st.spinner("Planning..."):
+            st.session_state["meal_plan"] = plan_meals(days=int(days), meals_per_day=int(meals_per_day))
+
+    plan = st.session_state.get("meal_plan")
+    if not plan:
+        return
+    if not any(d["meals"] for d in plan["days"]):
+        st.info("No cookbook recipe uses anything in your pantry that is still within its best-by date.")
+        return
+
+    for day in plan["days"]:
+        st.markdown(f"### {day['date']:%a %b %d}")
+        if not day["meals"]:
+            st.write("- (nothing left worth planning)")
+        for meal in day["meals"]:
+            line = f"- **{meal['recipe']['title']}** — uses {', '.join(meal['uses']) or 'nothing on hand'}"
+            if meal["missing"]:
+                line += f"; buy {', '.join(meal['missing'])}"
+            st.markdown(line)
+
+    st.markdown("### Items to buy")
+    if plan["grocery"]:
+        for g in plan["grocery"]:
+            st.write(f"- {g['name']}: {g['amount']:.2f} {g['unit']}")
+    else:
+        st.success("The pantry covers the whole plan.")
+
+    if plan["expiring_unused"]:
+        st.markdown("### Will still expire unused")
+        for i in plan["expiring_unused"]:
+            st.write(f"- {i['name']}: {i['quantity']} {i['unit']}, best by {i['best_buy_date']}")
+
+
 # ---------- Toss-Out / Expiring ----------
 
 def tossout_page():
     st.header("Toss-Out / Expiring Items")
 
-    today = date.today()
-    soon = today + timedelta(days=2)
-
     session = SessionLocal()
     items = session.query(Item).all()
     session.close()
 
-    expired = []
-    expiring_soon = []
-    for i in items:
-        if not i.best_buy_date:
-            continue
-        if i.best_buy_date <= today:
-            expired.append(i)
-        elif today <= i.best_buy_date <= soon:
-            expiring_soon.append(i)
+    expired, expiring_soon = classify_expiry(items, date.today(), soon_days=2)
 
     st.markdown("### Expired (consider tossing)")
     if expired:
@@ -592,5 +596,14 @@ def tossout_page():
         st.info("Nothing expiring in the next 2 days.")
 
 
+PAGES = {
+    "Inventory": inventory_page,
+    "Recipe Recommender": recipe_page,
+    "Meal Plan": meal_plan_page,
+    "Grocery List": grocery_page,
+    "Toss-Out / Expiring": tossout_page,
+}
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,43 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# db.py binds its engine at import, so point it at a scratch database first
+_TMP = tempfile.mkdtemp(prefix="souschef-tests-")
+os.environ["SOUSCHEF_DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP, 'test.db')}"
+os.environ["SOUSCHEF_WORKER"] = "0"
+os.environ["SOUSCHEF_EMBEDDER"] = "local"
+os.environ["SOUSCHEF_INDEX_DIR"] = os.path.join(_TMP, "index")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def db():
+    """An empty database for one test."""
+    from db import Base, engine, init_db
+
+    init_db()
+    yield
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+
+
+@pytest.fixture
+def add_items(db):
+    """add_items(("flour", 1000, "g"), ...) -> the new item ids."""
+    from db import Item, SessionLocal
+
+    def add(*rows):
+        session = SessionLocal()
+        try:
+            items = [Item(name=name, quantity=qty, unit=unit) for name, qty, unit in rows]
+            session.add_all(items)
+            session.commit()
+            return [i.id for i in items]
+        finally:
+            session.close()
+
+    return add
@@ -0,0 +1,50 @@
+import cookable
+import db
+from db import Item, SessionLocal
+from recipe_store import bulk_import
+
+PANCAKES = {
+    "title": "Pancakes",
+    "ingredients": [
+        {"name": "flour", "amount": 200, "unit": "g"},
+        {"name": "eggs", "amount": 2, "unit": "item"},
+    ],
+}
+
+
+def cookable_titles():
+    return [r["title"] for r in cookable.cookable_recipes(titles=["Pancakes"])]
+
+
+def set_quantity(name, quantity):
+    session = SessionLocal()
+    session.query(Item).filter(Item.name == name).one().quantity = quantity
+    session.commit()
+    session.close()
+
+
+def test_listener_catches_up_on_writes_it_never_saw(add_items, monkeypatch):
+    bulk_import([PANCAKES])
+    add_items(("flour", 1000, "g"), ("milk", 1, "l"))
+    assert cookable_titles() == []
+
+    with monkeypatch.context() as m:
+        m.setattr(db, "_PANTRY_LISTENERS", [])  # a process that never imported cookable
+        add_items(("eggs", 6, "item"))
+    set_quantity("milk", 2)  # this process's listener only hears about milk
+
+    session = SessionLocal()
+    try:
+        assert session.get(db.Counter, cookable.INDEX_COUNTER).value == db.pantry_version(session)
+    finally:
+        session.close()
+    assert cookable_titles() == ["Pancakes"]
+
+
+def test_listener_applies_its_own_commit(add_items):
+    bulk_import([PANCAKES])
+    add_items(("flour", 1000, "g"), ("eggs", 6, "item"))
+    assert cookable_titles() == ["Pancakes"]
+
+    set_quantity("eggs", 1)
+    assert cookable_titles() == []
@@ -0,0 +1,96 @@
+import pytest
+
+import dedup
+from recipe_store import add_recipe
+
+CURRY = {
+    "title": "Easy Spinach & Chickpea Curry",
+    "ingredients": [
+        {"name": "Chickpeas", "amount": 400, "unit": "g"},
+        {"name": "spinach", "amount": 200, "unit": "g"},
+        {"name": "tomatoes", "amount": 2, "unit": "item"},
+        {"name": "onion", "amount": 1, "unit": "item"},
+        {"name": "garam masala", "amount": 2, "unit": "tsp"},
+    ],
+}
+CURRY_REWORDED = {
+    "title": "Spinach and Chickpea Curry",
+    "ingredients": [
+        {"name": "chickpea", "amount": 1, "unit": "can"},
+        {"name": "Spinach", "amount": 1, "unit": "bag"},
+        {"name": "tomato", "amount": 2, "unit": "item"},
+        {"name": "onions", "amount": 1, "unit": "item"},
+        {"name": "garam masala", "amount": 1, "unit": "tbsp"},
+    ],
+}
+PANCAKES = {
+    "title": "Fluffy Pancakes",
+    "ingredients": [
+        {"name": "flour", "amount": 200, "unit": "g"},
+        {"name": "eggs", "amount": 2, "unit": "item"},
+        {"name": "milk", "amount": 300, "unit": "ml"},
+    ],
+}
+
+
+def sig(recipe):
+    return dedup.signature(dedup.shingles(recipe))
+
+
+def test_reworded_copy_is_a_near_duplicate():
+    assert dedup.similarity(sig(CURRY), sig(CURRY_REWORDED)) >= dedup.THRESHOLD
+    index = dedup.LSHIndex()
+    index.add("curry", sig(CURRY))
+    index.add("pancakes", sig(PANCAKES))
+    [(key, similarity)] = index.query(sig(CURRY_REWORDED))
+    assert key == "curry" and similarity >= dedup.THRESHOLD
+
+
+def test_different_recipe_is_not_a_duplicate():
+    assert dedup.similarity(sig(CURRY), sig(PANCAKES)) < 0.3
+    index = dedup.LSHIndex()
+    index.add("curry", sig(CURRY))
+    assert index.query(sig(PANCAKES)) == []
+
+
+def test_unique_keeps_the_first_of_each_group():
+    assert dedup.unique([CURRY, PANCAKES, CURRY_REWORDED, "not a recipe"]) == [CURRY, PANCAKES]
+    groups = dedup.clusters([CURRY, PANCAKES, CURRY_REWORDED])
+    assert [(kept, [pos for pos, _ in dups]) for kept, dups in groups] == [(0, [2])]
+
+
+def test_signatures_are_stable_and_empty_recipes_have_none():
+    assert (sig(CURRY) == sig(dict(CURRY))).all()
+    assert sig({"title": "", "ingredients": []}) is None
+
+
+def test_titles_must_name_the_same_dish():
+    assert dedup.same_title(CURRY["title"], CURRY_REWORDED["title"])
+    assert not dedup.same_title("Tomato Soup", "Tomato Sauce")
+    assert not dedup.same_title("", "Tomato Soup")
+
+
+@pytest.fixture
+def cookbook(db, monkeypatch):
+    # The cookbook index only reads rows newer than the last one it saw; start it over for a fresh table
+    monkeypatch.setattr(dedup, "_COOKBOOK", None)
+    monkeypatch.setattr(dedup, "_COOKBOOK_TITLES", {})
+    monkeypatch.setattr(dedup, "_COOKBOOK_LAST_ID", 0)
+
+
+def test_add_recipe_reports_duplicates_instead_of_dropping_them(cookbook):
+    curry_id, duplicate_of = add_recipe(CURRY)
+    assert duplicate_of is None
+    assert add_recipe(CURRY) == (curry_id, {"id": curry_id, "title": CURRY["title"], "similarity": 1.0})
+    recipe_id, duplicate_of = add_recipe(CURRY_REWORDED)
+    assert recipe_id == curry_id and duplicate_of["title"] == CURRY["title"]
+
+    soup = {
+        "title": "Tomato Soup",
+        "ingredients": [{"name": n, "amount": 1, "unit": "item"} for n in ("tomatoes", "onion", "garlic", "basil")],
+    }
+    sauce = dict(soup, title="Tomato Sauce")
+    assert dedup.similarity(sig(soup), sig(sauce)) >= dedup.THRESHOLD
+    soup_id, _ = add_recipe(soup)
+    sauce_id, duplicate_of = add_recipe(sauce)
+    assert duplicate_of is None and sauce_id != soup_id
@@ -0,0 +1,33 @@
+import os
+
+import index_store
+import rag
+from recipe_store import bulk_import
+
+
+def bowl(n):
+    return {
+        "title": f"Chicken Rice Bowl {n}",
+        "ingredients": [
+            {"name": "chicken thigh", "amount": 300, "unit": "g"},
+            {"name": "jasmine rice", "amount": 200, "unit": "g"},
+            {"name": f"scallion {n}", "amount": 2, "unit": "item"},
+        ],
+    }
+
+
+def test_recipes_added_without_embedding_are_searched(db):
+    bulk_import([{"title": "Pancakes", "ingredients": [{"name": "flour", "amount": 200, "unit": "g"}]}])
+    before = rag.ensure_index()["generation"]
+
+    bulk_import(bowl(n) for n in range(5))  # what ingest.py --no-embed and bench.synthetic do
+    titles = [r["title"] for r in rag.query_recipes_by_ingredients(["chicken thigh", "jasmine rice"])]
+    assert any(t.startswith("Chicken Rice Bowl") for t in titles)
+    assert rag.ensure_index()["generation"] > before
+
+
+def test_each_database_gets_its_own_index_directory(monkeypatch):
+    here = index_store.index_dir("local", "float32")
+    monkeypatch.setattr(index_store.engine, "url", index_store.engine.url.set(database="/elsewhere/other.db"))
+    assert index_store.index_dir("local", "float32") != here
+    assert os.path.dirname(index_store.index_dir("local", "float32")) == os.path.dirname(here)
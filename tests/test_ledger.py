@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+import ledger
+from db import InventoryEvent, InventorySnapshot, Item, SessionLocal
+from pantry import apply_recipe_to_pantry
+
+PANCAKES = {
+    "title": "Pancakes",
+    "ingredients": [
+        {"name": "flour", "amount": 400, "unit": "g"},
+        {"name": "eggs", "amount": 4, "unit": "item"},
+    ],
+}
+
+
+def quantities():
+    session = SessionLocal()
+    try:
+        return {i.name: i.quantity for i in session.query(Item)}
+    finally:
+        session.close()
+
+
+def state_quantities():
+    return {row["name"]: row["quantity"] for row in ledger.current_state()}
+
+
+def test_cook_and_undo_round_trip(add_items):
+    add_items(("flour", 1000, "g"), ("eggs", 12, "item"))
+
+    batch = apply_recipe_to_pantry(PANCAKES)
+    assert quantities() == {"flour": 600, "eggs": 8}
+    assert state_quantities() == quantities()
+    [cooked] = ledger.recent_batches("cook")
+    assert (cooked["batch_id"], cooked["note"], cooked["items"], cooked["undone"]) == (batch, "Pancakes", 2, False)
+
+    ledger.undo(batch)
+    assert quantities() == {"flour": 1000, "eggs": 12}
+    assert state_quantities() == quantities()
+    assert ledger.recent_batches("cook")[0]["undone"]
+    with pytest.raises(ValueError):
+        ledger.undo(batch)
+
+
+def test_undo_brings_back_a_deleted_item(add_items):
+    [item_id] = add_items(("milk", 1, "l"))
+    session = SessionLocal()
+    session.delete(session.get(Item, item_id))
+    session.commit()
+    session.close()
+    [batch] = ledger.recent_batches("delete")
+
+    ledger.undo(batch["batch_id"])
+    assert quantities() == {"milk": 1}
+
+
+def test_undo_of_a_delete_leaves_an_item_that_reused_its_id_alone(add_items):
+    add_items(("flour", 1000, "g"))
+    [milk_id] = add_items(("milk", 1, "l"))
+    session = SessionLocal()
+    session.delete(session.get(Item, milk_id))
+    session.commit()
+    session.close()
+    [batch] = ledger.recent_batches("delete")
+    [eggs_id] = add_items(("eggs", 12, "item"))
+    assert eggs_id == milk_id  # SQLite hands out the deleted id again
+
+    ledger.undo(batch["batch_id"])
+    assert quantities() == {"flour": 1000, "eggs": 12, "milk": 1}
+    assert state_quantities() == quantities()
+
+
+def test_snapshots_rotate_and_keep_state(add_items, monkeypatch):
+    monkeypatch.setattr(ledger, "SNAPSHOT_EVERY", 3)
+    add_items(("flour", 10000, "g"), ("eggs", 100, "item"))
+    for _ in range(2 * ledger.KEEP_SNAPSHOTS + 2):
+        apply_recipe_to_pantry(PANCAKES)  # two events each
+        assert state_quantities() == quantities()
+
+    session = SessionLocal()
+    try:
+        snapshots = session.query(InventorySnapshot).order_by(InventorySnapshot.id).all()
+    finally:
+        session.close()
+    assert len(snapshots) == ledger.KEEP_SNAPSHOTS
+    assert snapshots[-1].event_id > snapshots[0].event_id
+
+
+def _age_ledger(days):
+    session = SessionLocal()
+    session.execute(update(InventoryEvent).values(created_at=datetime.utcnow() - timedelta(days=days)))
+    session.commit()
+    session.close()
+
+
+def test_young_ledger_suggests_nothing(add_items):
+    add_items(("flour", 1000, "g"), ("eggs", 12, "item"))
+    apply_recipe_to_pantry(PANCAKES)
+
+    assert ledger.consumption_rates() == {}
+    assert ledger.reorder_suggestions() == []
+
+
+def test_rates_spread_over_the_observed_history(add_items):
+    add_items(("flour", 1000, "g"), ("eggs", 12, "item"))
+    apply_recipe_to_pantry(PANCAKES)
+    _age_ledger(14)
+
+    rates = ledger.consumption_rates(days=28)
+    assert rates["flour"]["per_day"] == pytest.approx(400 / 14, rel=0.01)
+    assert rates["eggs"]["per_day"] == pytest.approx(4 / 14, rel=0.01)
+    # 600 g of flour at ~29 g/day lasts the week; 8 eggs at ~0.29/day too
+    assert ledger.reorder_suggestions(horizon_days=7) == []
+    low = {s["name"]: s for s in ledger.reorder_suggestions(horizon_days=30)}
+    assert low["eggs"]["amount"] == pytest.approx(4 / 14 * 30 - 8, abs=0.01)
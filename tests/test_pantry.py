@@ -0,0 +1,72 @@
+import pytest
+
+import ledger
+from db import Item, SessionLocal
+from pantry import apply_recipe_to_pantry, compute_grocery_list, convert_amount, display_ingredient, scale_recipe
+
+STEW = {
+    "title": "Beef Stew",
+    "servings": 4,
+    "ingredients": [
+        {"name": "milk", "amount": 600, "unit": "ml"},
+        {"name": "beef", "amount": 600, "unit": "g"},
+        {"name": "salt", "amount": "to taste", "unit": ""},
+    ],
+}
+
+
+def pantry():
+    session = SessionLocal()
+    try:
+        items = session.query(Item).all()
+        session.expunge_all()
+        return items
+    finally:
+        session.close()
+
+
+def quantities():
+    return {i.name: i.quantity for i in pantry()}
+
+
+def test_every_mass_and_volume_pair_converts():
+    assert convert_amount(1.2, "l", "cup") == (pytest.approx(5.0), True)
+    assert convert_amount(1.2, "kg", "oz") == (pytest.approx(42.33, abs=0.01), True)
+    assert convert_amount(16, "oz", "lb") == (pytest.approx(1.0), True)
+    assert convert_amount(1, "cup", "g") == (1, False)
+
+
+def test_scaling_keeps_the_recipe_units_and_display_reads_best():
+    scaled = scale_recipe(STEW, 8)
+    assert [(i["amount"], i["unit"]) for i in scaled["ingredients"]] == [(1200, "ml"), (1200, "g"), ("to taste", "")]
+    shown = [display_ingredient(i) for i in scaled["ingredients"]]
+    assert [(i["amount"], i["unit"]) for i in shown] == [(1.2, "l"), (1.2, "kg"), ("to taste", "")]
+    assert display_ingredient({"name": "oil", "amount": 4, "unit": "tbsp"})["unit"] == "cup"
+
+
+def test_scaled_demand_meets_a_pantry_in_other_units(add_items):
+    add_items(("milk", 8, "cup"), ("beef", 48, "oz"))  # 1920 ml and ~1361 g
+
+    assert compute_grocery_list([STEW], pantry()) == {}
+    assert compute_grocery_list([STEW], pantry(), servings=8) == {}
+    assert compute_grocery_list([STEW], pantry(), servings=12) == {
+        ("beef", "g"): pytest.approx(1800 - 48 * 28.3495),
+    }
+
+    batch = apply_recipe_to_pantry(STEW, servings=8)
+    assert batch is not None
+    left = quantities()
+    assert left["milk"] == pytest.approx(8 - 1200 / 240)
+    assert left["beef"] == pytest.approx(48 - 1200 / 28.3495)
+
+    ledger.undo(batch)
+    assert quantities() == {"milk": 8, "beef": 48}
+
+
+def test_grocery_shortfall_is_expressed_for_display(add_items):
+    add_items(("milk", 1, "cup"))
+
+    assert compute_grocery_list([STEW], pantry(), servings=12) == {
+        ("milk", "l"): pytest.approx(1.8 - 0.24),
+        ("beef", "kg"): pytest.approx(1.8),
+    }
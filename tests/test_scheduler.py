@@ -0,0 +1,110 @@
+import threading
+import time
+
+import pytest
+
+import scheduler
+from scheduler import BACKGROUND, INTERACTIVE, Scheduler, TokenBucket, priority, single_flight
+
+
+def test_token_bucket_refills_continuously():
+    bucket = TokenBucket(per_minute=60)  # one unit per second
+    now = bucket.stamp
+    assert bucket.wait_time(60, now) == 0.0
+    bucket.take(60)
+    assert bucket.wait_time(1, now) == pytest.approx(1.0)
+    assert bucket.wait_time(1, now + 0.5) == pytest.approx(0.5)
+    assert bucket.wait_time(1, now + 1.0) == 0.0
+    assert bucket.wait_time(1000, now + 1.0) == pytest.approx(59.0)  # capped at the bucket size
+
+
+def test_disabled_bucket_never_waits():
+    bucket = TokenBucket(per_minute=0)
+    bucket.take(10**6)
+    assert bucket.wait_time(10**6, bucket.stamp) == 0.0
+
+
+def drained(rpm=240):
+    """A scheduler with an empty request bucket: one slot every 60/rpm seconds."""
+    s = Scheduler(rpm=rpm, tpm=0)
+    s.requests.take(rpm)
+    return s
+
+
+def wait_queued(s, n):
+    deadline = time.monotonic() + 5
+    while sum(q["queued"] for q in s.stats().values()) < n:
+        assert time.monotonic() < deadline, "requests never queued"
+        time.sleep(0.005)
+
+
+def start(name, fn, order):
+    def run():
+        fn()
+        order.append(name)
+
+    t = threading.Thread(target=run)
+    t.start()
+    return t
+
+
+def test_interactive_requests_overtake_queued_background_work():
+    s = drained()
+    order = []
+    threads = []
+    for i in range(3):
+        threads.append(start(f"bg{i}", lambda: s.acquire(level=BACKGROUND), order))
+        wait_queued(s, i + 1)
+    threads.append(start("ui", lambda: s.acquire(level=INTERACTIVE), order))
+    for t in threads:
+        t.join()
+    assert order == ["ui", "bg0", "bg1", "bg2"]
+
+
+def test_interactive_follower_raises_a_shared_calls_priority(monkeypatch):
+    s = drained()
+    monkeypatch.setattr(scheduler, "SCHEDULER", s)
+    order = []
+
+    def background(fn):
+        def run():
+            with priority(BACKGROUND):
+                fn()
+        return run
+
+    other = start("other", background(s.acquire), order)
+    wait_queued(s, 1)
+    leader = start("shared", background(lambda: single_flight("key", s.acquire)), order)
+    wait_queued(s, 2)
+    follower = threading.Thread(target=lambda: single_flight("key", s.acquire))  # interactive
+    follower.start()
+    for t in (other, leader, follower):
+        t.join()
+    assert order == ["shared", "other"]
+
+
+def test_single_flight_coalesces_and_copies():
+    calls = []
+    release = threading.Event()
+
+    def fn():
+        calls.append(1)
+        release.wait()
+        return {"items": [1]}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(single_flight("same", fn))) for _ in range(5)]
+    threads[0].start()
+    while not calls:
+        time.sleep(0.005)
+    for t in threads[1:]:
+        t.start()
+    while scheduler._FLIGHTS["same"].followers < 4:
+        time.sleep(0.005)
+    release.set()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert results == [{"items": [1]}] * 5
+    results[0]["items"].append(2)
+    assert results[1] == {"items": [1]}  # each caller got its own copy
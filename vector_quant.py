@@ -0,0 +1,207 @@
+"""
+Scalar-quantized storage for the recipe index.
+
+The index only needs enough precision to shortlist candidates; exact
+float32 scores are recomputed for the shortlist (see rag.query_recipes_by_ingredients).
+Choose the storage type with SOUSCHEF_INDEX_DTYPE:
+
+- float32 (default): 4 bytes/dim, exact scores, no re-ranking needed
+- float16: 2 bytes/dim
+- int8: 1 byte/dim plus one float32 scale per vector (symmetric, per-vector)
+
+For 1536-dim OpenAI vectors that is ~6 KB, ~3 KB and ~1.5 KB per recipe.
+Run `python vector_quant.py` for a memory/recall report on the current
+cookbook to pick a setting per deployment.
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+
+DTYPES = ("float32", "float16", "int8")
+RERANK_FACTOR = 4    # shortlist k * RERANK_FACTOR candidates before exact re-ranking
+RERANK_MIN = 32
+_SCORE_CHUNK = 8192  # rows upcast per step when scoring, bounds temporary memory
+
+
+def index_dtype() -> str:
+    dtype = (os.getenv("SOUSCHEF_INDEX_DTYPE") or "float32").strip().lower()
+    if dtype not in DTYPES:
+        raise ValueError(f"SOUSCHEF_INDEX_DTYPE must be one of {', '.join(DTYPES)}, got {dtype!r}")
+    return dtype
+
+
+def quantize(vectors, dtype: str = "float32"):
+    """
+    Convert L2-normalized float vectors (N, D) to the storage type.
+
+    Returns (data, scales); scales is None except for int8, where
+    vector_i ~= data_i * scales_i.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dtype == "float32":
+        return vectors, None
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    if dtype == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127.0 if len(vectors) else np.zeros(0, dtype=np.float32)
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    raise ValueError(f"Unsupported index dtype: {dtype}")
+
+
+def scores(data, scales, q_vec):
+    """
+    Approximate dot products of every stored vector with float32 queries:
+    one query (D,) gives (N,), a batch (B, D) gives (N, B).
+    """
+    q = np.asarray(q_vec, dtype=np.float32)
+    qt = q.T  # (D,) stays (D,); (B, D) becomes (D, B)
+    if data.dtype == np.float32:
+        return data @ qt
+    out = np.empty((len(data),) + q.shape[:-1], dtype=np.float32)
+    for start in range(0, len(data), _SCORE_CHUNK):
+        chunk = data[start:start + _SCORE_CHUNK].astype(np.float32)
+        out[start:start + len(chunk)] = chunk @ qt
+    if scales is not None:
+        out *= scales.reshape((-1,) + (1,) * (q.ndim - 1))
+    return out
+
+
+def shortlist_size(top_k: int, n: int, dtype) -> int:
+    if np.dtype(dtype) == np.float32:
+        return min(top_k, n)
+    return min(n, max(top_k * RERANK_FACTOR, RERANK_MIN))
+
+
+def top_candidates(sims, n_candidates):
+    """Indices of the n highest scores, best first (argpartition, then sort only the shortlist)."""
+    n_candidates = min(n_candidates, len(sims))
+    if n_candidates <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if n_candidates < len(sims):
+        part = np.argpartition(-sims, n_candidates - 1)[:n_candidates]
+    else:
+        part = np.arange(len(sims))
+    return part[np.argsort(-sims[part])]
+
+
+def dequantize(data, scales, rows):
+    """float32 copies of the stored vectors at `rows`."""
+    vecs = np.asarray(data[rows], dtype=np.float32)
+    if scales is not None:
+        vecs = vecs * scales[rows][:, None]
+    return vecs
+
+
+def mmr(relevance, vectors, k, lam=0.6):
+    """
+    Maximal marginal relevance: pick k of the candidates greedily, each time
+    the one maximizing lam * relevance - (1 - lam) * (max similarity to those
+    already picked). Returns positions into `relevance`, in pick order.
+    """
+    relevance = np.asarray(relevance, dtype=np.float32)
+    n = len(relevance)
+    k = min(k, n)
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    sim = vectors @ vectors.T  # (n, n) pairwise cosine; n is a small over-fetched shortlist
+    closest = np.zeros(n, dtype=np.float32)  # max similarity to the picked set (none yet)
+    picked = np.zeros(n, dtype=bool)
+    order = np.empty(k, dtype=np.int64)
+    for step in range(k):
+        gain = lam * relevance - (1.0 - lam) * closest
+        gain[picked] = -np.inf
+        best = int(np.argmax(gain))
+        order[step] = best
+        picked[best] = True
+        closest = sim[best] if step == 0 else np.maximum(closest, sim[best])
+    return order
+
+
+def memory_bytes(data, scales) -> int:
+    return int(data.nbytes + (scales.nbytes if scales is not None else 0))
+
+
+def quantization_report(vectors, queries, k: int = 5):
+    """
+    Compare storage types on the given normalized vectors and query vectors.
+
+    Recall@k is measured against exact float32 search, both straight from
+    the quantized scores and after float32 re-ranking of the shortlist.
+    Returns a list of dicts, one per dtype.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    queries = np.asarray(queries, dtype=np.float32)
+    exact = [set(top_candidates(vectors @ q, k).tolist()) for q in queries]
+    rows = []
+    for dtype in DTYPES:
+        data, scales = quantize(vectors, dtype)
+        raw_hits = reranked_hits = 0
+        t0 = time.perf_counter()
+        for q, truth in zip(queries, exact):
+            approx = scores(data, scales, q)
+            raw_hits += len(truth & set(top_candidates(approx, k).tolist()))
+            cand = top_candidates(approx, shortlist_size(k, len(vectors), data.dtype))
+            best = cand[top_candidates(vectors[cand] @ q, k)]
+            reranked_hits += len(truth & set(best.tolist()))
+        elapsed = time.perf_counter() - t0
+        total = max(1, len(queries) * min(k, len(vectors)))
+        size = memory_bytes(data, scales)
+        rows.append(
+            {
+                "dtype": dtype,
+                "bytes": size,
+                "bytes_per_vector": size / max(1, len(vectors)),
+                "recall_at_k": raw_hits / total,
+                "recall_at_k_reranked": reranked_hits / total,
+                "ms_per_query": 1000.0 * elapsed / max(1, len(queries)),
+            }
+        )
+    return rows
+
+
+def main(argv=None):
+    import rag
+    from embedders import get_embedder
+    from recipe_store import load_embeddings
+
+    parser = argparse.ArgumentParser(description="Memory/recall report for quantized recipe index storage.")
+    parser.add_argument("--queries", type=int, default=200, help="number of synthetic queries")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--noise", type=float, default=0.5, help="query perturbation relative to a recipe vector")
+    args = parser.parse_args(argv)
+
+    embedder = get_embedder()
+    rag.embed_missing(r["id"] for r in rag.load_seed_recipes())
+    stored = load_embeddings(embedder.id)
+    if not stored:
+        print("No stored embeddings; nothing to report.")
+        return
+    vectors = np.stack(list(stored.values())).astype(np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    # Queries are recipe vectors with random perturbation: close to, but not
+    # exactly, a stored vector, like an ingredient-list query would be.
+    rng = np.random.default_rng(0)
+    picks = vectors[rng.integers(0, len(vectors), size=args.queries)]
+    noise = rng.normal(size=picks.shape).astype(np.float32)
+    noise /= np.linalg.norm(noise, axis=1, keepdims=True)
+    queries = picks + args.noise * noise
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    print(f"embedder={embedder.id} vectors={len(vectors)} dim={vectors.shape[1]} k={args.k}")
+    print(f"{'dtype':<8} {'MB':>9} {'B/vector':>9} {'recall':>8} {'reranked':>9} {'ms/query':>9}")
+    for row in quantization_report(vectors, queries, k=args.k):
+        print(
+            f"{row['dtype']:<8} {row['bytes'] / 1e6:>9.3f} {row['bytes_per_vector']:>9.0f} "
+            f"{row['recall_at_k']:>8.3f} {row['recall_at_k_reranked']:>9.3f} {row['ms_per_query']:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
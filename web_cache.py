@@ -0,0 +1,145 @@
+"""
+Local store for web search results.
+
+Results are cached per canonical ingredient set (sorted, normalized,
+de-duplicated, plus top_k) for SOUSCHEF_WEB_CACHE_TTL seconds (default one
+day). Every recipe page ever returned is merged into the web_candidates
+table, deduplicated by normalized URL and, failing that, by normalized
+title, so repeated searches don't accumulate copies of the same page.
+"""
+
+import hashlib
+import json
+import os
+import re
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+from sqlalchemy import delete, select
+
+from db import SessionLocal, WebCandidate, WebSearchCache, init_db
+
+
+_TABLES_READY = False
+
+
+def _ensure_tables():
+    global _TABLES_READY
+    if not _TABLES_READY:
+        init_db()
+        _TABLES_READY = True
+
+
+def cache_ttl() -> timedelta:
+    return timedelta(seconds=float(os.getenv("SOUSCHEF_WEB_CACHE_TTL") or 86400))
+
+
+def canonical_ingredients(ingredients) -> list:
+    return sorted({" ".join((i or "").lower().split()) for i in ingredients} - {""})
+
+
+def cache_key(ingredients, top_k: int) -> str:
+    payload = json.dumps({"ingredients": canonical_ingredients(ingredients), "top_k": top_k})
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def url_key(url):
+    """Scheme-, www-, query- and trailing-slash-insensitive form of a URL."""
+    if not url:
+        return None
+    parts = urlsplit(url.strip().lower())
+    host = parts.netloc[4:] if parts.netloc.startswith("www.") else parts.netloc
+    if not host:
+        return None
+    return host + parts.path.rstrip("/")
+
+
+def title_key(title) -> str:
+    return " ".join(re.findall(r"[a-z0-9]+", (title or "").lower()))
+
+
+def dedupe(recipes) -> list:
+    """Drop repeats (same URL or same title) from one result list, keeping the first."""
+    seen = set()
+    out = []
+    for r in recipes:
+        if not isinstance(r, dict):
+            continue
+        keys = {k for k in (url_key(r.get("url") or r.get("source")), "t:" + title_key(r.get("title"))) if k and k != "t:"}
+        if keys & seen:
+            continue
+        seen |= keys
+        out.append(r)
+    return out
+
+
+def lookup(ingredients, top_k: int):
+    """Cached candidate list for this ingredient set, or None if absent/expired."""
+    _ensure_tables()
+    session = SessionLocal()
+    try:
+        row = session.get(WebSearchCache, cache_key(ingredients, top_k))
+        if row is None or row.created_at < datetime.utcnow() - cache_ttl():
+            return None
+        ids = list(row.candidate_ids or [])
+        by_id = {
+            c.id: c.payload
+            for c in session.execute(select(WebCandidate).where(WebCandidate.id.in_(ids))).scalars()
+        }
+        return [by_id[i] for i in ids if i in by_id]
+    finally:
+        session.close()
+
+
+def _merge_candidate(session, recipe, now):
+    ukey = url_key(recipe.get("url") or recipe.get("source"))
+    tkey = title_key(recipe.get("title"))
+    existing = None
+    if ukey:
+        existing = session.execute(select(WebCandidate).where(WebCandidate.url_key == ukey)).scalar_one_or_none()
+    if existing is None and tkey:
+        existing = session.execute(
+            select(WebCandidate).where(WebCandidate.title_key == tkey).limit(1)
+        ).scalar_one_or_none()
+    if existing is None:
+        existing = WebCandidate(url_key=ukey, title_key=tkey, payload=recipe, first_seen=now, last_seen=now, times_seen=1)
+        session.add(existing)
+        session.flush()
+    else:
+        # Keep the freshest copy of the page, but never lose a known URL
+        payload = dict(recipe)
+        if not (payload.get("url") or payload.get("source")) and existing.payload:
+            payload["url"] = existing.payload.get("url") or existing.payload.get("source")
+        existing.payload = payload
+        existing.url_key = existing.url_key or ukey
+        existing.last_seen = now
+        existing.times_seen = (existing.times_seen or 0) + 1
+    return existing.id
+
+
+def store(ingredients, top_k: int, recipes) -> list:
+    """Merge results into the candidate store and cache them for this ingredient set."""
+    _ensure_tables()
+    recipes = dedupe(recipes)
+    now = datetime.utcnow()
+    session = SessionLocal()
+    try:
+        ids = []
+        for r in recipes:
+            cid = _merge_candidate(session, r, now)
+            if cid not in ids:
+                ids.append(cid)
+        session.merge(
+            WebSearchCache(
+                key=cache_key(ingredients, top_k),
+                ingredients=canonical_ingredients(ingredients),
+                candidate_ids=ids,
+                created_at=now,
+            )
+        )
+        # Expired entries are only garbage; drop them while we hold the write lock
+        session.execute(delete(WebSearchCache).where(WebSearchCache.created_at < now - cache_ttl()))
+        session.commit()
+    finally:
+        session.close()
+    return recipes
@@ -1,19 +1,25 @@
 import json
 from typing import List
 
-from openai_utils import get_openai_client, response_text
+import web_cache
+from dedup import unique
+from llm_adapter import complete_json
+from llm_metrics import operation, record_cache
 
 
-def get_recipes_for_ingredients(ingredients: List[str], top_k: int = 5):
+@operation("web_search.get_recipes_for_ingredients")
+def get_recipes_for_ingredients(ingredients: List[str], top_k: int = 5, use_cache: bool = True):
     """
-    Use the OpenAI Responses API (web search tool) when available to find
-    up-to-date recipe pages for the given ingredients. Falls back to a
-    model-driven search prompt if the tool isn't available.
+    Ask the model (through llm_adapter, whichever API shape this SDK and
+    endpoint support) for recipe pages that use the given ingredients.
+
+    Results are cached per ingredient set (see web_cache.py) and merged into
+    the local web-candidate store; pass use_cache=False to force a fresh
+    search.
 
     Returns a list of recipe dicts with keys: title, source/url, ingredients,
     steps, detailed_steps, servings, prep_time, cook_time, tags.
     """
-    client = get_openai_client()
     q = f"Find the top {top_k} recipe webpages that use these ingredients: {', '.join(ingredients)}."
     # Include a strict JSON output example to encourage structured results
     example = {
@@ -38,49 +44,17 @@ def get_recipes_for_ingredients(ingredients: List[str], top_k: int = 5):
         + json.dumps(example)
     )
 
-    # Try Responses API first
-    try:
-        if hasattr(client, "responses"):
-            resp = client.responses.create(
-                model="gpt-4.1-mini",
-                input=[
-                    {"role": "user", "content": prompt},
-                ],
-                response_format={"type": "json_object"},
-            )
-            content = response_text(resp)
-            data = json.loads(content)
-            return data.get("recipes", [])[:top_k]
-    except Exception:
-        # fall through to chat fallback
-        pass
-
-    # Fallback to chat/completions
-    try:
-        if hasattr(client, "chat") and hasattr(client.chat, "completions"):
-            resp = client.chat.completions.create(
-                model="gpt-4.1-mini",
-                messages=[{"role": "user", "content": prompt}],
-                response_format={"type": "json_object"},
-            )
-            content = response_text(resp)
-            data = json.loads(content)
-            return data.get("recipes", [])[:top_k]
-    except Exception:
-        pass
+    if use_cache:
+        cached = web_cache.lookup(ingredients, top_k)
+        record_cache("web_search", cached is not None)
+        if cached is not None:
+            return cached[:top_k]
 
-    # Last resort: legacy completions
     try:
-        resp = client.completions.create(model="gpt-3.5-turbo-instruct", prompt=prompt)
-        content = response_text(resp)
-        # try to extract json
-        import re
-
-        m = re.search(r"\{.*\}", content, re.DOTALL)
-        if m:
-            data = json.loads(m.group(0))
-            return data.get("recipes", [])[:top_k]
+        data = complete_json("", prompt)
     except Exception:
-        pass
-
-    return []
+        # Don't cache a failed search
+        return []
+    # The same dish often comes back from several sites under different titles
+    recipes = unique([r for r in data.get("recipes", []) if isinstance(r, dict)])
+    return web_cache.store(ingredients, top_k, recipes)[:top_k]